@@ -1,4 +1,21 @@
 from .analyst import CryptoAnalysisAgent
 from .technical_analyst import TechnicalAnalysisAgent
+from .pipeline import (
+    STAGES, STAGE_TTLS, StageCache, stage_cache, run_stage, run_pipeline,
+    arun_stage, arun_pipeline, get_advisor, get_technical_agent
+)
 
-__all__ = ["CryptoAnalysisAgent", "TechnicalAnalysisAgent"]
+__all__ = [
+    "CryptoAnalysisAgent",
+    "TechnicalAnalysisAgent",
+    "STAGES",
+    "STAGE_TTLS",
+    "StageCache",
+    "stage_cache",
+    "run_stage",
+    "run_pipeline",
+    "arun_stage",
+    "arun_pipeline",
+    "get_advisor",
+    "get_technical_agent"
+]
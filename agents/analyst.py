@@ -1,57 +1,150 @@
 from langchain.tools import Tool
 from langchain.agents import create_structured_chat_agent, AgentExecutor
-from langchain import hub
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.chat_models import BedrockChat
+from llm import get_routed_llm, get_tier, instrument
+from llm.summarizer import MapReduceSummarizer
 from tools.web_search import WebSearch
-import boto3
+from tools.sentiment_analysis import analyze_reddit_sentiment
+from tools.news_ingestor import get_news_ingestor
+from tools.sentiment_store import get_sentiment_store
+from tools.document_store import get_document_store
+from tools.coingecko import coingecko_get
+from tools.market_feed import get_market_feed, FeedError
 import os
+import time
+import asyncio
+import threading
 import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Retrieval queries against the stored whitepaper chunks
+WHITEPAPER_QUERY = "consensus architecture protocol token supply tokenomics use cases roadmap goals"
+ADVICE_QUERY = "token supply emission tokenomics risks security roadmap governance"
+
+NEWS_RESULTS = int(os.getenv("NEWS_RESULTS", 6))
+
+WHITEPAPER_MAP_PROMPT = """Summarize this section of the {asset} whitepaper. Keep the technical design, token economics, use cases, project goals and any concrete figures.
+
+{text}"""
+
+WHITEPAPER_REDUCE_PROMPT = """Using the {asset} whitepaper content below, provide a comprehensive summary of the {asset} whitepaper, focusing on key technical features, use cases, and project goals.
+
+{text}"""
+
+NEWS_MAP_PROMPT = """Summarize these {asset} news articles in short bullet points, marking each as bullish, bearish or neutral for {asset}.
+
+{text}"""
+
+NEWS_REDUCE_PROMPT = """Using the latest {asset} news below, analyze and categorize the findings as:
+
+**BULLISH NEWS:**
+- Positive developments and partnerships
+
+**BEARISH NEWS:**
+- Negative developments or concerns
+
+**NEUTRAL NEWS:**
+- Informational updates without clear market impact
+
+**MARKET IMPACT:**
+- How this news might affect price and investor sentiment
+
+{text}"""
+
+# The LangChain Hub prompt "hwchase17/structured-chat-agent", vendored so that
+# building the agents needs no network access (e.g. against fake_providers)
+STRUCTURED_CHAT_SYSTEM = """Respond to the human as helpfully and accurately as possible. You have access to the following tools:
+
+{tools}
+
+Use a json blob to specify a tool by providing an action key (tool name) and an action_input key (tool input).
+
+Valid "action" values: "Final Answer" or {tool_names}
+
+Provide only ONE action per $JSON_BLOB, as shown:
+
+```
+{{
+  "action": $TOOL_NAME,
+  "action_input": $INPUT
+}}
+```
+
+Follow this format:
+
+Question: input question to answer
+Thought: consider previous and subsequent steps
+Action:
+```
+$JSON_BLOB
+```
+Observation: action result
+... (repeat Thought/Action/Observation N times)
+Thought: I know what to respond
+Action:
+```
+{{
+  "action": "Final Answer",
+  "action_input": "Final response to human"
+}}
+
+Begin! Reminder to ALWAYS respond with a valid json blob of a single action. Use tools if necessary. Respond directly if appropriate. Format is Action:```$JSON_BLOB```then Observation"""
+
+STRUCTURED_CHAT_HUMAN = """{input}
+
+{agent_scratchpad}
+ (reminder to respond in a JSON blob no matter what)"""
+
+
+def structured_chat_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", STRUCTURED_CHAT_SYSTEM),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", STRUCTURED_CHAT_HUMAN),
+    ])
+
+
 class CryptoAnalysisAgent:
     def __init__(self):
         """Initialize LangChain-based crypto analysis agent"""
         
-        self.aws_client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=os.getenv("AWS_REGION", "us-west-2")
-        )
-        
-        model_kwargs = { 
-            "max_tokens": 4096,
-            "temperature": 0.3,
-            "top_k": 250,
-            "top_p": 0.9,
-            "stop_sequences": ["\n\nHuman"],
-        }
-        
-        self.llm = BedrockChat(
-            client=self.aws_client,
-            model_id="anthropic.claude-3-sonnet-20240229-v1:0",
-            model_kwargs=model_kwargs,
-        )
-        
         self.search_client = WebSearch()
         self.tools = self._create_tools()
+
+        # Long documents and news batches are summarized map-reduce style with cached chunk summaries
+        self.whitepaper_summarizer = MapReduceSummarizer("whitepaper", WHITEPAPER_MAP_PROMPT, WHITEPAPER_REDUCE_PROMPT)
+        self.news_summarizer = MapReduceSummarizer("news", NEWS_MAP_PROMPT, NEWS_REDUCE_PROMPT)
         
-        # Create agent
-        prompt = hub.pull("hwchase17/structured-chat-agent")
-        agent = create_structured_chat_agent(self.llm, self.tools, prompt)
+        # One agent executor per model tier (see llm/routing.py), built lazily;
+        # stages on several threads ask for them at once, hence the lock
+        self.prompt = structured_chat_prompt()
+        self._executors = {}
+        self._executors_lock = threading.Lock()
         
-        self.agent_executor = AgentExecutor(
-            agent=agent, 
-            tools=self.tools, 
-            verbose=True, 
-            handle_parsing_errors=True,
-            max_iterations=10,
-            return_intermediate_steps=True
-        )
+        # Synthesis tier stays the default executor
+        self.agent_executor = self._get_executor("advice")
         
         logging.info("✅ LangChain Crypto Agent initialized successfully")
     
+    def _get_executor(self, call_site):
+        """Return the agent executor running on the model tier routed for call_site"""
+        tier = get_tier(call_site)
+        with self._executors_lock:
+            if tier not in self._executors:
+                llm = get_routed_llm(call_site, temperature=0.3, max_tokens=4096)
+                agent = create_structured_chat_agent(llm, self.tools, self.prompt)
+                self._executors[tier] = AgentExecutor(
+                    agent=agent, 
+                    tools=self.tools, 
+                    verbose=True, 
+                    handle_parsing_errors=True,
+                    max_iterations=10,
+                    return_intermediate_steps=True
+                )
+            return self._executors[tier]
+    
     def _create_tools(self):
         def search_whitepaper(query: str) -> str:
             try:
@@ -89,9 +182,7 @@ class CryptoAnalysisAgent:
 
         def search_price_data(query: str) -> str:
             try:
-                import requests
-                search_url = "https://api.coingecko.com/api/v3/search"
-                r = requests.get(search_url, params={'query': query}, timeout=10)
+                r = coingecko_get("search", params={'query': query}, timeout=10)
                 
                 if r.status_code != 200:
                     return f"Failed to search for {query} on CoinGecko (status: {r.status_code})"
@@ -101,26 +192,22 @@ class CryptoAnalysisAgent:
                     return f"No CoinGecko data found for {query}"
 
                 coin_id = coins[0]["id"]
-                r = requests.get(f"https://api.coingecko.com/api/v3/coins/{coin_id}", timeout=10)
-                if r.status_code != 200:
-                    return f"Failed to fetch market data for {query} (status: {r.status_code})"
-
-                coin_data = r.json()
-                d = coin_data.get("market_data", {})
-                
-                if not d:
-                    return f"No market data available for {query}"
+                try:
+                    # Served from the shared market feed while its price is fresh
+                    quote = get_market_feed().quote(coin_id)
+                except FeedError as e:
+                    return f"Failed to fetch market data for {query} ({e})"
                 
                 return (
                     f"Current price data for {query}:\n"
-                    f"Name: {coin_data.get('name', 'Unknown')}\n"
-                    f"Symbol: {coin_data.get('symbol', 'Unknown').upper()}\n"
-                    f"Price: ${d.get('current_price', {}).get('usd', 'N/A')}\n"
-                    f"Market Cap: ${d.get('market_cap', {}).get('usd', 'N/A')}\n"
-                    f"24h Change: {d.get('price_change_percentage_24h', 'N/A')}%\n"
-                    f"7d Change: {d.get('price_change_percentage_7d', 'N/A')}%\n"
-                    f"Volume: ${d.get('total_volume', {}).get('usd', 'N/A')}\n"
-                    f"Rank: #{d.get('market_cap_rank', 'N/A')}"
+                    f"Name: {quote.get('name') or 'Unknown'}\n"
+                    f"Symbol: {(quote.get('symbol') or 'Unknown').upper()}\n"
+                    f"Price: ${quote.get('price', 'N/A')}\n"
+                    f"Market Cap: ${quote.get('market_cap', 'N/A')}\n"
+                    f"24h Change: {quote.get('change_24h', 'N/A')}%\n"
+                    f"7d Change: {quote.get('change_7d', 'N/A')}%\n"
+                    f"Volume: ${quote.get('volume', 'N/A')}\n"
+                    f"Rank: #{quote.get('rank', 'N/A')}"
                 )
             except Exception as e:
                 logging.error(f"Error in search_price_data: {str(e)}")
@@ -197,28 +284,11 @@ class CryptoAnalysisAgent:
                 negative_posts = results.get('negative', [])
                 neutral_posts = results.get('neutral', [])
             elif isinstance(results, list):
-                # If results is a simple list, try to categorize based on keywords
-                positive_posts = []
-                negative_posts = []
-                neutral_posts = []
-                
-                positive_keywords = ['buy', 'bullish', 'moon', 'pump', 'good', 'great', 'excellent', 'rising', 'up']
-                negative_keywords = ['sell', 'bearish', 'dump', 'crash', 'bad', 'terrible', 'falling', 'down', 'scam']
-                
-                for post in results:
-                    if not isinstance(post, dict):
-                        continue
-                        
-                    title = post.get('title', '').lower()
-                    snippet = post.get('snippet', '').lower()
-                    text = f"{title} {snippet}"
-                    
-                    if any(keyword in text for keyword in positive_keywords):
-                        positive_posts.append(post)
-                    elif any(keyword in text for keyword in negative_keywords):
-                        negative_posts.append(post)
-                    else:
-                        neutral_posts.append(post)
+                # If results is a simple list, score it with the shared sentiment engine
+                scored = analyze_reddit_sentiment(results)
+                positive_posts = scored['positive']
+                negative_posts = scored['negative']
+                neutral_posts = scored['neutral']
             else:
                 logging.warning(f"Unexpected results format: {type(results)}")
                 return {
@@ -271,11 +341,22 @@ class CryptoAnalysisAgent:
                     summary += f"• Negative: {neg_pct:.1f}%\n"
                     summary += f"• Neutral: {neu_pct:.1f}%\n"
 
+                    scores = [post['score'] for post in positive_posts + negative_posts + neutral_posts if 'score' in post]
+                    if scores:
+                        summary += f"• Average compound score: {sum(scores) / len(scores):+.3f}\n"
+
+            # Append to the per-asset time series and report the trend
+            trend = self._record_sentiment_trend(crypto_input, positive_posts, neutral_posts, negative_posts)
+            if trend:
+                summary += trend["summary"]
+
             return {
                 "analysis": summary,
                 "positive": positive_posts,
                 "negative": negative_posts,
-                "neutral": neutral_posts
+                "neutral": neutral_posts,
+                "trend": trend.get("aggregates", {}) if trend else {},
+                "deltas": trend.get("deltas", {}) if trend else {}
             }
 
         except Exception as e:
@@ -287,9 +368,46 @@ class CryptoAnalysisAgent:
                 "neutral": []
             }
 
-    def analyze_news_headlines(self, crypto_input):
-        """Enhanced news analysis with better error handling"""
-        prompt = f"""Search for latest news about {crypto_input} and categorize the findings.
+    def _record_sentiment_trend(self, crypto_input, positive_posts, neutral_posts, negative_posts):
+        """Store scored posts and summarize rolling 1h/24h/7d aggregates and their deltas"""
+        try:
+            store = get_sentiment_store()
+            previous = store.aggregates(crypto_input)
+            new_posts = store.add_posts(crypto_input, {
+                "positive": positive_posts,
+                "neutral": neutral_posts,
+                "negative": negative_posts
+            })
+            aggregates = store.aggregates(crypto_input)
+        except Exception as e:
+            logging.warning(f"Sentiment history unavailable: {str(e)}")
+            return None
+
+        def diff(a, b):
+            return a - b if a is not None and b is not None else None
+
+        deltas = {
+            "since_last_refresh": diff(aggregates["24h"]["mean_score"], previous["24h"]["mean_score"]),
+            "1h_vs_24h": diff(aggregates["1h"]["mean_score"], aggregates["24h"]["mean_score"]),
+            "24h_vs_7d": diff(aggregates["24h"]["mean_score"], aggregates["7d"]["mean_score"])
+        }
+
+        summary = f"\nSENTIMENT TREND ({new_posts} new posts stored):\n"
+        for window, stats in aggregates.items():
+            if stats["volume"]:
+                summary += f"• {window}: mean {stats['mean_score']:+.3f}, {stats['volume']} posts, {stats['positive_ratio']:.0%} positive\n"
+        for name, value in deltas.items():
+            if value is not None:
+                summary += f"• Δ {name.replace('_', ' ')}: {value:+.3f}\n"
+
+        return {"aggregates": aggregates, "deltas": deltas, "summary": summary}
+
+    async def aanalyze_sentiment(self, crypto_input):
+        """Async variant of analyze_sentiment (search and scoring run in a worker thread)"""
+        return await asyncio.to_thread(self.analyze_sentiment, crypto_input)
+
+    def _news_prompt(self, crypto_input):
+        return f"""Search for latest news about {crypto_input} and categorize the findings.
         
         Please analyze and categorize as:
 
@@ -305,79 +423,146 @@ class CryptoAnalysisAgent:
         **MARKET IMPACT:**
         - How this news might affect price and investor sentiment"""
 
+    def _news_text(self, news_data):
+        return "\n\n".join(
+            f"Article {i + 1}: {item.get('title', 'No title')}. {item.get('snippet', '')} ({item.get('link', 'No link')})"
+            for i, item in enumerate(news_data) if isinstance(item, dict)
+        )
+
+    def _ingest_news(self, crypto_input):
+        """
+        Store headlines not seen before. Returns (new_count, search_error, digest_articles, built_at, digest):
+        digest_articles are the articles to rebuild the digest from when any are not summarized yet
+        (new now, or left over from a refresh whose summary failed), else None; built_at is when
+        they were read.
+        """
+        ingestor = get_news_ingestor()
+        new_articles = ingestor.ingest(crypto_input, self.search_client, num_results=NEWS_RESULTS)
+        error = None
+        if isinstance(new_articles, dict):
+            error = new_articles.get("error", "unknown error")
+            logging.warning(f"News search error: {error}")
+            new_articles = []
+        built_at = time.time()
+        articles = ingestor.digest_articles(crypto_input, built_at) if ingestor.pending(crypto_input, built_at) else None
+        return len(new_articles), error, articles, built_at, ingestor.digest(crypto_input, built_at)
+
+    def analyze_news_headlines(self, crypto_input):
+        """Enhanced news analysis with better error handling"""
         try:
-            llm_result = self.agent_executor.invoke({"input": prompt})
-            summary = llm_result.get("output", "No analysis available")
+            # The digest is rebuilt from the articles in the news window only when some are unsummarized;
+            # chunks are content-defined and their summaries cached, so only chunks with new articles cost map calls
+            new_count, error, articles, built_at, digest = self._ingest_news(crypto_input)
+            if articles:
+                summary = self.news_summarizer.summarize(self._news_text(articles), crypto_input)
+            elif digest:
+                # Nothing new since the last refresh
+                summary = digest["summary"]
+            else:
+                llm_result = self._get_executor("news").invoke({"input": self._news_prompt(crypto_input)}, config=instrument("news", crypto_input))
+                summary = llm_result.get("output", "No analysis available")
+            return self._news_result(crypto_input, summary, new_count, articles, built_at, error)
+        except Exception as e:
+            logging.error(f"Error in analyze_news_headlines: {str(e)}")
+            return self._news_error(crypto_input, e)
 
-            # Get news data
-            news_data = self.search_client.search_latest_news(crypto_input, num_results=6)
-            
-            if isinstance(news_data, dict) and "error" in news_data:
-                logging.warning(f"News search error: {news_data['error']}")
-                return {
-                    "analysis": f"{summary}\n\nNote: News search encountered an error: {news_data['error']}",
-                    "bullish": [],
-                    "neutral": [],
-                    "bearish": []
-                }
-            
-            if not news_data:
-                return {
-                    "analysis": f"{summary}\n\nNote: No recent news articles found for {crypto_input}",
-                    "bullish": [],
-                    "neutral": [],
-                    "bearish": []
-                }
+    async def aanalyze_news_headlines(self, crypto_input):
+        """Async variant of analyze_news_headlines"""
+        try:
+            new_count, error, articles, built_at, digest = await asyncio.to_thread(self._ingest_news, crypto_input)
+            if articles:
+                summary = await self.news_summarizer.asummarize(self._news_text(articles), crypto_input)
+            elif digest:
+                summary = digest["summary"]
+            else:
+                llm_result = await self._get_executor("news").ainvoke({"input": self._news_prompt(crypto_input)}, config=instrument("news", crypto_input))
+                summary = llm_result.get("output", "No analysis available")
+            return await asyncio.to_thread(self._news_result, crypto_input, summary, new_count, articles, built_at, error)
+        except Exception as e:
+            logging.error(f"Error in aanalyze_news_headlines: {str(e)}")
+            return self._news_error(crypto_input, e)
+
+    def _news_error(self, crypto_input, error):
+        return {
+            "analysis": f"Error analyzing news for {crypto_input}: {str(error)}",
+            "bullish": [],
+            "neutral": [],
+            "bearish": []
+        }
 
-            # Categorize news
-            bullish, neutral, bearish = [], [], []
-            
-            bullish_keywords = ["partnership", "rally", "gain", "surge", "bull", "breakout", "adoption", "integration", "upgrade", "positive"]
-            bearish_keywords = ["lawsuit", "drop", "fall", "loss", "bear", "crash", "hack", "ban", "regulation", "negative"]
-            
-            for item in news_data:
-                if not isinstance(item, dict):
-                    continue
-                    
-                title = item.get("title", "").lower()
-                snippet = item.get("snippet", "").lower()
-                text = f"{title} {snippet}"
+    def _news_result(self, crypto_input, summary, new_count, articles=None, built_at=None, error=None):
+        """Save the rebuilt digest (marking its articles summarized) and return it with the stored articles by category"""
+        ingestor = get_news_ingestor()
+        if articles:
+            ingestor.save_digest(crypto_input, summary, len(articles), built_at)
+
+        # Articles were classified with the shared lexicon when they were ingested
+        categories = ingestor.categories(crypto_input)
+        if error:
+            summary = f"{summary}\n\nNote: News search encountered an error: {error}"
+        elif not any(categories.values()):
+            summary = f"{summary}\n\nNote: No recent news articles found for {crypto_input}"
+
+        return {
+            "analysis": summary,
+            "bullish": categories["bullish"],
+            "neutral": categories["neutral"],
+            "bearish": categories["bearish"],
+            "new_articles": new_count
+        }
 
-                if any(word in text for word in bullish_keywords):
-                    bullish.append(item)
-                elif any(word in text for word in bearish_keywords):
-                    bearish.append(item)
-                else:
-                    neutral.append(item)
+    def _whitepaper_prompt(self, crypto_input):
+        return f"Search for and provide a comprehensive summary of the {crypto_input} whitepaper, focusing on key technical features, use cases, and project goals."
 
-            return {
-                "analysis": summary,
-                "bullish": bullish,
-                "neutral": neutral,
-                "bearish": bearish
-            }
+    def _whitepaper_excerpts(self, crypto_input, query=WHITEPAPER_QUERY, k=6, ingest=True):
+        """Top-k stored whitepaper chunks, fetching and indexing the whitepaper on first use if ingest"""
+        try:
+            store = get_document_store()
+            if ingest:
+                store.ingest_whitepaper(crypto_input, self.search_client)
+            return store.retrieve(crypto_input, query, k=k)
+        except Exception as e:
+            logging.warning(f"Whitepaper store unavailable: {str(e)}")
+            return []
 
+    def _whitepaper_text(self, crypto_input):
+        """Full text of the stored whitepaper, fetching and indexing it on first use"""
+        try:
+            store = get_document_store()
+            store.ingest_whitepaper(crypto_input, self.search_client)
+            return store.document_text(crypto_input)
         except Exception as e:
-            logging.error(f"Error in analyze_news_headlines: {str(e)}")
-            return {
-                "analysis": f"Error analyzing news for {crypto_input}: {str(e)}",
-                "bullish": [],
-                "neutral": [],
-                "bearish": []
-            }
+            logging.warning(f"Whitepaper store unavailable: {str(e)}")
+            return ""
 
     def summarize_whitepaper(self, crypto_input):
         """Enhanced whitepaper analysis with better error handling"""
-        prompt = f"Search for and provide a comprehensive summary of the {crypto_input} whitepaper, focusing on key technical features, use cases, and project goals."
         try:
-            result = self.agent_executor.invoke({"input": prompt})
+            # Map-reduce over the stored whitepaper; the search agent only when none could be fetched
+            text = self._whitepaper_text(crypto_input)
+            if text:
+                return self.whitepaper_summarizer.summarize(text, crypto_input)
+
+            result = self._get_executor("whitepaper").invoke({"input": self._whitepaper_prompt(crypto_input)}, config=instrument("whitepaper", crypto_input))
             return result.get("output", f"No whitepaper analysis available for {crypto_input}")
         except Exception as e:
             logging.error(f"Error in summarize_whitepaper: {str(e)}")
             return f"Error analyzing whitepaper for {crypto_input}: {str(e)}"
 
-    def generate_advice(self, crypto_input, previous_analyses=None, **kwargs):
-        """Enhanced advice generation with comprehensive analysis synthesis"""
+    async def asummarize_whitepaper(self, crypto_input):
+        """Async variant of summarize_whitepaper"""
+        try:
+            text = await asyncio.to_thread(self._whitepaper_text, crypto_input)
+            if text:
+                return await self.whitepaper_summarizer.asummarize(text, crypto_input)
+
+            result = await self._get_executor("whitepaper").ainvoke({"input": self._whitepaper_prompt(crypto_input)}, config=instrument("whitepaper", crypto_input))
+            return result.get("output", f"No whitepaper analysis available for {crypto_input}")
+        except Exception as e:
+            logging.error(f"Error in asummarize_whitepaper: {str(e)}")
+            return f"Error analyzing whitepaper for {crypto_input}: {str(e)}"
+
+    def _advice_prompt(self, crypto_input, previous_analyses=None, excerpts=None):
         if previous_analyses:
             advice_prompt = f"""
 As a professional cryptocurrency trading advisor, provide comprehensive trading advice for {crypto_input}.
@@ -450,17 +635,46 @@ Based on your research, provide:
 
 **DISCLAIMER:** Include that this is educational content only and not financial advice.
 """
+        if excerpts:
+            advice_prompt += "\n**WHITEPAPER EXCERPTS (stored copy):**\n" + "\n\n".join(chunk["text"] for chunk in excerpts) + "\n"
+        return advice_prompt
+
+    def _advice_result(self, crypto_input, result):
+        return {
+            "advice": result.get("output", f"No trading advice available for {crypto_input}"),
+            "intermediate_steps": result.get("intermediate_steps", []),
+            "success": True
+        }
+
+    def _advice_error(self, crypto_input, error):
+        return {
+            "advice": f"Error generating advice for {crypto_input}: {str(error)}",
+            "intermediate_steps": [],
+            "success": False
+        }
+
+    def generate_advice(self, crypto_input, previous_analyses=None, **kwargs):
+        """Enhanced advice generation with comprehensive analysis synthesis"""
         try:
-            result = self.agent_executor.invoke({"input": advice_prompt})
-            return {
-                "advice": result.get("output", f"No trading advice available for {crypto_input}"),
-                "intermediate_steps": result.get("intermediate_steps", []),
-                "success": True
-            }
+            excerpts = self._whitepaper_excerpts(crypto_input, ADVICE_QUERY, k=3, ingest=False)
+            result = self._get_executor("advice").invoke(
+                {"input": self._advice_prompt(crypto_input, previous_analyses, excerpts)},
+                config=instrument("advice", crypto_input)
+            )
+            return self._advice_result(crypto_input, result)
         except Exception as e:
             logging.error(f"Error generating advice: {e}")
-            return {
-                "advice": f"Error generating advice for {crypto_input}: {str(e)}",
-                "intermediate_steps": [],
-                "success": False
-            }
\ No newline at end of file
+            return self._advice_error(crypto_input, e)
+
+    async def agenerate_advice(self, crypto_input, previous_analyses=None, **kwargs):
+        """Async variant of generate_advice"""
+        try:
+            excerpts = await asyncio.to_thread(self._whitepaper_excerpts, crypto_input, ADVICE_QUERY, 3, False)
+            result = await self._get_executor("advice").ainvoke(
+                {"input": self._advice_prompt(crypto_input, previous_analyses, excerpts)},
+                config=instrument("advice", crypto_input)
+            )
+            return self._advice_result(crypto_input, result)
+        except Exception as e:
+            logging.error(f"Error generating advice: {e}")
+            return self._advice_error(crypto_input, e)
\ No newline at end of file
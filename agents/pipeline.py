@@ -0,0 +1,532 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.priority import propagate, is_background
+from tools.result_store import get_result_store
+from tools.tracing import span
+from tools.metrics import observe_cache
+
+# Stages in the order the app runs them; advice synthesizes everything before it
+STAGES = ("whitepaper", "sentiment", "news", "technical", "advice")
+
+# How long a stage result stays fresh, in seconds (override with STAGE_TTL_<STAGE>)
+STAGE_TTLS = {
+    "whitepaper": 3 * 86400,
+    "sentiment": 30 * 60,
+    "news": 2 * 3600,
+    "technical": 5 * 60,
+    "advice": 30 * 60,
+}
+
+
+def stage_error(stage, error):
+    """Fallback result for a failed stage, in the shape the UI expects for that stage"""
+    if stage == "whitepaper":
+        return f"Error analyzing whitepaper: {str(error)}"
+    if stage == "sentiment":
+        return {
+            "analysis": f"Error analyzing sentiment: {str(error)}",
+            "positive": [],
+            "negative": [],
+            "neutral": []
+        }
+    if stage == "news":
+        return {
+            "analysis": f"Error analyzing news: {str(error)}",
+            "bullish": [],
+            "neutral": [],
+            "bearish": []
+        }
+    if stage == "technical":
+        return {
+            "error": f"Technical analysis failed: {str(error)}",
+            "analysis": f"Error performing technical analysis: {str(error)}"
+        }
+    return {
+        "advice": f"Error generating advice: {str(error)}",
+        "success": False
+    }
+
+
+def stage_failed(result):
+    """True when a stage result is an error fallback rather than an analysis"""
+    if isinstance(result, str):
+        return result.startswith("Error")
+    if isinstance(result, dict):
+        if "error" in result or result.get("success") is False:
+            return True
+        return str(result.get("analysis", "")).startswith("Error")
+    return result is None
+
+
+def _preview(stage, on_partial):
+    return (lambda preview: on_partial(stage, preview)) if on_partial else None
+
+
+def run_stage(stage, crypto_input, advisor, technical_agent=None, results=None, on_partial=None):
+    """
+    Run one pipeline stage for an asset.
+
+    Args:
+        stage (str): One of STAGES.
+        crypto_input (str): Asset name, e.g. "Bitcoin".
+        advisor (CryptoAnalysisAgent): Agent for whitepaper, sentiment, news and advice.
+        technical_agent (TechnicalAnalysisAgent): Agent for the technical stage, if available.
+        results (dict): Results of the stages run so far (advice synthesizes them).
+        on_partial (callable): on_partial(stage, preview) for preliminary results,
+            e.g. the technical indicators before the LLM narrative.
+
+    Returns:
+        The stage result, or its error fallback (see stage_error).
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+
+    try:
+        if stage == "whitepaper":
+            return advisor.summarize_whitepaper(crypto_input)
+        if stage == "sentiment":
+            return advisor.analyze_sentiment(crypto_input)
+        if stage == "news":
+            return advisor.analyze_news_headlines(crypto_input)
+        if stage == "technical":
+            if technical_agent is None:
+                return {
+                    "error": "Technical analysis agent not available",
+                    "analysis": "Technical analysis could not be performed due to initialization failure."
+                }
+            return technical_agent.perform_technical_analysis(crypto_input, on_indicators=_preview(stage, on_partial))
+        return advisor.generate_advice(crypto_input, previous_analyses=results or {})
+    except Exception as e:
+        logging.error(f"{stage.title()} analysis error: {e}")
+        return stage_error(stage, e)
+
+
+async def arun_stage(stage, crypto_input, advisor, technical_agent=None, results=None, on_partial=None):
+    """Async variant of run_stage, using the agents' async methods."""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+
+    try:
+        if stage == "whitepaper":
+            return await advisor.asummarize_whitepaper(crypto_input)
+        if stage == "sentiment":
+            return await advisor.aanalyze_sentiment(crypto_input)
+        if stage == "news":
+            return await advisor.aanalyze_news_headlines(crypto_input)
+        if stage == "technical":
+            if technical_agent is None:
+                return {
+                    "error": "Technical analysis agent not available",
+                    "analysis": "Technical analysis could not be performed due to initialization failure."
+                }
+            return await technical_agent.aperform_technical_analysis(crypto_input, on_indicators=_preview(stage, on_partial))
+        return await advisor.agenerate_advice(crypto_input, previous_analyses=results or {})
+    except Exception as e:
+        logging.error(f"{stage.title()} analysis error: {e}")
+        return stage_error(stage, e)
+
+
+def normalize_asset(asset):
+    return " ".join(asset.lower().split())
+
+
+def stage_params(stage, stages):
+    """Cache parameters of a stage: advice depends on which analyses fed into it."""
+    if stage == "advice":
+        return tuple(s for s in STAGES if s in stages and s != "advice")
+    return ()
+
+
+class StageCache:
+    """
+    Process-wide TTL cache of stage results keyed by (normalized asset, stage,
+    params), shared by every session and caller in the process. Concurrent
+    requests for the same missing entry compute it once: the others wait for
+    the first and then read its result. Error results are never cached.
+
+    hits/misses count interactive lookups only (overall and per asset), so
+    they measure what users see. Background work such as the cache warmer
+    is counted separately in background_computes.
+
+    With a store (a ResultStore, or a factory for one resolved on first use)
+    results are also persisted and shared with other processes: misses in
+    memory fall back to the store, and a computation another process has
+    in progress is waited for instead of repeated.
+    """
+
+    def __init__(self, ttls=None, store=None):
+        self.ttls = {stage: int(os.getenv(f"STAGE_TTL_{stage.upper()}", ttl)) for stage, ttl in STAGE_TTLS.items()}
+        self.ttls.update(ttls or {})
+        self._entries = {}  # key -> (computed_at, result)
+        self._key_locks = {}  # key -> [lock, callers holding or waiting for it], dropped when unused
+        self._flights = {}  # key -> [task, waiters] for async computations in progress
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.background_computes = 0
+        self._asset_stats = {}  # normalized asset -> [hits, misses]
+        self._store = store
+
+    @staticmethod
+    def key(asset, stage, params=()):
+        return (normalize_asset(asset), stage, tuple(params))
+
+    @property
+    def store(self):
+        if callable(self._store):
+            self._store = self._store()
+        return self._store
+
+    def _fresh(self, key, now, observe=False):
+        """
+        Fresh (computed_at, result) from memory, else from the store (remembered
+        in memory); or None. observe=True records the lookup per cache layer.
+        """
+        with self._lock:
+            entry = self._lookup(key, now)
+        if observe:
+            observe_cache("stage_memory", entry is not None)
+        if entry or self.store is None:
+            return entry
+        try:
+            entry = self.store.latest(key[0], key[1], key[2], max_age=self.ttls.get(key[1], 0), now=now)
+        except Exception as e:
+            logging.warning(f"⚠️ Result store lookup failed: {e}")
+            return None
+        if observe:
+            observe_cache("stage_store", entry is not None)
+        if entry:
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+    def _claim(self, key):
+        """Claim the store's in-progress marker: the owner token, False if another requester holds it, None without a store."""
+        if self.store is None:
+            return None
+        owner = self.store.owner()
+        try:
+            return owner if self.store.claim(key[0], key[1], key[2], owner) else False
+        except Exception as e:
+            logging.warning(f"⚠️ Result store claim failed: {e}")
+            return None
+
+    def _release(self, key, owner):
+        try:
+            self.store.release(key[0], key[1], key[2], owner)
+        except Exception as e:
+            logging.warning(f"⚠️ Result store release failed: {e}")
+
+    def _wait(self, key):
+        """Wait for the requester holding the marker and return its fresh entry (or None)."""
+        logging.info(f"⏳ Waiting for {key[1]} of {key[0]} computed by another requester")
+        with span("wait.result_store", asset=key[0], stage=key[1]) as s:
+            entry = self.store.wait_for(key[0], key[1], key[2], max_age=self.ttls.get(key[1], 0))
+            s.set(found=entry is not None)
+        if entry:
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+    def _count(self, key, hit):
+        """Record a lookup. Caller holds the lock."""
+        if is_background():
+            self.background_computes += not hit
+            return
+        stats = self._asset_stats.setdefault(key[0], [0, 0])
+        if hit:
+            self.hits += 1
+            stats[0] += 1
+        else:
+            self.misses += 1
+            stats[1] += 1
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry and now - entry[0] < self.ttls.get(key[1], 0):
+            return entry
+        return None
+
+    def get(self, asset, stage, params=(), now=None):
+        """Fresh cached result, or None."""
+        entry = self._fresh(self.key(asset, stage, params), now or time.time())
+        return entry[1] if entry else None
+
+    def age(self, asset, stage, params=(), now=None):
+        """Seconds since a fresh cached result was computed, or None."""
+        now = now or time.time()
+        entry = self._fresh(self.key(asset, stage, params), now)
+        return now - entry[0] if entry else None
+
+    def put(self, asset, stage, result, params=(), now=None):
+        now = now or time.time()
+        with self._lock:
+            self._entries[self.key(asset, stage, params)] = (now, result)
+            # Drop expired entries so the cache only holds what could still be served
+            for key in [k for k, (computed_at, _) in self._entries.items() if now - computed_at >= self.ttls.get(k[1], 0)]:
+                del self._entries[key]
+        if self.store is not None:
+            try:
+                self.store.put(asset, stage, result, params, computed_at=now)
+            except Exception as e:
+                logging.warning(f"⚠️ Could not persist {stage} result for {asset}: {e}")
+
+    def get_or_compute(self, asset, stage, compute, params=(), force=False):
+        """
+        Return (result, cached): the fresh cached result, or compute() stored
+        for later callers. force=True skips the lookup and overwrites the entry.
+        """
+        key = self.key(asset, stage, params)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                return self._get_or_compute(key, asset, stage, compute, params, force)
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def _get_or_compute(self, key, asset, stage, compute, params, force):
+        """get_or_compute for a caller holding the key's lock."""
+        if not force:
+            entry = self._fresh(key, time.time(), observe=True)
+            if entry:
+                with self._lock:
+                    self._count(key, True)
+                return entry[1], True
+        with self._lock:
+            self._count(key, False)
+
+        # Another process may be computing this already: use its result instead
+        owner = self._claim(key)
+        if owner is False:
+            entry = self._wait(key)
+            if entry:
+                return entry[1], True
+
+        try:
+            result = compute()
+            if not stage_failed(result):
+                self.put(asset, stage, result, params)
+        finally:
+            if owner:
+                self._release(key, owner)
+        return result, False
+
+    async def _acompute(self, key, asset, stage, compute, params):
+        try:
+            owner = await asyncio.to_thread(self._claim, key)
+            if owner is False:
+                entry = await asyncio.to_thread(self._wait, key)
+                if entry:
+                    return entry[1]
+
+            try:
+                result = await compute()
+                if not stage_failed(result):
+                    self.put(asset, stage, result, params)
+            finally:
+                if owner:
+                    self._release(key, owner)
+            return result
+        finally:
+            self._flights.pop(key, None)
+
+    async def aget_or_compute(self, asset, stage, compute, params=(), force=False):
+        """
+        Async variant of get_or_compute; compute() returns an awaitable.
+        Concurrent callers share one computation, which is cancelled when
+        every caller waiting for it has been cancelled. Must be called from
+        a single event loop (async callers are deduplicated separately from
+        threads, but share the same entries).
+        """
+        key = self.key(asset, stage, params)
+        if not force:
+            entry = self._fresh(key, time.time(), observe=True)
+            if entry:
+                with self._lock:
+                    self._count(key, True)
+                return entry[1], True
+
+        flight = self._flights.get(key)
+        if flight is None:
+            with self._lock:
+                self._count(key, False)
+            flight = self._flights[key] = [asyncio.ensure_future(self._acompute(key, asset, stage, compute, params)), 0]
+
+        flight[1] += 1
+        try:
+            return await asyncio.shield(flight[0]), False
+        finally:
+            flight[1] -= 1
+            if not flight[1] and not flight[0].done():
+                flight[0].cancel()
+
+    def invalidate(self, asset=None, stage=None):
+        """Drop cached results for an asset and/or stage (everything when both are None)."""
+        asset = normalize_asset(asset) if asset else None
+        with self._lock:
+            for key in [k for k in self._entries if (asset is None or k[0] == asset) and (stage is None or k[1] == stage)]:
+                del self._entries[key]
+        if self.store is not None:
+            self.store.delete(asset, stage)
+
+    def cache_info(self, assets=None):
+        """Counters for all interactive lookups, or only those for the given assets."""
+        with self._lock:
+            if assets is None:
+                hits, misses = self.hits, self.misses
+            else:
+                stats = [self._asset_stats.get(normalize_asset(asset), [0, 0]) for asset in assets]
+                hits, misses = sum(s[0] for s in stats), sum(s[1] for s in stats)
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else None,
+                "size": len(self._entries),
+                "background_computes": self.background_computes,
+                "persistent": self.store is not None,
+            }
+
+
+# Backed by the shared result store unless RESULT_STORE=0
+stage_cache = StageCache(store=get_result_store if os.getenv("RESULT_STORE", "1") != "0" else None)
+
+
+def run_pipeline(crypto_input, advisor, technical_agent=None, stages=STAGES, on_stage=None, cache=None, force=False,
+                 on_result=None, on_partial=None, concurrent=False):
+    """
+    Run the selected stages in pipeline order.
+
+    on_stage(stage, step, total) is called before each stage, e.g. to update
+    progress, and on_result(stage, result, cached) after it, e.g. to publish
+    partial results. Either callback may raise to abort the run.
+    on_partial(stage, preview) receives preliminary results while a stage
+    runs (see run_stage).
+
+    With a cache (e.g. stage_cache), fresh results are reused. force=True
+    recomputes every stage, and advice is also recomputed whenever one of
+    its inputs was.
+
+    concurrent=True runs the analyses at the same time on worker threads
+    (advice still runs last, once they have all finished); the callbacks are
+    then called from those threads.
+    """
+    selected = [stage for stage in STAGES if stage in stages]
+    results = {}
+    recomputed = False
+
+    def run(step, stage, stage_force):
+        nonlocal recomputed
+        if on_stage:
+            on_stage(stage, step, len(selected))
+
+        def compute():
+            return run_stage(stage, crypto_input, advisor, technical_agent, results, on_partial)
+
+        with span(f"stage.{stage}", asset=crypto_input, stage=stage, force=stage_force) as s:
+            if cache is None:
+                result, cached = compute(), False
+            else:
+                result, cached = cache.get_or_compute(
+                    crypto_input, stage, compute, stage_params(stage, selected), force=stage_force
+                )
+                recomputed = recomputed or not cached
+            s.set(cache_hit=cached, failed=stage_failed(result))
+
+        results[stage] = result
+        if on_result:
+            on_result(stage, result, cached)
+
+    with span("pipeline", asset=crypto_input, stages=",".join(selected), concurrent=concurrent):
+        analyses = [(step, stage) for step, stage in enumerate(selected, 1) if stage != "advice"]
+        if concurrent and len(analyses) > 1:
+            with ThreadPoolExecutor(max_workers=len(analyses)) as pool:
+                futures = [pool.submit(propagate(run), step, stage, force) for step, stage in analyses]
+            for future in futures:
+                future.result()
+        else:
+            for step, stage in analyses:
+                run(step, stage, force)
+
+        if "advice" in selected:
+            # Keep the usual stage order in the synthesized inputs
+            ordered = {stage: results.pop(stage) for stage in selected if stage in results}
+            results.update(ordered)
+            run(len(selected), "advice", force or recomputed)
+    return {stage: results[stage] for stage in selected}
+
+
+async def arun_pipeline(crypto_input, advisor, technical_agent=None, stages=STAGES, cache=None, force=False,
+                        on_result=None, on_partial=None):
+    """
+    Async variant of run_pipeline. The analyses run concurrently and advice
+    runs once they have all finished. Cancelling the caller cancels the
+    stages still running.
+    """
+    selected = [stage for stage in STAGES if stage in stages]
+    results = {}
+    recomputed = False
+
+    async def run(stage, stage_force):
+        nonlocal recomputed
+
+        def compute():
+            return arun_stage(stage, crypto_input, advisor, technical_agent, results, on_partial)
+
+        with span(f"stage.{stage}", asset=crypto_input, stage=stage, force=stage_force) as s:
+            if cache is None:
+                result, cached = await compute(), False
+            else:
+                result, cached = await cache.aget_or_compute(
+                    crypto_input, stage, compute, stage_params(stage, selected), force=stage_force
+                )
+                recomputed = recomputed or not cached
+            s.set(cache_hit=cached, failed=stage_failed(result))
+
+        results[stage] = result
+        if on_result:
+            on_result(stage, result, cached)
+
+    with span("pipeline", asset=crypto_input, stages=",".join(selected), concurrent=True):
+        await asyncio.gather(*(run(stage, force) for stage in selected if stage != "advice"))
+        if "advice" in selected:
+            # Keep the usual stage order in the synthesized inputs and the returned dict
+            ordered = {stage: results.pop(stage) for stage in selected if stage in results}
+            results.update(ordered)
+            await run("advice", force or recomputed)
+    return {stage: results[stage] for stage in selected}
+
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+def get_advisor():
+    """The process-wide CryptoAnalysisAgent, built on first use."""
+    with _agents_lock:
+        if "advisor" not in _agents:
+            from .analyst import CryptoAnalysisAgent
+            _agents["advisor"] = CryptoAnalysisAgent()
+        return _agents["advisor"]
+
+
+def get_technical_agent():
+    """The process-wide TechnicalAnalysisAgent, or None if it failed to initialize (retried next call)."""
+    with _agents_lock:
+        if "technical" not in _agents:
+            try:
+                from .technical_analyst import TechnicalAnalysisAgent
+                _agents["technical"] = TechnicalAnalysisAgent()
+            except Exception as e:
+                logging.error(f"Technical analysis agent failed to initialize: {e}")
+                return None
+        return _agents["technical"]
@@ -1,4 +1,4 @@
-import requests
+import asyncio
 import logging
 import pandas as pd
 import numpy as np
@@ -9,7 +9,22 @@ import os
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from llm import get_bedrock_llm
+from llm import get_routed_llm, instrument
+from tools.coingecko import coingecko_get, resolve_coin_id
+from tools.market_feed import get_market_feed, FeedError
+from tools.downsample import lttb_indices, minmax_indices, downsample_ohlc
+
+# Point budget per chart series; longer histories are downsampled server-side
+CHART_POINTS = int(os.getenv("CHART_POINTS", 300))
+
+
+def _chart_line(timestamps, values, max_points, spikes=False):
+    """{'t': [...], 'y': [...]} for one indicator, without its warm-up NaNs, downsampled to max_points"""
+    values = np.asarray(values, dtype=float)
+    mask = np.isfinite(values)
+    t, y = timestamps[mask], values[mask]
+    keep = minmax_indices(y, max_points) if spikes else lttb_indices(t, y, max_points)
+    return {'t': t[keep].tolist(), 'y': y[keep].tolist()}
 
 class TechnicalAnalysisAgent:  # Removed () after class name
     def __init__(self):
@@ -17,7 +32,8 @@ class TechnicalAnalysisAgent:  # Removed () after class name
         
         # Initialize Bedrock LLM
         try:
-            self.llm = get_bedrock_llm(
+            self.llm = get_routed_llm(
+                "technical",
                 temperature=0.2,  # Lower for precise technical analysis
                 max_tokens=2000
             )
@@ -27,53 +43,29 @@ class TechnicalAnalysisAgent:  # Removed () after class name
             self.llm = None
     
     def get_crypto_id(self, crypto_name):
-        """Search for crypto ID dynamically using CoinGecko search API"""
-        try:
-            # First, try the search API to find the correct ID
-            search_url = "https://api.coingecko.com/api/v3/search"
-            params = {'query': crypto_name}
-            response = requests.get(search_url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                search_data = response.json()
-                coins = search_data.get('coins', [])
-                
-                if coins:
-                    # Return the first match (most relevant)
-                    return coins[0]['id']
-            
-            # Fallback: try the input as-is (lowercase)
-            return crypto_name.lower().replace(' ', '-')
-            
-        except Exception as e:
-            logging.warning(f"Error in crypto search: {e}")
-            # Fallback: return input as-is
-            return crypto_name.lower().replace(' ', '-')
+        """Search for crypto ID dynamically using CoinGecko search API (remembered per process)"""
+        return resolve_coin_id(crypto_name)
     
     def fetch_ohlcv_data(self, crypto_input, days=90):
-        """Fetch OHLCV data from CoinGecko"""
+        """Fetch OHLCV data through the market feed (CoinGecko when the feed has no fresh candles)"""
         crypto_id = self.get_crypto_id(crypto_input)
         
         try:
-            url = f"https://api.coingecko.com/api/v3/coins/{crypto_id}/ohlc"
-            params = {'vs_currency': 'usd', 'days': days}
-            response = requests.get(url, params=params, timeout=15)
+            candles = get_market_feed().fetch_candles(crypto_id, days)
             
-            if response.status_code != 200:
-                return {"error": f"Failed to fetch OHLC data for {crypto_input}"}
-            
-            data = response.json()
-            
-            if not data:
+            if not candles:
                 return {"error": "No OHLC data available"}
             
             # Convert to pandas DataFrame for easier analysis
+            data = [[c['timestamp'] * 1000, c['open'], c['high'], c['low'], c['close']] for c in candles]
             df = pd.DataFrame(data, columns=['timestamp', 'open', 'high', 'low', 'close'])
             df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
             df = df.sort_values('timestamp').reset_index(drop=True)
             
             return df
             
+        except FeedError:
+            return {"error": f"Failed to fetch OHLC data for {crypto_input}"}
         except Exception as e:
             logging.error(f"Error fetching OHLCV data: {e}")
             return {"error": str(e)}
@@ -148,13 +140,52 @@ class TechnicalAnalysisAgent:  # Removed () after class name
             'support': support_levels
         }
     
+    def chart_series(self, df, max_points=CHART_POINTS, rsi=None, macd_data=None, bb=None, support_resistance=None):
+        """
+        Price and indicator histories for the charts, at most max_points per
+        series: candles are merged per bucket, lines keep their shape (LTTB)
+        and the MACD histogram keeps its extremes (min-max). Indicators
+        already computed can be passed in.
+        """
+        close = df['close']
+        rsi = self.calculate_rsi(close) if rsi is None else rsi
+        macd_data = self.calculate_macd(close) if macd_data is None else macd_data
+        bb = self.calculate_bollinger_bands(close) if bb is None else bb
+        support_resistance = self.calculate_support_resistance(df) if support_resistance is None else support_resistance
+        
+        timestamps = df['timestamp'].to_numpy()
+        t, open_, high, low, close_ = downsample_ohlc(
+            timestamps, df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(), close.to_numpy(), max_points
+        )
+        lines = {
+            'sma_50': self.calculate_sma(close, 50),
+            'bb_upper': bb['upper'],
+            'bb_middle': bb['middle'],
+            'bb_lower': bb['lower'],
+            'macd': macd_data['macd'],
+            'macd_signal': macd_data['signal'],
+            'rsi': rsi,
+        }
+        return {
+            'points': len(df),
+            'max_points': max_points,
+            'candles': {
+                't': t.tolist(), 'open': open_.tolist(), 'high': high.tolist(), 'low': low.tolist(), 'close': close_.tolist()
+            },
+            'lines': {name: _chart_line(timestamps, values, max_points) for name, values in lines.items()},
+            'macd_histogram': _chart_line(timestamps, macd_data['histogram'], max_points, spikes=True),
+            'levels': {
+                'support': [float(level) for level in support_resistance['support']],
+                'resistance': [float(level) for level in support_resistance['resistance']],
+            },
+        }
+    
     def analyze_volume_trend(self, crypto_input):
         """Analyze volume trends"""
         try:
             crypto_id = self.get_crypto_id(crypto_input)
-            url = f"https://api.coingecko.com/api/v3/coins/{crypto_id}/market_chart"
             params = {'vs_currency': 'usd', 'days': '30'}
-            response = requests.get(url, params=params, timeout=10)
+            response = coingecko_get(f"coins/{crypto_id}/market_chart", params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -233,11 +264,8 @@ class TechnicalAnalysisAgent:  # Removed () after class name
         else:
             return {"signal": "hold", "confidence": 0.5, "reasons": signals}
     
-    def perform_technical_analysis(self, crypto_input):
-        """Main method to perform comprehensive technical analysis"""
-        if not self.llm:
-            return {"error": "LLM not initialized"}
-        
+    def _prepare_analysis(self, crypto_input):
+        """Fetch data and compute indicators. Returns (prompt, result) or an error dict."""
         try:
             # Fetch OHLCV data
             df = self.fetch_ohlcv_data(crypto_input, days=90)
@@ -322,13 +350,7 @@ Based on this comprehensive technical analysis, provide a detailed assessment:
 
 Be specific with price levels and provide actionable insights based purely on technical analysis."""
 
-            # Get LLM analysis
-            response = self.llm.invoke(prompt)
-            analysis = response.content if hasattr(response, 'content') else str(response)
-            
-            # Return comprehensive results
             result = {
-                'analysis': analysis,
                 'current_price': current_price,
                 'rsi': rsi.iloc[-1],
                 'macd': {
@@ -347,12 +369,64 @@ Be specific with price levels and provide actionable insights based purely on te
                 'price_changes': {
                     '24h': price_24h_change,
                     '7d': price_7d_change
-                }
+                },
+                'chart': self.chart_series(
+                    df, rsi=rsi, macd_data=macd_data, bb=bb, support_resistance=support_resistance
+                )
             }
             
+            return prompt, result
+            
+        except Exception as e:
+            error_msg = f"Error performing technical analysis: {str(e)}"
+            logging.error(error_msg)
+            return {"error": error_msg}
+    
+    def perform_technical_analysis(self, crypto_input, on_indicators=None):
+        """
+        Main method to perform comprehensive technical analysis.
+
+        on_indicators(result) is called with the computed indicators (no
+        'analysis' yet) before the LLM call, so callers can show them early.
+        """
+        if not self.llm:
+            return {"error": "LLM not initialized"}
+        
+        prepared = self._prepare_analysis(crypto_input)
+        if isinstance(prepared, dict):
+            return prepared
+        prompt, result = prepared
+        if on_indicators:
+            on_indicators(dict(result))
+        
+        try:
+            # Get LLM analysis
+            response = self.llm.invoke(prompt, config=instrument("technical", crypto_input))
+            result['analysis'] = response.content if hasattr(response, 'content') else str(response)
+            logging.info(f"✅ Generated technical analysis for {crypto_input}")
+            return result
+        except Exception as e:
+            error_msg = f"Error performing technical analysis: {str(e)}"
+            logging.error(error_msg)
+            return {"error": error_msg}
+    
+    async def aperform_technical_analysis(self, crypto_input, on_indicators=None):
+        """Async variant: data fetching runs in a worker thread, the LLM call is awaited"""
+        if not self.llm:
+            return {"error": "LLM not initialized"}
+        
+        prepared = await asyncio.to_thread(self._prepare_analysis, crypto_input)
+        if isinstance(prepared, dict):
+            return prepared
+        prompt, result = prepared
+        if on_indicators:
+            on_indicators(dict(result))
+        
+        try:
+            response = await self.llm.ainvoke(prompt, config=instrument("technical", crypto_input))
+            result['analysis'] = response.content if hasattr(response, 'content') else str(response)
             logging.info(f"✅ Generated technical analysis for {crypto_input}")
             return result
-            
         except Exception as e:
             error_msg = f"Error performing technical analysis: {str(e)}"
             logging.error(error_msg)
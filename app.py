@@ -1,11 +1,28 @@
 import streamlit as st
-from agents.analyst import CryptoAnalysisAgent
-from agents.technical_analyst import TechnicalAnalysisAgent
+import altair as alt
+import pandas as pd
+from agents.pipeline import STAGES
+from services.jobs import get_job_manager, COMPLETED, FAILED, CANCELLED
+from services.warmer import start_cache_warmer
+from services.session_cache import SessionResultCache
+from tools.tracing import get_trace, self_times
+from tools.market_feed import start_market_feed
+from tools.metrics import start_metrics_server
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Status line shown while each pipeline stage runs
+STAGE_STATUS = {
+    "whitepaper": "📄 AI Agent analyzing whitepaper...",
+    "sentiment": "💬 AI Agent analyzing Reddit sentiment...",
+    "news": "📰 AI Agent fetching latest news...",
+    "technical": "📊 Performing technical analysis...",
+    "advice": "🎯 AI Agent generating comprehensive trading advice..."
+}
+
 # Page config
 st.set_page_config(
     page_title="Crypto Analysis",
@@ -14,6 +31,18 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# How often the page re-checks a running analysis job, in seconds
+JOB_POLL_INTERVAL = 0.5
+
+def format_age(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
 # Custom CSS for better styling
 st.markdown("""
 <style>
@@ -237,6 +266,7 @@ with col2:
     )
     
     analyze_button = st.button("🔍 Analyze", type="primary", use_container_width=True)
+    force_refresh = st.checkbox("🔄 Force refresh (ignore cached results)", value=False)
 
 # Helper function to safely display results
 def safe_display_content(content, title="Content"):
@@ -267,128 +297,194 @@ def safe_display_content(content, title="Content"):
             </div>
             """, unsafe_allow_html=True)
 
-# Run analysis when button clicked
-if analyze_button and crypto_input:
-    # Initialize session state for results caching
-    if 'analysis_results' not in st.session_state:
-        st.session_state.analysis_results = {}
+# Placeholder for a tab whose stage hasn't finished yet
+def show_pending(stage):
+    st.info(STAGE_STATUS[stage])
+
+CHART_SERIES = {
+    "bb_upper": "BB upper",
+    "bb_middle": "SMA 20 (BB middle)",
+    "bb_lower": "BB lower",
+    "sma_50": "SMA 50",
+    "macd": "MACD",
+    "macd_signal": "Signal",
+    "rsi": "RSI (14)",
+}
+
+def _chart_frame(series, names):
+    """Long-format frame (date, value, series) of downsampled chart lines"""
+    frames = [
+        pd.DataFrame({'date': pd.to_datetime(series[name]['t'], unit='ms'), 'value': series[name]['y'], 'series': CHART_SERIES[name]})
+        for name in names if name in series
+    ]
+    return pd.concat(frames) if frames else pd.DataFrame(columns=['date', 'value', 'series'])
+
+# Candlesticks with SMA/Bollinger overlays and support/resistance lines, then MACD and RSI panes.
+# The series arrive downsampled (technical_analyst.CHART_POINTS), so the payload stays small.
+def show_technical_charts(chart):
+    candles = pd.DataFrame(chart['candles'])
+    candles['date'] = pd.to_datetime(candles['t'], unit='ms')
+    lines = chart.get('lines', {})
     
-    # Show analysis in progress
-    with st.spinner(f"🔍 Analyzing {crypto_input}..."):
-        try:
-            # Initialize the advisor
-            advisor = CryptoAnalysisAgent()
-            
-            # Initialize technical agent if needed
-            technical_agent = None
-            if show_technical:
-                try:
-                    technical_agent = TechnicalAnalysisAgent()
-                except Exception as e:
-                    st.warning(f"Technical analysis agent failed to initialize: {str(e)}")
-                    technical_agent = None
-            
-            # Progress bar
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            results = {}
-            total_steps = sum([show_whitepaper, show_sentiment, show_news, show_technical, show_advice])
-            current_step = 0
-            
-            # Whitepaper Analysis
-            if show_whitepaper:
-                current_step += 1
-                status_text.text("📄 AI Agent analyzing whitepaper...")
-                progress_bar.progress(int(current_step / total_steps * 100))
-                try:
-                    results['whitepaper'] = advisor.summarize_whitepaper(crypto_input)
-                except Exception as e:
-                    results['whitepaper'] = f"Error analyzing whitepaper: {str(e)}"
-                    logging.error(f"Whitepaper analysis error: {e}")
-            
-            # Sentiment Analysis
-            if show_sentiment:
-                current_step += 1
-                status_text.text("💬 AI Agent analyzing Reddit sentiment...")
-                progress_bar.progress(int(current_step / total_steps * 100))
-                try:
-                    results['sentiment'] = advisor.analyze_sentiment(crypto_input)
-                except Exception as e:
-                    results['sentiment'] = {
-                        'analysis': f"Error analyzing sentiment: {str(e)}",
-                        'positive': [],
-                        'negative': [],
-                        'neutral': []
-                    }
-                    logging.error(f"Sentiment analysis error: {e}")
-            
-            # News Analysis
-            if show_news:
-                current_step += 1
-                status_text.text("📰 AI Agent fetching latest news...")
-                progress_bar.progress(int(current_step / total_steps * 100))
-                try:
-                    results['news'] = advisor.analyze_news_headlines(crypto_input)
-                except Exception as e:
-                    results['news'] = {
-                        'analysis': f"Error analyzing news: {str(e)}",
-                        'bullish': [],
-                        'neutral': [],
-                        'bearish': []
-                    }
-                    logging.error(f"News analysis error: {e}")
-            
-            # Technical Analysis
-            if show_technical and technical_agent:
-                current_step += 1
-                status_text.text("📊 Performing technical analysis...")
-                progress_bar.progress(int(current_step / total_steps * 100))
-                try:
-                    results['technical'] = technical_agent.perform_technical_analysis(crypto_input)
-                except Exception as e:
-                    results['technical'] = {
-                        'error': f"Technical analysis failed: {str(e)}",
-                        'analysis': f"Error performing technical analysis: {str(e)}"
-                    }
-                    logging.error(f"Technical analysis error: {e}")
-            elif show_technical and not technical_agent:
-                results['technical'] = {
-                    'error': "Technical analysis agent not available",
-                    'analysis': "Technical analysis could not be performed due to initialization failure."
-                }
-            
-            # Trading Advice - NOW USES PREVIOUS ANALYSES
-            if show_advice:
-                current_step += 1
-                status_text.text("🎯 AI Agent generating comprehensive trading advice...")
-                progress_bar.progress(int(current_step / total_steps * 100))
-                try:
-                    # Pass all previous analyses to the advice generation
-                    results['advice'] = advisor.generate_advice(crypto_input, previous_analyses=results)
-                except Exception as e:
-                    results['advice'] = {
-                        'advice': f"Error generating advice: {str(e)}",
-                        'success': False
-                    }
-                    logging.error(f"Advice generation error: {e}")
-            
-            # Clear progress indicators
-            progress_bar.empty()
-            status_text.empty()
-            
-            # Store results in session state
-            st.session_state.analysis_results[crypto_input] = results
-            
-        except Exception as e:
-            st.error(f"❌ Error during analysis: {str(e)}")
-            st.exception(e)
-            st.stop()
-        
-    # Display results
-    results = st.session_state.analysis_results.get(crypto_input, {})
+    base = alt.Chart(candles).encode(x=alt.X('date:T', title=None))
+    direction = alt.condition('datum.open <= datum.close', alt.value('#06982d'), alt.value('#ae1325'))
+    wicks = base.mark_rule().encode(
+        y=alt.Y('low:Q', scale=alt.Scale(zero=False), title='Price (USD)'), y2='high:Q', color=direction
+    )
+    bodies = base.mark_bar().encode(
+        y='open:Q', y2='close:Q', color=direction,
+        tooltip=[alt.Tooltip('date:T'), 'open:Q', 'high:Q', 'low:Q', 'close:Q']
+    )
+    overlays = alt.Chart(_chart_frame(lines, ['bb_upper', 'bb_middle', 'bb_lower', 'sma_50'])).mark_line(strokeWidth=1).encode(
+        x='date:T', y='value:Q', color=alt.Color('series:N', title=None, legend=alt.Legend(orient='top'))
+    )
+    layers = [wicks, bodies, overlays]
+    for kind, color in (('support', '#06982d'), ('resistance', '#ae1325')):
+        levels = chart.get('levels', {}).get(kind, [])
+        if levels:
+            layers.append(alt.Chart(pd.DataFrame({'price': levels})).mark_rule(strokeDash=[4, 4], color=color).encode(
+                y='price:Q', tooltip=[alt.Tooltip('price:Q', title=kind.title())]
+            ))
+    st.altair_chart(alt.layer(*layers).properties(height=380).interactive(bind_y=False), use_container_width=True)
+    
+    histogram = chart.get('macd_histogram', {'t': [], 'y': []})
+    histogram = pd.DataFrame({'date': pd.to_datetime(histogram['t'], unit='ms'), 'value': histogram['y']})
+    macd = alt.layer(
+        alt.Chart(histogram).mark_bar(opacity=0.5).encode(
+            x=alt.X('date:T', title=None), y=alt.Y('value:Q', title='MACD'),
+            color=alt.condition('datum.value >= 0', alt.value('#06982d'), alt.value('#ae1325'))
+        ),
+        alt.Chart(_chart_frame(lines, ['macd', 'macd_signal'])).mark_line(strokeWidth=1).encode(
+            x='date:T', y='value:Q', color=alt.Color('series:N', title=None, legend=alt.Legend(orient='top'))
+        ),
+    ).properties(height=160)
+    st.altair_chart(macd, use_container_width=True)
+    
+    rsi = alt.layer(
+        alt.Chart(_chart_frame(lines, ['rsi'])).mark_line(strokeWidth=1).encode(
+            x=alt.X('date:T', title=None), y=alt.Y('value:Q', title='RSI (14)', scale=alt.Scale(domain=[0, 100]))
+        ),
+        alt.Chart(pd.DataFrame({'level': [30, 70]})).mark_rule(strokeDash=[4, 4], color='gray').encode(y='level:Q'),
+    ).properties(height=140)
+    st.altair_chart(rsi, use_container_width=True)
+    
+    if chart.get('points', 0) > len(candles):
+        st.caption(f"Showing {len(candles)} of {chart['points']} candles (downsampled)")
 
-    st.success(f"✅ Analysis complete for {crypto_input}")
+# How many spans the trace waterfall draws
+WATERFALL_MAX_SPANS = 300
+
+# Per-run waterfall of tracing spans (tools/tracing.py): one bar per span, indented by nesting
+def show_trace_waterfall(spans):
+    origin = spans[0]['start']
+    depths = {}
+    rows = []
+    for index, span in enumerate(spans[:WATERFALL_MAX_SPANS]):
+        depths[span['span_id']] = depths.get(span['parent_id'], -1) + 1
+        rows.append({
+            'row': index,
+            'span': '· ' * depths[span['span_id']] + span['name'],
+            'category': span['name'].split('.', 1)[0],
+            'start_ms': (span['start'] - origin) * 1000,
+            'end_ms': (span['end'] - origin) * 1000,
+            'duration_ms': round(span['duration'] * 1000, 1),
+            'details': ", ".join(f"{k}={v}" for k, v in span['attributes'].items()) + (f" ERROR {span['error']}" if span['error'] else ""),
+        })
+    frame = pd.DataFrame(rows)
+    base = alt.Chart(frame).encode(y=alt.Y('row:O', axis=None))
+    bars = base.mark_bar().encode(
+        x=alt.X('start_ms:Q', title='ms since start'), x2='end_ms:Q',
+        color=alt.Color('category:N', title=None, legend=alt.Legend(orient='top')),
+        tooltip=['span:N', 'duration_ms:Q', 'details:N']
+    )
+    labels = base.mark_text(align='left', dx=3, fontSize=11).encode(x='start_ms:Q', text='span:N')
+    st.altair_chart(alt.layer(bars, labels).properties(height=max(120, 20 * len(frame))), use_container_width=True)
+    
+    totals = self_times(spans)
+    st.caption("Time not covered by child spans: " + ", ".join(f"{category} {seconds:.2f}s" for category, seconds in totals.items()))
+    if len(spans) > WATERFALL_MAX_SPANS:
+        st.caption(f"Showing the first {WATERFALL_MAX_SPANS} of {len(spans)} spans")
+
+# Analyses run as background jobs (services/jobs.py); the script only submits
+# and polls them, so reruns and widget interactions don't interrupt a run.
+job_manager = get_job_manager()
+
+# Keep hot and popular assets warm in the background when CACHE_WARMER=1 (no-op once running)
+start_cache_warmer()
+
+# Stream market data from the source in MARKET_FEED_SOURCE, if any (no-op once running)
+start_market_feed()
+
+# Serve Prometheus metrics on METRICS_PORT, if set (no-op once running)
+start_metrics_server()
+
+# Finished results for this session: bounded LRU keyed by normalized asset, stored compressed
+if 'analysis_results' not in st.session_state:
+    st.session_state.analysis_results = SessionResultCache()
+
+# Submit analysis when button clicked (reattaches to a running job for the same request)
+if analyze_button and crypto_input:
+    selected_stages = [
+        stage for stage, enabled in zip(
+            STAGES, [show_whitepaper, show_sentiment, show_news, show_technical, show_advice]
+        ) if enabled
+    ]
+    job = job_manager.submit(crypto_input, selected_stages, force=force_refresh)
+    st.session_state.job_id = job.id
+
+job = job_manager.get(st.session_state.get('job_id'))
+
+# Once finished jobs expire, the page falls back to this session's saved results
+saved = None
+if job is None and st.session_state.get('last_asset'):
+    saved = st.session_state.analysis_results.get(st.session_state.last_asset)
+
+if job or saved:
+    if job:
+        snapshot = job.snapshot()
+        crypto_input = snapshot['asset']
+        results = snapshot['results']
+        partial = snapshot['partial']
+        cached_ages = snapshot['cached_ages']
+    else:
+        crypto_input = st.session_state.last_asset
+        results, partial, cached_ages = saved, {}, {}
+
+    if not job:
+        show_whitepaper, show_sentiment, show_news, show_technical, show_advice = (stage in results for stage in STAGES)
+        st.info(f"Showing your last results for {crypto_input}. Click Analyze to refresh them.")
+    elif not job.done:
+        # Stages render as their results land; the page polls the job until it finishes
+        running = [STAGE_STATUS[stage] for stage in snapshot['running']]
+        status = " · ".join(running) or f"⏳ Waiting to analyze {crypto_input}..."
+        st.progress(int(snapshot['progress'] * 100), text=f"🔍 Analyzing {crypto_input}: {status}")
+        if st.button("⏹ Cancel analysis"):
+            job_manager.cancel(job.id)
+        show_whitepaper, show_sentiment, show_news, show_technical, show_advice = (
+            stage in snapshot['stages'] for stage in STAGES
+        )
+    else:
+        # Save results to the session once per job
+        if st.session_state.get('saved_job_id') != job.id and results:
+            st.session_state.analysis_results.put(crypto_input, results)
+            st.session_state.saved_job_id = job.id
+            st.session_state.last_asset = crypto_input
+
+        # Display whatever the job produced, even if it stopped early
+        show_whitepaper, show_sentiment, show_news, show_technical, show_advice = (stage in results for stage in STAGES)
+
+        if snapshot['status'] == COMPLETED:
+            st.success(f"✅ Analysis complete for {crypto_input}")
+        elif snapshot['status'] == CANCELLED:
+            st.warning(f"⚠️ Analysis for {crypto_input} was cancelled")
+        elif snapshot['status'] == FAILED:
+            st.error(f"❌ Error during analysis: {snapshot['error']}")
+    if cached_ages:
+        st.caption(
+            "⚡ Served from cache: "
+            + ", ".join(f"{stage} ({format_age(age)} ago)" for stage, age in cached_ages.items())
+            + ". Tick 'Force refresh' to recompute."
+        )
 
     # Create tabs for different analyses
     tab_names = []
@@ -403,20 +499,25 @@ if analyze_button and crypto_input:
         tab_index = 0
         
         # Whitepaper Tab
-        if show_whitepaper and 'whitepaper' in results:
+        if show_whitepaper:
             with tabs[tab_index]:
                 st.markdown(f"### 📄 {crypto_input} Whitepaper Summary")
-                safe_display_content(results['whitepaper'], "whitepaper analysis")
+                if 'whitepaper' in results:
+                    safe_display_content(results['whitepaper'], "whitepaper analysis")
+                else:
+                    show_pending('whitepaper')
             tab_index += 1
         
         # Sentiment Tab
-        if show_sentiment and 'sentiment' in results:
+        if show_sentiment:
             with tabs[tab_index]:
                 st.markdown(f"### 💬 {crypto_input} Reddit Sentiment Analysis")
                 
-                sentiment_data = results['sentiment']
+                sentiment_data = results.get('sentiment')
                 
-                if sentiment_data and isinstance(sentiment_data, dict):
+                if 'sentiment' not in results:
+                    show_pending('sentiment')
+                elif sentiment_data and isinstance(sentiment_data, dict):
                     # Check if we have valid data
                     positive_posts = sentiment_data.get('positive', [])
                     neutral_posts = sentiment_data.get('neutral', [])
@@ -431,6 +532,23 @@ if analyze_button and crypto_input:
                     with col3:
                         st.metric("🔴 Negative Posts", len(negative_posts))
 
+                    # Rolling trend from the persistent sentiment history
+                    day_trend = sentiment_data.get('trend', {}).get('24h', {})
+                    deltas = sentiment_data.get('deltas', {})
+                    if day_trend.get('volume'):
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            refresh_delta = deltas.get('since_last_refresh')
+                            st.metric(
+                                "📈 24h Mean Score",
+                                f"{day_trend['mean_score']:+.3f}",
+                                f"{refresh_delta:+.3f}" if refresh_delta is not None else None
+                            )
+                        with col2:
+                            st.metric("📊 24h Post Volume", day_trend['volume'])
+                        with col3:
+                            st.metric("🟢 24h Positive Ratio", f"{day_trend['positive_ratio']:.0%}")
+
                     # Display analysis summary
                     analysis_text = sentiment_data.get('analysis', 'No analysis available')
                     safe_display_content(analysis_text, "sentiment analysis")
@@ -459,13 +577,15 @@ if analyze_button and crypto_input:
             tab_index += 1
 
         # News Tab  
-        if show_news and 'news' in results:
+        if show_news:
             with tabs[tab_index]:
                 st.markdown(f"### 📰 {crypto_input} Latest News Analysis")
                 
-                news_data = results['news']
+                news_data = results.get('news')
                 
-                if news_data and isinstance(news_data, dict):
+                if 'news' not in results:
+                    show_pending('news')
+                elif news_data and isinstance(news_data, dict):
                     # Check if we have the analysis summary
                     if 'analysis' in news_data:
                         safe_display_content(news_data['analysis'], "news analysis")
@@ -505,13 +625,16 @@ if analyze_button and crypto_input:
             tab_index += 1
         
         # Technical Analysis Tab
-        if show_technical and 'technical' in results:
+        if show_technical:
             with tabs[tab_index]:
                 st.markdown(f"### 📊 {crypto_input} Technical Analysis")
                 
-                technical_data = results['technical']
+                # Indicators are published before the AI narrative, so they can show first
+                technical_data = results.get('technical', partial.get('technical'))
                 
-                if technical_data and 'error' not in technical_data:
+                if technical_data is None:
+                    show_pending('technical')
+                elif technical_data and 'error' not in technical_data:
                     # Current Price and Key Metrics
                     col1, col2, col3, col4 = st.columns(4)
                     
@@ -547,6 +670,10 @@ if analyze_button and crypto_input:
                         else:
                             st.metric(f"{signal_emoji} Signal", signal.upper())
                     
+                    # Price and indicator charts
+                    if technical_data.get('chart'):
+                        show_technical_charts(technical_data['chart'])
+                    
                     # Technical Indicators
                     st.subheader("📊 Key Technical Indicators")
                     
@@ -597,6 +724,9 @@ if analyze_button and crypto_input:
                     if technical_data.get('analysis'):
                         st.subheader("🧠 AI Technical Analysis")
                         safe_display_content(technical_data['analysis'], "technical analysis")
+                    elif 'technical' not in results:
+                        st.subheader("🧠 AI Technical Analysis")
+                        st.info("🧠 AI Agent interpreting the indicators...")
                 
                 else:
                     # Show error or fallback message
@@ -610,13 +740,16 @@ if analyze_button and crypto_input:
             tab_index += 1
             
         # Advice Tab
-        if show_advice and 'advice' in results:
+        if show_advice:
             with tabs[tab_index]:
                 st.markdown(f"### 🎯 {crypto_input} Comprehensive Trading Advice")
                 
-                advice_data = results['advice']
+                advice_data = results.get('advice')
                 
-                if advice_data:
+                # Advice synthesizes the other analyses, so it is always filled last
+                if 'advice' not in results:
+                    show_pending('advice')
+                elif advice_data:
                     # Check if advice_data is a dict (new format) or string (old format)
                     if isinstance(advice_data, dict):
                         advice_content = advice_data.get('advice', 'No advice available')
@@ -651,6 +784,15 @@ if analyze_button and crypto_input:
                 else:
                     st.warning("Trading advice generation failed or returned no data.")
 
+# Debug panel: where the last run's time went
+if job and job.done and snapshot.get('trace_id'):
+    with st.expander("🐞 Debug: run trace"):
+        spans = get_trace(snapshot['trace_id'])
+        if spans:
+            show_trace_waterfall(spans)
+        else:
+            st.caption("No spans recorded for this run (tracing disabled with TRACING=0, or the trace has expired).")
+
 # Add footer disclaimer
 st.markdown("""
 <div class="disclaimer-footer">
@@ -658,4 +800,9 @@ st.markdown("""
     This is NOT financial advice. Always do your own research (DYOR) and consult with financial professionals 
     before making any investment decisions. Cryptocurrency trading carries significant risks.
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Poll a running analysis job again once the page has rendered
+if job and not job.done:
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,116 @@
+"""
+Helpers shared by the benchmark runners: latency statistics, run metadata,
+JSON results and baseline comparison.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile (pct in 0..100) of a list of numbers."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def latency_stats(samples):
+    """Summary of latency samples (seconds) in milliseconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(ms),
+        "mean_ms": sum(ms) / len(ms) if ms else None,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**config):
+    """Where and how a benchmark ran, stored alongside its results."""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": config,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def default_output(name):
+    return os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+
+
+def write_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Results written to {path}")
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def find_regressions(current, baseline, metric, threshold):
+    """
+    Compare {name: {metric: value}} entries against a baseline.
+
+    Returns one dict per entry whose metric grew by more than threshold
+    (0.2 = 20%) over the baseline. Entries missing from either side are skipped.
+    """
+    regressions = []
+    for name, stats in current.items():
+        before = (baseline.get(name) or {}).get(metric)
+        after = (stats or {}).get(metric)
+        if not before or after is None:
+            continue
+        ratio = after / before
+        if ratio > 1 + threshold:
+            regressions.append({"name": name, "metric": metric, "baseline": before, "current": after, "ratio": ratio})
+    return regressions
+
+
+def report_regressions(regressions):
+    """Print regressions; returns the process exit code (1 if any)."""
+    if not regressions:
+        print("✅ No regressions against baseline")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) against baseline:")
+    for r in regressions:
+        print(f"  {r['name']}: {r['metric']} {r['baseline']:.3f} -> {r['current']:.3f} ({r['ratio']:.2f}x)")
+    return 1
@@ -0,0 +1,233 @@
+"""
+indicator_bench.py
+
+Micro-benchmarks for the technical indicator and signal kernels in
+TechnicalAnalysisAgent, over synthetic OHLC series. Two sweeps:
+
+- history length: one asset, 100 to 1,000,000 bars
+- asset count: 1 to 1,000 assets with --asset-bars bars each
+
+Each case records time per call (median and min of --repeat samples, with the
+loop count auto-ranged like timeit) and Python allocations per call
+(tracemalloc peak). Nothing touches the network.
+
+Results are compared with the stored baseline (benchmarks/baselines/indicators.json).
+The runner exits non-zero when a case slows down or allocates more than the
+configured thresholds, and with status 2 when there is no baseline to compare
+against. Write a new baseline with --save-baseline.
+Baselines are machine-specific: regenerate them on the machine that runs the
+comparison.
+
+Run with: python -m benchmarks.indicator_bench --bars 100,10000,1000000 --assets 1,100
+"""
+
+import gc
+import os
+import time
+import logging
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ._common import (
+    percentile, run_metadata, default_output, write_results,
+    load_results, find_regressions, report_regressions
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "indicators.json")
+
+MB = 1024 * 1024
+
+KERNELS = {
+    "rsi": lambda agent, df: agent.calculate_rsi(df["close"]),
+    "macd": lambda agent, df: agent.calculate_macd(df["close"]),
+    "bollinger_bands": lambda agent, df: agent.calculate_bollinger_bands(df["close"]),
+    "support_resistance": lambda agent, df: agent.calculate_support_resistance(df),
+    "technical_signals": lambda agent, df: agent.get_technical_signals(df),
+    "chart_series": lambda agent, df: agent.chart_series(df),
+}
+
+
+def synthetic_ohlc(bars, seed=0):
+    """Deterministic geometric random walk shaped like CoinGecko OHLC data (4h candles)."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.004, bars))
+    timestamps = 1_700_000_000_000 + np.arange(bars, dtype=np.int64) * 4 * 3600 * 1000
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + spread),
+        "low": np.minimum(open_, close) * (1 - spread),
+        "close": close,
+    })
+
+
+def time_call(func, repeat=5, min_time=0.2):
+    """Seconds per call: auto-range the loop count, then take `repeat` samples."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or loops >= 100000:
+            break
+        loops *= 10 if elapsed < min_time / repeat / 10 else 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+    return samples, loops
+
+
+def measure_allocations(func):
+    """Peak and retained traced memory (MB) for one call. numpy buffers are traced too."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak_alloc_mb": (peak - before) / MB, "retained_mb": (current - before) / MB}
+
+
+def bench_case(agent, kernel, frames, repeat, min_time):
+    def run():
+        return [KERNELS[kernel](agent, df) for df in frames]
+
+    samples, loops = time_call(run, repeat, min_time)
+    median = percentile(samples, 50)
+    return {
+        "kernel": kernel,
+        "bars": len(frames[0]),
+        "assets": len(frames),
+        "loops": loops,
+        "median_ms": median * 1000,
+        "min_ms": min(samples) * 1000,
+        "per_asset_ms": median * 1000 / len(frames),
+        **measure_allocations(run),
+    }
+
+
+def run_benchmark(kernels, bars_sweep, assets_sweep, asset_bars, repeat=5, min_time=0.2, seed=0):
+    from agents.technical_analyst import TechnicalAnalysisAgent
+
+    # The kernels never touch the LLM; building the agent only creates the client
+    agent = TechnicalAnalysisAgent()
+    cases = {}
+
+    for bars in bars_sweep:
+        frames = [synthetic_ohlc(bars, seed)]
+        for kernel in kernels:
+            logging.info(f"⏳ {kernel}: {bars} bars")
+            cases[f"{kernel}/bars={bars}/assets=1"] = bench_case(agent, kernel, frames, repeat, min_time)
+
+    for assets in assets_sweep:
+        frames = [synthetic_ohlc(asset_bars, seed + i) for i in range(assets)]
+        for kernel in kernels:
+            key = f"{kernel}/bars={asset_bars}/assets={assets}"
+            if key in cases:
+                continue
+            logging.info(f"⏳ {kernel}: {assets} assets x {asset_bars} bars")
+            cases[key] = bench_case(agent, kernel, frames, repeat, min_time)
+
+    return cases
+
+
+def _parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _parse_overrides(values):
+    """Parse ["technical_signals=0.5"] into {"technical_signals": 0.5}."""
+    overrides = {}
+    for value in values or []:
+        kernel, _, threshold = value.partition("=")
+        overrides[kernel] = float(threshold)
+    return overrides
+
+
+def check_regressions(cases, baseline_cases, threshold, alloc_threshold, overrides):
+    regressions = []
+    for kernel in {case["kernel"] for case in cases.values()}:
+        current = {name: case for name, case in cases.items() if case["kernel"] == kernel}
+        regressions += find_regressions(current, baseline_cases, "median_ms", overrides.get(kernel, threshold))
+        regressions += find_regressions(current, baseline_cases, "peak_alloc_mb", alloc_threshold)
+    return regressions
+
+
+def print_report(cases):
+    print(f"\n{'case':<50}{'median ms':>12}{'min ms':>12}{'ms/asset':>12}{'peak MB':>10}")
+    for name, case in cases.items():
+        print(f"{name:<50}{case['median_ms']:>12.3f}{case['min_ms']:>12.3f}"
+              f"{case['per_asset_ms']:>12.4f}{case['peak_alloc_mb']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Technical indicator kernel micro-benchmarks")
+    parser.add_argument("--kernels", default=",".join(KERNELS), help="Comma-separated kernels to run")
+    parser.add_argument("--bars", default="100,1000,10000,100000,1000000", help="History lengths (one asset)")
+    parser.add_argument("--assets", default="1,10,100,1000", help="Asset counts")
+    parser.add_argument("--asset-bars", type=int, default=540, help="Bars per asset in the asset sweep (90 days of 4h candles)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per case for loop auto-ranging")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Results JSON path")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed median time growth (0.25 = 25%%)")
+    parser.add_argument("--alloc-threshold", type=float, default=0.25, help="Allowed peak allocation growth")
+    parser.add_argument("--kernel-threshold", action="append", help="Per-kernel time threshold, e.g. technical_signals=0.5")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    kernels = [k.strip() for k in args.kernels.split(",") if k.strip()]
+    unknown = set(kernels) - set(KERNELS)
+    if unknown:
+        parser.error(f"Unknown kernels: {', '.join(sorted(unknown))}")
+
+    cases = run_benchmark(
+        kernels, _parse_ints(args.bars), _parse_ints(args.assets),
+        args.asset_bars, args.repeat, args.min_time, args.seed
+    )
+    results = {
+        **run_metadata(
+            kernels=kernels, bars=args.bars, assets=args.assets, asset_bars=args.asset_bars,
+            repeat=args.repeat, min_time=args.min_time, seed=args.seed,
+            numpy=np.__version__, pandas=pd.__version__
+        ),
+        "cases": cases,
+    }
+
+    print_report(cases)
+    write_results(results, args.output or default_output("indicators"))
+
+    if args.save_baseline:
+        write_results(results, args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Nothing to compare against is a failed check, not a pass
+        print(f"❌ No baseline at {args.baseline}; run with --save-baseline on this machine to create one")
+        return 2
+
+    regressions = check_regressions(
+        cases, load_results(args.baseline).get("cases", {}),
+        args.threshold, args.alloc_threshold, _parse_overrides(args.kernel_threshold)
+    )
+    return report_regressions(regressions)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+"""
+pipeline_bench.py
+
+End-to-end benchmark of the whitepaper -> sentiment -> news -> technical -> advice
+pipeline for a list of assets. The pipeline runs exactly as the app runs it
+(agents.pipeline.run_pipeline). By default every timed run computes every
+stage; --stage-cache instead serves fresh results from the shared stage cache
+and result store, as the app does for repeat requests, and is reported (and
+gated against baselines) as its own "cached" mode. By default the providers
+are replaced with the local stand-in server (fake_providers), which replays
+recorded fixtures where they exist.
+
+Reports p50/p95/p99 per stage and per pipeline run, external calls per
+provider, LLM calls/tokens per call site, cache hits and peak memory. The
+results are written as JSON. Pass --baseline to compare p95 latencies against
+an earlier results file; the runner exits non-zero on regressions, so CI can
+gate on it.
+
+Run with: python -m benchmarks.pipeline_bench --assets Bitcoin,Ethereum --runs 3
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import urllib.request
+
+from ._common import (
+    latency_stats, run_metadata, peak_rss_mb, default_output,
+    write_results, load_results, find_regressions, report_regressions
+)
+
+
+def _fetch_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/__stats", timeout=5) as response:
+        return json.load(response)
+
+
+def _reset_stats(base_url):
+    request = urllib.request.Request(f"{base_url}/__reset", data=b"{}", method="POST")
+    urllib.request.urlopen(request, timeout=5).close()
+
+
+def _external_calls(stats):
+    """Fold the stand-in server counters ("bedrock invoke 200": n) into per-provider totals."""
+    calls = {}
+    for key, count in stats.items():
+        provider, route, status = (key.split(" ") + ["", ""])[:3]
+        if route == "total":
+            continue
+        entry = calls.setdefault(provider, {"total": 0, "errors": 0, "throttled": 0, "by_route": {}})
+        entry["total"] += count
+        entry["by_route"][route] = entry["by_route"].get(route, 0) + count
+        if status == "429":
+            entry["throttled"] += count
+        elif not status.startswith("2"):
+            entry["errors"] += count
+    return calls
+
+
+def _layer_stats(layer):
+    from tools.metrics import cache_requests
+    return {"hits": cache_requests.value(layer=layer, result="hit"),
+            "misses": cache_requests.value(layer=layer, result="miss")}
+
+
+def _cache_stats():
+    """Hit/miss counters of the caches the pipeline goes through."""
+    from agents.pipeline import stage_cache
+    from tools.sentiment_analysis import get_sentiment_engine
+    from llm.summarizer import get_summary_cache
+    return {
+        # Stage results overall, then per layer: process memory, then the shared result store
+        "stages": stage_cache.cache_info(),
+        "stage_memory": _layer_stats("stage_memory"),
+        "stage_store": _layer_stats("stage_store"),
+        "sentiment_scores": get_sentiment_engine().cache_info(),
+        "chunk_summaries": get_summary_cache().cache_info(),
+    }
+
+
+def _cache_delta(before, after):
+    delta = {}
+    for name, stats in after.items():
+        start = before.get(name, {})
+        hits = stats["hits"] - start.get("hits", 0)
+        misses = stats["misses"] - start.get("misses", 0)
+        delta[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else None,
+        }
+    return delta
+
+
+def _use_providers(args):
+    """Point the app at the selected providers; returns the stand-in base URL (or None for live)."""
+    if args.providers == "live":
+        return None
+
+    from fake_providers.server import start_server, build_configs, provider_environment
+
+    if args.provider_url:
+        base_url = args.provider_url.rstrip("/")
+    else:
+        configs = build_configs(args.latency, args.error_rate, args.throttle_rate)
+        kwargs = {"fixtures_dir": args.fixtures} if args.fixtures else {}
+        base_url = start_server(configs=configs, seed=args.seed, **kwargs).base_url
+
+    # Must happen before the agents are imported: provider URLs are read at import/init time
+    os.environ.update(provider_environment(base_url))
+    return base_url
+
+
+def run_benchmark(assets, stages, runs, warmup=0, trace_memory=False, base_url=None, use_stage_cache=False):
+    from agents.pipeline import STAGES, run_pipeline, stage_failed, stage_cache
+    from agents.analyst import CryptoAnalysisAgent
+    from agents.technical_analyst import TechnicalAnalysisAgent
+    from llm.instrumentation import metrics_registry
+
+    stages = [stage for stage in STAGES if stage in stages]
+
+    start = time.perf_counter()
+    advisor = CryptoAnalysisAgent()
+    technical_agent = TechnicalAnalysisAgent() if "technical" in stages else None
+    setup_time = time.perf_counter() - start
+
+    cache = stage_cache if use_stage_cache else None
+
+    def run_once(asset, timings, errors, memory):
+        stage_starts = {}
+
+        def on_stage(stage, step, total):
+            if trace_memory:
+                tracemalloc.reset_peak()
+            stage_starts[stage] = time.perf_counter()
+
+        def on_result(stage, result, cached):
+            if timings is not None:
+                timings[stage].append(time.perf_counter() - stage_starts[stage])
+                errors[stage] += int(stage_failed(result))
+                if trace_memory:
+                    memory[stage] = max(memory[stage], tracemalloc.get_traced_memory()[1] / (1024 * 1024))
+
+        pipeline_start = time.perf_counter()
+        run_pipeline(asset, advisor, technical_agent, stages, on_stage=on_stage, cache=cache, on_result=on_result)
+        if timings is not None:
+            timings["pipeline"].append(time.perf_counter() - pipeline_start)
+
+    for i in range(warmup):
+        for asset in assets:
+            logging.info(f"⏳ Warmup {i + 1}/{warmup}: {asset}")
+            run_once(asset, None, None, None)
+
+    # Measure only the timed runs
+    metrics_registry.clear()
+    caches_before = _cache_stats()
+    if base_url:
+        _reset_stats(base_url)
+    if trace_memory:
+        tracemalloc.start()
+
+    timings = {stage: [] for stage in stages + ["pipeline"]}
+    errors = {stage: 0 for stage in stages}
+    memory = {stage: 0.0 for stage in stages}
+    for i in range(runs):
+        for asset in assets:
+            logging.info(f"⏳ Run {i + 1}/{runs}: {asset}")
+            run_once(asset, timings, errors, memory)
+
+    if trace_memory:
+        tracemalloc.stop()
+
+    pipelines = len(timings["pipeline"])
+    stage_report = {}
+    for stage in stages:
+        stage_report[stage] = {**latency_stats(timings[stage]), "errors": errors[stage]}
+        if trace_memory:
+            stage_report[stage]["peak_traced_mb"] = memory[stage]
+
+    external_calls = _external_calls(_fetch_stats(base_url)) if base_url else None
+    if external_calls:
+        for entry in external_calls.values():
+            entry["per_pipeline"] = entry["total"] / pipelines if pipelines else None
+
+    return {
+        "mode": "cached" if use_stage_cache else "uncached",
+        "setup_s": setup_time,
+        "stages": stage_report,
+        "pipeline": latency_stats(timings["pipeline"]),
+        "external_calls": external_calls,
+        "llm": metrics_registry.summary(by="call_site"),
+        "cache": _cache_delta(caches_before, _cache_stats()),
+        "memory": {"peak_rss_mb": peak_rss_mb()},
+    }
+
+
+def print_report(report):
+    if report["mode"] == "cached":
+        print("\nMode: cached (stage results served from the stage cache and result store while fresh)")
+    else:
+        print("\nMode: uncached (every stage computed on every run)")
+    print(f"\n{'stage':<12}{'runs':>6}{'err':>5}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    rows = list(report["stages"].items()) + [("pipeline", {**report["pipeline"], "errors": ""})]
+    for name, stats in rows:
+        print(f"{name:<12}{stats['runs']:>6}{stats['errors']:>5}{stats['p50_ms']:>11.1f}{stats['p95_ms']:>11.1f}{stats['p99_ms']:>11.1f}")
+
+    if report["external_calls"]:
+        print("\nExternal calls:")
+        for provider, entry in sorted(report["external_calls"].items()):
+            print(f"  {provider:<10} {entry['total']:>5} ({entry['per_pipeline']:.1f}/pipeline, "
+                  f"{entry['throttled']} throttled, {entry['errors']} errors)")
+
+    print("\nCaches:")
+    for name, entry in report["cache"].items():
+        rate = f"{entry['hit_rate']:.0%}" if entry["hit_rate"] is not None else "n/a"
+        print(f"  {name:<18} {entry['hits']} hits / {entry['misses']} misses ({rate})")
+
+    print(f"\nPeak RSS: {report['memory']['peak_rss_mb']} MB, setup {report['setup_s']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end analysis pipeline benchmark")
+    parser.add_argument("--assets", default="Bitcoin,Ethereum,Solana", help="Comma-separated asset names")
+    parser.add_argument("--stages", default="whitepaper,sentiment,news,technical,advice")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per asset")
+    parser.add_argument("--warmup", type=int, default=0, help="Untimed runs per asset before measuring")
+    parser.add_argument("--providers", choices=["stand-in", "live"], default="stand-in")
+    parser.add_argument("--provider-url", help="Use an already running stand-in server instead of starting one")
+    parser.add_argument("--fixtures", help="Recorded fixtures directory for the stand-in server")
+    parser.add_argument("--latency", action="append", help="Stand-in latency, e.g. bedrock=lognormal:1500,0.4")
+    parser.add_argument("--error-rate", action="append", help="Stand-in error rate, e.g. serper=0.02")
+    parser.add_argument("--throttle-rate", action="append", help="Stand-in 429 rate, e.g. bedrock=0.05")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage-cache", action="store_true",
+                        help="Time cached runs: serve fresh stage results from the stage cache and result store")
+    parser.add_argument("--trace-memory", action="store_true", help="Track per-stage peak Python allocations (slower)")
+    parser.add_argument("--data-dir", help="CRYPTO_DATA_DIR for the run (defaults to a fresh temp dir)")
+    parser.add_argument("--output", default=None, help="Results JSON path")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare p95 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 growth over baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    # Keep benchmark history out of the app's sentiment store
+    os.environ["CRYPTO_DATA_DIR"] = args.data_dir or tempfile.mkdtemp(prefix="crypto-bench-")
+    base_url = _use_providers(args)
+
+    assets = [a.strip() for a in args.assets.split(",") if a.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    report = run_benchmark(assets, stages, args.runs, args.warmup, args.trace_memory, base_url, args.stage_cache)
+    results = {
+        **run_metadata(
+            assets=assets, stages=stages, runs=args.runs, warmup=args.warmup, providers=args.providers,
+            stage_cache=args.stage_cache,
+            latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed
+        ),
+        **report,
+    }
+
+    print_report(report)
+    write_results(results, args.output or default_output(f"pipeline-{report['mode']}"))
+
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        if baseline.get("mode", "uncached") != report["mode"]:
+            print(f"❌ Baseline {args.baseline} was recorded in {baseline.get('mode', 'uncached')} mode, "
+                  f"this run is {report['mode']}")
+            return 2
+        current = {**results["stages"], "pipeline": results["pipeline"]}
+        previous = {**baseline.get("stages", {}), "pipeline": baseline.get("pipeline", {})}
+        return report_regressions(find_regressions(current, previous, "p95_ms", args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+"""
+cli.py
+
+Batch analysis of a watchlist: one asset per line (blank lines and # comments
+are ignored), from a file or stdin. The selected stages run for several assets
+in parallel, and one JSON line per asset is written as soon as that asset
+finishes:
+
+    {"asset": ..., "status": "ok" | "partial" | "error", "stages": [...],
+     "results": {stage: result}, "failed_stages": [...], "cached_stages": [...],
+     "stage_ages": {stage: seconds}, "started_at": ..., "finished_at": ..., "duration_s": ...}
+
+stage_ages holds how old each stage's result was at finished_at (cached
+results may already have been old when they were served).
+
+The output file doubles as the checkpoint. --resume skips assets that already
+have an "ok" record in it. --skip-if-fresh skips them only while every stage's
+result in that record is within its cache TTL (see STAGE_TTLS). New records are appended.
+
+Run with: python cli.py watchlist.txt --stages sentiment,news,advice --parallel 4 --output nightly.jsonl --resume
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents.pipeline import (
+    STAGES, run_pipeline, stage_cache, stage_failed, stage_params, normalize_asset, get_advisor, get_technical_agent
+)
+
+
+def read_watchlist(stream):
+    """Asset names from a watchlist, in order and without duplicates."""
+    assets, seen = [], set()
+    for line in stream:
+        asset = line.split("#", 1)[0].strip()
+        if asset and normalize_asset(asset) not in seen:
+            seen.add(normalize_asset(asset))
+            assets.append(asset)
+    return assets
+
+
+def read_checkpoint(path):
+    """Latest record per asset from an earlier output file (missing file -> {})."""
+    records = {}
+    if not path or not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            records[normalize_asset(record["asset"])] = record
+    return records
+
+
+def stage_age(record, stage, now=None):
+    """Seconds since a record's stage result was computed, or None when unknown."""
+    age = record.get("stage_ages", {}).get(stage)
+    if age is None:
+        return None
+    return (now or time.time()) - record["finished_at"] + age
+
+
+def is_fresh(record, stages, now=None):
+    """True when an earlier record covers the stages and all of their results are still within their TTL."""
+    if not record or record.get("status") != "ok" or not set(stages) <= set(record.get("stages", [])):
+        return False
+    now = now or time.time()
+    ages = [stage_age(record, stage, now) for stage in stages]
+    return all(age is not None and age < stage_cache.ttls.get(stage, 0) for stage, age in zip(stages, ages))
+
+
+def should_skip(record, stages, resume, skip_if_fresh):
+    if resume and record and record.get("status") == "ok" and set(stages) <= set(record.get("stages", [])):
+        return True
+    return skip_if_fresh and is_fresh(record, stages)
+
+
+def analyze_asset(asset, stages, force=False):
+    """Run the stages for one asset and build its output record."""
+    started_at = time.time()
+    cached_stages = []
+    computed_at = {}  # stage -> when its result was computed
+
+    def on_result(stage, result, cached):
+        now = time.time()
+        if cached:
+            cached_stages.append(stage)
+            age = stage_cache.age(asset, stage, stage_params(stage, stages))
+            now -= age or 0.0
+        computed_at[stage] = now
+
+    try:
+        technical_agent = get_technical_agent() if "technical" in stages else None
+        results = run_pipeline(
+            asset, get_advisor(), technical_agent,
+            stages=stages, cache=stage_cache, force=force, on_result=on_result
+        )
+        failed = [stage for stage, result in results.items() if stage_failed(result)]
+        status = "ok" if not failed else ("partial" if len(failed) < len(results) else "error")
+        record = {"asset": asset, "status": status, "stages": stages, "results": results,
+                  "failed_stages": failed, "cached_stages": cached_stages}
+    except Exception as e:
+        logging.error(f"❌ Analysis of {asset} failed: {e}")
+        record = {"asset": asset, "status": "error", "stages": stages, "results": {},
+                  "failed_stages": stages, "cached_stages": [], "error": str(e)}
+
+    finished_at = time.time()
+    record.update(
+        stage_ages={stage: round(finished_at - at, 3) for stage, at in computed_at.items()},
+        started_at=started_at, finished_at=finished_at, duration_s=round(finished_at - started_at, 3)
+    )
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a watchlist and write one JSON line per asset")
+    parser.add_argument("watchlist", nargs="?", default="-", help="Watchlist file, one asset per line ('-' for stdin)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages")
+    parser.add_argument("--parallel", type=int, default=int(os.getenv("BATCH_PARALLELISM", 2)), help="Assets analyzed at once")
+    parser.add_argument("--output", help="JSONL output (and checkpoint) file; stdout when omitted")
+    parser.add_argument("--resume", action="store_true", help="Skip assets with a complete record in --output")
+    parser.add_argument("--skip-if-fresh", action="store_true", help="Skip assets whose record in --output is within the stage TTLs")
+    parser.add_argument("--force", action="store_true", help="Recompute stages even if cached")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    stages = [stage for stage in STAGES if stage in stages]
+    if (args.resume or args.skip_if_fresh) and not args.output:
+        parser.error("--resume and --skip-if-fresh need --output (the checkpoint)")
+
+    if args.watchlist == "-":
+        assets = read_watchlist(sys.stdin)
+    else:
+        with open(args.watchlist) as f:
+            assets = read_watchlist(f)
+
+    checkpoint = read_checkpoint(args.output)
+    pending = [a for a in assets if not should_skip(checkpoint.get(normalize_asset(a)), stages, args.resume, args.skip_if_fresh)]
+    if len(pending) < len(assets):
+        logging.warning(f"⚠️ Skipping {len(assets) - len(pending)} of {len(assets)} assets already in {args.output}")
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    failures = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(args.parallel, 1)) as pool:
+            futures = {pool.submit(analyze_asset, asset, stages, args.force): asset for asset in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                failures += record["status"] != "ok"
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                logging.info(f"✅ [{done}/{len(pending)}] {record['asset']}: {record['status']} in {record['duration_s']:.1f}s")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,4 @@
+from .server import start_server, build_configs, provider_environment, FakeProviderServer, LatencyModel, ProviderConfig
+from .feed_server import start_feed_server, FeedServer
+
+__all__ = ["start_server", "build_configs", "provider_environment", "FakeProviderServer", "LatencyModel", "ProviderConfig", "start_feed_server", "FeedServer"]
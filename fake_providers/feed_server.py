@@ -0,0 +1,150 @@
+"""
+feed_server.py
+
+Local stand-in for a streaming market-data socket. Every client connection
+gets newline-delimited JSON events (the tools.market_feed format): either a
+recorded JSONL file replayed at N× speed, or synthetic price ticks per coin
+(a random walk around the fixture prices in fixtures/coins.json) with a
+candle closed every --candle-ticks ticks.
+
+Point the app at it with:
+
+    MARKET_FEED_SOURCE=socket
+    MARKET_FEED_ADDRESS=127.0.0.1:8766
+
+Run with: python -m fake_providers.feed_server --port 8766 --assets bitcoin,ethereum --tick 1
+"""
+
+import os
+import json
+import math
+import time
+import zlib
+import random
+import logging
+import argparse
+import threading
+import socketserver
+
+from .server import FIXTURES_DIR
+
+DEFAULT_ASSETS = "bitcoin,ethereum,solana"
+
+
+def _fixture_prices(fixtures_dir=FIXTURES_DIR):
+    path = os.path.join(fixtures_dir, "coins.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {coin_id: coin["price"] for coin_id, coin in json.load(f).items()}
+
+
+def replay_events(path, speed=1.0):
+    """Events from a recording, spaced by their recorded timestamps divided by speed (0 = no delay)."""
+    previous = None
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if previous is not None and speed > 0:
+                time.sleep(max(event["timestamp"] - previous, 0) / speed)
+            previous = event["timestamp"]
+            yield event
+
+
+def synthetic_events(assets, tick=1.0, candle_ticks=60, volatility=0.001, seed=None):
+    """Endless price ticks for each asset, plus a candle every candle_ticks ticks."""
+    prices = _fixture_prices()
+    state = {}
+    for asset in assets:
+        price = prices.get(asset, 1.0 + zlib.crc32(asset.encode()) % 500)
+        state[asset] = {"rng": random.Random(seed if seed is not None else zlib.crc32(asset.encode())),
+                        "price": price, "ticks": []}
+    interval = tick * candle_ticks
+    while True:
+        now = time.time()
+        for asset, s in state.items():
+            s["price"] *= math.exp(s["rng"].gauss(0, volatility))
+            s["ticks"].append(s["price"])
+            yield {"type": "price", "asset": asset, "timestamp": now, "price": round(s["price"], 8)}
+            if len(s["ticks"]) >= candle_ticks:
+                ticks, s["ticks"] = s["ticks"], []
+                yield {
+                    "type": "candle", "asset": asset, "timestamp": now - interval, "interval": int(interval),
+                    "open": round(ticks[0], 8), "high": round(max(ticks), 8), "low": round(min(ticks), 8),
+                    "close": round(ticks[-1], 8), "volume": None,
+                }
+        time.sleep(tick)
+
+
+class FeedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        logging.info(f"✅ Feed client connected: {self.client_address[0]}:{self.client_address[1]}")
+        try:
+            for event in self.server.events():
+                self.wfile.write((json.dumps(event) + "\n").encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        logging.info(f"⚠️ Feed client disconnected: {self.client_address[0]}:{self.client_address[1]}")
+
+
+class FeedServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, events):
+        super().__init__(address, FeedHandler)
+        self.events = events
+
+    @property
+    def address(self):
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+
+def event_source(replay=None, speed=1.0, assets=None, tick=1.0, candle_ticks=60):
+    """A factory of per-connection event streams: the recording if given, otherwise synthetic ticks."""
+    assets = assets or DEFAULT_ASSETS.split(",")
+    if replay:
+        return lambda: replay_events(replay, speed)
+    return lambda: synthetic_events(assets, tick, candle_ticks)
+
+
+def start_feed_server(host="127.0.0.1", port=0, **options):
+    """Start the feed stand-in on a background thread (options as for event_source). Returns the server."""
+    server = FeedServer((host, port), event_source(**options))
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-feed").start()
+    logging.info(f"✅ Fake market feed listening on {server.address}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a streaming market-data socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_FEED_PORT", 8766)))
+    parser.add_argument("--replay", help="JSONL recording to stream instead of synthetic ticks")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument("--assets", default=DEFAULT_ASSETS, help="Comma-separated coin ids for synthetic ticks")
+    parser.add_argument("--tick", type=float, default=1.0, help="Seconds between synthetic ticks")
+    parser.add_argument("--candle-ticks", type=int, default=60, help="Ticks per synthetic candle")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    assets = [a.strip() for a in args.assets.split(",") if a.strip()]
+    server = FeedServer((args.host, args.port), event_source(args.replay, args.speed, assets, args.tick, args.candle_ticks))
+
+    print(f"Fake market feed listening on {server.address}")
+    print("  export MARKET_FEED_SOURCE=socket")
+    print(f"  export MARKET_FEED_ADDRESS={server.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
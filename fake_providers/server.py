@@ -0,0 +1,545 @@
+"""
+server.py
+
+Local stand-in for the external providers the pipeline calls, so it can be
+benchmarked and load-tested without paid APIs or their latency noise:
+
+- Serper:     POST /search
+- CoinGecko:  GET  /api/v3/search, /api/v3/coins/{id}, /api/v3/coins/{id}/ohlc,
+              /api/v3/coins/{id}/market_chart
+- Bedrock:    POST /model/{modelId}/invoke, /model/{modelId}/invoke-with-response-stream
+- Traces:     POST /v1/traces (OTLP/HTTP JSON collector stand-in, see tools/tracing.py)
+
+Point the app at it with:
+
+    SERPER_URL=http://127.0.0.1:8765/search
+    COINGECKO_API_URL=http://127.0.0.1:8765/api/v3
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:8765
+
+Responses come from recorded fixtures when present (fixtures/<provider>/<key>.json,
+see recorded_key()), otherwise from templates and deterministic synthetic data.
+Latency, error rate and 429/ThrottlingException rate are configurable per
+provider. GET /__stats returns request counts; POST /__reset clears them.
+GET /__traces returns the spans collected on /v1/traces.
+
+Run with: python -m fake_providers.server --port 8765 --latency bedrock=lognormal:1500,0.4
+"""
+
+import os
+import re
+import json
+import math
+import time
+import zlib
+import base64
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PROVIDERS = ("serper", "coingecko", "bedrock")
+
+
+class LatencyModel:
+    """
+    Latency distribution parsed from a spec string (milliseconds):
+    "fixed:50", "uniform:20,200", "normal:100,20" or "lognormal:120,0.6"
+    (median and sigma).
+    """
+
+    def __init__(self, spec="fixed:0"):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a] or [0.0]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng=random):
+        """Return one latency sample in seconds."""
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.args[0], self.args[1])
+        elif self.kind == "normal":
+            ms = rng.gauss(self.args[0], self.args[1])
+        else:
+            ms = self.args[0] * math.exp(rng.gauss(0, self.args[1]))
+        return max(ms, 0.0) / 1000
+
+
+class ProviderConfig:
+    def __init__(self, latency="fixed:0", error_rate=0.0, throttle_rate=0.0):
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+
+def recorded_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class FakeProviderState:
+    """Config, fixtures and request counters shared by all handler threads."""
+
+    def __init__(self, configs=None, fixtures_dir=FIXTURES_DIR, seed=None):
+        self.configs = {provider: ProviderConfig() for provider in PROVIDERS}
+        self.configs.update(configs or {})
+        self.fixtures_dir = fixtures_dir
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.spans = deque(maxlen=10000)
+        self.lock = threading.Lock()
+        self.templates = self._load_json("serper.json") or {}
+        self.coins = self._load_json("coins.json") or {}
+        self.bedrock = self._load_json("bedrock.json") or {}
+
+    def _load_json(self, *parts):
+        path = os.path.join(self.fixtures_dir, *parts)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def recorded(self, provider, key):
+        """A recorded response for this provider/key, if one was dropped into fixtures/."""
+        return self._load_json(provider, f"{key}.json")
+
+    def count(self, provider, route, status):
+        with self.lock:
+            self.stats[f"{provider} {route} {status}"] += 1
+            self.stats[f"{provider} total"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.spans.clear()
+
+    def collect_spans(self, payload):
+        """Store the spans of an OTLP/HTTP JSON export request. Returns how many were received."""
+        spans = []
+        for resource in payload.get("resourceSpans", []):
+            attributes = {a["key"]: a["value"] for a in resource.get("resource", {}).get("attributes", [])}
+            service = attributes.get("service.name", {}).get("stringValue")
+            for scope in resource.get("scopeSpans", []):
+                spans.extend({**span, "service": service} for span in scope.get("spans", []))
+        with self.lock:
+            self.spans.extend(spans)
+            self.stats["traces spans"] += len(spans)
+        return len(spans)
+
+    def traces(self):
+        with self.lock:
+            return list(self.spans)
+
+
+# ---------------------------------------------------------------- Serper
+
+def _query_asset(query):
+    quoted = re.search(r'"([^"]+)"', query)
+    if quoted:
+        return quoted.group(1)
+    return re.split(r"\s+(?:white paper|\(site:)", query, maxsplit=1)[0].strip() or query
+
+
+def serper_search(state, body):
+    query = body.get("q", "")
+    num = int(body.get("num", 10))
+    recorded = state.recorded("serper", recorded_key(query))
+    if recorded is not None:
+        return recorded
+
+    if "white paper" in query:
+        kind = "whitepaper"
+    elif "reddit.com" in query:
+        kind = "reddit"
+    elif "news" in query:
+        kind = "news"
+    else:
+        kind = "default"
+
+    asset = _query_asset(query)
+    slug = asset.lower().replace(" ", "-")
+    organic = []
+    for position, template in enumerate(state.templates.get(kind, state.templates.get("default", []))[:num], 1):
+        organic.append({
+            key: value.replace("{asset}", asset).replace("{slug}", slug) if isinstance(value, str) else value
+            for key, value in template.items()
+        } | {"position": position})
+
+    return {
+        "searchParameters": {"q": query, "gl": body.get("gl", "us"), "hl": body.get("hl", "en"), "num": num},
+        "organic": organic,
+    }
+
+
+# ---------------------------------------------------------------- CoinGecko
+
+def _coin(state, coin_id):
+    if coin_id in state.coins:
+        return {"id": coin_id, **state.coins[coin_id]}
+    name = coin_id.replace("-", " ").title()
+    return {"id": coin_id, "name": name, "symbol": coin_id[:4], "price": 1.0 + zlib.crc32(coin_id.encode()) % 500, "rank": 100}
+
+
+def _random_walk(coin, start, step_seconds, count, volatility):
+    """Deterministic price path per coin, anchored so it ends at the fixture price."""
+    rng = random.Random(zlib.crc32(f"{coin['id']}:{step_seconds}".encode()))
+    closes = [1.0]
+    for _ in range(count - 1):
+        closes.append(closes[-1] * math.exp(rng.gauss(0, volatility)))
+    scale = coin["price"] / closes[-1]
+    return rng, [(start + i * step_seconds, c * scale) for i, c in enumerate(closes)]
+
+
+def coingecko_search(state, params):
+    query = params.get("query", [""])[0].lower().strip()
+    matches = [
+        _coin(state, coin_id) for coin_id, coin in state.coins.items()
+        if query in (coin_id, coin["name"].lower(), coin["symbol"].lower())
+    ] or [_coin(state, query.replace(" ", "-"))]
+    return {"coins": [
+        {"id": c["id"], "name": c["name"], "symbol": c["symbol"].upper(), "market_cap_rank": c["rank"]}
+        for c in matches
+    ]}
+
+
+def coingecko_ohlc(state, coin_id, params):
+    days = float(params.get("days", ["1"])[0])
+    # Mirror CoinGecko's automatic granularity
+    step = 1800 if days <= 2 else 4 * 3600 if days <= 30 else 4 * 86400
+    count = max(int(days * 86400 / step), 2)
+    now = int(time.time() // step * step)
+    coin = _coin(state, coin_id)
+    rng, path = _random_walk(coin, now - (count - 1) * step, step, count, 0.01 * math.sqrt(step / 3600))
+    candles = []
+    previous = path[0][1]
+    for ts, close in path:
+        high = max(previous, close) * (1 + abs(rng.gauss(0, 0.004)))
+        low = min(previous, close) * (1 - abs(rng.gauss(0, 0.004)))
+        candles.append([ts * 1000, round(previous, 8), round(high, 8), round(low, 8), round(close, 8)])
+        previous = close
+    return candles
+
+
+def coingecko_market_chart(state, coin_id, params):
+    days = float(params.get("days", ["1"])[0])
+    step = 300 if days <= 1 else 3600 if days <= 90 else 86400
+    count = max(int(days * 86400 / step), 2)
+    now = int(time.time() // step * step)
+    coin = _coin(state, coin_id)
+    rng, path = _random_walk(coin, now - (count - 1) * step, step, count, 0.004 * math.sqrt(step / 3600))
+    supply = 1e6 + zlib.crc32(coin_id.encode()) % 1e8
+    base_volume = coin["price"] * supply * 0.03
+    return {
+        "prices": [[ts * 1000, price] for ts, price in path],
+        "market_caps": [[ts * 1000, price * supply] for ts, price in path],
+        "total_volumes": [[ts * 1000, base_volume * math.exp(rng.gauss(0, 0.25))] for ts, _ in path],
+    }
+
+
+def coingecko_coin(state, coin_id):
+    coin = _coin(state, coin_id)
+    rng = random.Random(zlib.crc32(coin_id.encode()))
+    supply = 1e6 + zlib.crc32(coin_id.encode()) % 1e8
+    return {
+        "id": coin["id"],
+        "symbol": coin["symbol"].lower(),
+        "name": coin["name"],
+        "market_data": {
+            "current_price": {"usd": coin["price"]},
+            "market_cap": {"usd": coin["price"] * supply},
+            "total_volume": {"usd": coin["price"] * supply * 0.03},
+            "price_change_percentage_24h": round(rng.gauss(0, 3), 2),
+            "price_change_percentage_7d": round(rng.gauss(0, 8), 2),
+            "market_cap_rank": coin["rank"],
+        },
+    }
+
+
+# ---------------------------------------------------------------- Bedrock
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def bedrock_completion(state, model_id, body):
+    prompt = json.dumps(body.get("messages", body.get("prompt", "")))
+    recorded = state.recorded("bedrock", recorded_key(prompt))
+    text = recorded["text"] if recorded else state.bedrock.get("text", "Stand-in analysis.")
+    return text, _estimate_tokens(prompt), _estimate_tokens(text)
+
+
+def bedrock_invoke(state, model_id, body):
+    text, input_tokens, output_tokens = bedrock_completion(state, model_id, body)
+    return {
+        "id": f"msg_{recorded_key(text + str(time.time()))}",
+        "type": "message",
+        "role": "assistant",
+        "model": model_id,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    }
+
+
+def encode_event_stream_message(event):
+    """Encode one Bedrock response-stream chunk in the AWS event-stream binary format."""
+    payload = json.dumps({"bytes": base64.b64encode(json.dumps(event).encode()).decode()}).encode()
+    headers = b""
+    for name, value in ((":event-type", "chunk"), (":content-type", "application/json"), (":message-type", "event")):
+        headers += bytes([len(name)]) + name.encode() + b"\x07" + len(value).to_bytes(2, "big") + value.encode()
+    total_length = 12 + len(headers) + len(payload) + 4
+    prelude = total_length.to_bytes(4, "big") + len(headers).to_bytes(4, "big")
+    message = prelude + zlib.crc32(prelude).to_bytes(4, "big") + headers + payload
+    return message + zlib.crc32(message).to_bytes(4, "big")
+
+
+def bedrock_stream_events(state, model_id, body):
+    text, input_tokens, output_tokens = bedrock_completion(state, model_id, body)
+    yield {"type": "message_start", "message": {
+        "id": f"msg_{recorded_key(text)}", "type": "message", "role": "assistant", "model": model_id,
+        "content": [], "usage": {"input_tokens": input_tokens, "output_tokens": 0},
+    }}
+    yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    for piece in re.findall(r"\S+\s*", text):
+        yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}}
+    yield {"type": "content_block_stop", "index": 0}
+    yield {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": output_tokens}}
+    yield {"type": "message_stop", "amazon-bedrock-invocationMetrics": {
+        "inputTokenCount": input_tokens, "outputTokenCount": output_tokens,
+    }}
+
+
+# ---------------------------------------------------------------- HTTP
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        logging.debug("fake provider: " + format % args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _simulate(self, provider, route):
+        """Apply latency and injected failures. Returns True if a failure was sent."""
+        config = self.state.configs[provider]
+        time.sleep(config.latency.sample(self.state.rng))
+        roll = self.state.rng.random()
+        if roll < config.throttle_rate:
+            self.state.count(provider, route, 429)
+            if provider == "bedrock":
+                self._send_json(429, {"message": "Too many requests, please wait before trying again."},
+                                {"x-amzn-ErrorType": "ThrottlingException"})
+            elif provider == "coingecko":
+                self._send_json(429, {"status": {"error_code": 429, "error_message": "You've exceeded the Rate Limit."}})
+            else:
+                self._send_json(429, {"message": "Too many requests", "statusCode": 429})
+            return True
+        if roll < config.throttle_rate + config.error_rate:
+            self.state.count(provider, route, 500)
+            headers = {"x-amzn-ErrorType": "InternalServerException"} if provider == "bedrock" else None
+            self._send_json(500, {"message": "Injected failure from fake provider"}, headers)
+            return True
+        return False
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        path = parts.path.rstrip("/")
+
+        if path == "/__stats":
+            return self._send_json(200, self.state.snapshot())
+        if path == "/__traces":
+            return self._send_json(200, {"spans": self.state.traces()})
+
+        match = re.match(r"^/api/v3/(search|coins/([^/]+)(?:/(ohlc|market_chart))?)$", path)
+        if not match:
+            return self._send_json(404, {"error": f"Unknown route {path}"})
+
+        coin_id = match.group(2)
+        route = "search" if coin_id is None else match.group(3) or "coins"
+        if self._simulate("coingecko", route):
+            return
+
+        recorded = self.state.recorded("coingecko", recorded_key(self.path))
+        if recorded is not None:
+            payload = recorded
+        elif route == "search":
+            payload = coingecko_search(self.state, params)
+        elif route == "ohlc":
+            payload = coingecko_ohlc(self.state, coin_id, params)
+        elif route == "market_chart":
+            payload = coingecko_market_chart(self.state, coin_id, params)
+        else:
+            payload = coingecko_coin(self.state, coin_id)
+
+        self.state.count("coingecko", route, 200)
+        self._send_json(200, payload)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self._read_body()
+
+        if path == "/__reset":
+            self.state.reset()
+            return self._send_json(200, {"reset": True})
+
+        if path == "/v1/traces":
+            self.state.collect_spans(body)
+            return self._send_json(200, {"partialSuccess": {}})
+
+        if path == "/search":
+            if self._simulate("serper", "search"):
+                return
+            payload = serper_search(self.state, body)
+            self.state.count("serper", "search", 200)
+            return self._send_json(200, payload)
+
+        match = re.match(r"^/model/([^/]+)/(invoke|invoke-with-response-stream)$", path)
+        if not match:
+            return self._send_json(404, {"error": f"Unknown route {path}"})
+
+        model_id, route = unquote(match.group(1)), match.group(2)
+        if self._simulate("bedrock", route):
+            return
+
+        self.state.count("bedrock", route, 200)
+        if route == "invoke":
+            return self._send_json(200, bedrock_invoke(self.state, model_id, body))
+
+        # Streamed response: chunked transfer of event-stream messages, with a
+        # small per-token delay so time-to-first-token is measurable
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in bedrock_stream_events(self.state, model_id, body):
+            chunk = encode_event_stream_message(event)
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.state.bedrock.get("token_delay_ms", 5) / 1000)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, state):
+        super().__init__(address, FakeProviderHandler)
+        self.state = state
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self):
+        """Environment variables that point the app's providers at this server."""
+        return provider_environment(self.base_url)
+
+
+def provider_environment(base_url):
+    """Environment variables that point the app's providers at a stand-in server at base_url."""
+    return {
+        "SERPER_URL": f"{base_url}/search",
+        "SERPER_API_KEY": os.getenv("SERPER_API_KEY", "fake-serper-key"),
+        "SERPER_COOLDOWN": "0",
+        "COINGECKO_API_URL": f"{base_url}/api/v3",
+        "BEDROCK_ENDPOINT_URL": base_url,
+        "AWS_ACCESS_KEY_ID": os.getenv("AWS_ACCESS_KEY_ID", "fake"),
+        "AWS_SECRET_ACCESS_KEY": os.getenv("AWS_SECRET_ACCESS_KEY", "fake"),
+    }
+
+
+def start_server(host="127.0.0.1", port=0, configs=None, fixtures_dir=FIXTURES_DIR, seed=None):
+    """Start the stand-in server on a background thread. Returns the server."""
+    server = FakeProviderServer((host, port), FakeProviderState(configs, fixtures_dir, seed))
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-providers").start()
+    logging.info(f"✅ Fake providers listening on {server.base_url}")
+    return server
+
+
+def _parse_provider_options(values, cast):
+    """Parse ["bedrock=0.05", "0.01"] into {"bedrock": 0.05, "*": 0.01}."""
+    parsed = {}
+    for value in values or []:
+        provider, sep, setting = value.partition("=")
+        if not sep:
+            provider, setting = "*", value
+        parsed[provider] = cast(setting)
+    return parsed
+
+
+def build_configs(latency=None, error_rate=None, throttle_rate=None):
+    latency = _parse_provider_options(latency, str)
+    error_rate = _parse_provider_options(error_rate, float)
+    throttle_rate = _parse_provider_options(throttle_rate, float)
+    return {
+        provider: ProviderConfig(
+            latency=latency.get(provider, latency.get("*", "fixed:0")),
+            error_rate=error_rate.get(provider, error_rate.get("*", 0.0)),
+            throttle_rate=throttle_rate.get(provider, throttle_rate.get("*", 0.0)),
+        )
+        for provider in PROVIDERS
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Serper, CoinGecko and Bedrock")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_PROVIDER_PORT", 8765)))
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory of recorded fixtures")
+    parser.add_argument("--latency", action="append", help="[provider=]distribution, e.g. bedrock=lognormal:1500,0.4")
+    parser.add_argument("--error-rate", action="append", help="[provider=]fraction of 500 responses")
+    parser.add_argument("--throttle-rate", action="append", help="[provider=]fraction of 429 responses")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    configs = build_configs(args.latency, args.error_rate, args.throttle_rate)
+    server = FakeProviderServer((args.host, args.port), FakeProviderState(configs, args.fixtures, args.seed))
+
+    print(f"Fake providers listening on {server.base_url}")
+    for name, value in server.environment().items():
+        print(f"  export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
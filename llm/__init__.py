@@ -1,3 +1,22 @@
-from .bedrock_llm import get_bedrock_llm
+from .bedrock_llm import get_bedrock_llm, ThrottledBedrockChat
+from .throttle import AdaptiveConcurrencyLimiter, get_bedrock_limiter
+from .instrumentation import instrument, get_llm_metrics, metrics_registry
+from .routing import get_routed_llm, get_tier, get_tier_metrics, MODEL_TIERS, CALL_SITE_TIERS
+from .summarizer import MapReduceSummarizer, get_summary_cache
 
-__all__ = ["get_bedrock_llm"]
+__all__ = [
+    "get_bedrock_llm",
+    "ThrottledBedrockChat",
+    "AdaptiveConcurrencyLimiter",
+    "get_bedrock_limiter",
+    "get_routed_llm",
+    "get_tier",
+    "get_tier_metrics",
+    "MODEL_TIERS",
+    "CALL_SITE_TIERS",
+    "instrument",
+    "get_llm_metrics",
+    "metrics_registry",
+    "MapReduceSummarizer",
+    "get_summary_cache"
+]
@@ -11,16 +11,38 @@ from dotenv import load_dotenv
 import os
 import logging
 
+from .throttle import get_bedrock_limiter
+
 load_dotenv()  # Load AWS keys and region from .env
 
-def get_bedrock_llm(model_id=None, temperature=None, max_tokens=None, top_p=None, top_k=None):
+
+class ThrottledBedrockChat(BedrockChat):
+    """BedrockChat whose model calls go through the global adaptive limiter."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.streaming:
+            # BedrockChat._generate consumes self._stream, which takes the slot itself
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return get_bedrock_limiter().call(
+            super()._generate, messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # The async default (_astream) runs this in executor threads, so it is covered too
+        yield from get_bedrock_limiter().stream(
+            super()._stream, messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+
+
+def get_bedrock_llm(model_id=None, temperature=None, max_tokens=None, top_p=None, top_k=None, callbacks=None):
     """
     Returns a Claude LLM from Amazon Bedrock, wrapped in LangChain.
     """
     try:
         client = boto3.client(
             service_name="bedrock-runtime",
-            region_name=os.getenv("AWS_REGION", "us-west-2")
+            region_name=os.getenv("AWS_REGION", "us-west-2"),
+            endpoint_url=os.getenv("BEDROCK_ENDPOINT_URL")  # e.g. a local stand-in server
         )
 
         # Use environment variables if available, else use defaults
@@ -33,10 +55,11 @@ def get_bedrock_llm(model_id=None, temperature=None, max_tokens=None, top_p=None
             "stop_sequences": ["\n\nHuman"]
         }
 
-        llm = BedrockChat(
+        llm = ThrottledBedrockChat(
             client=client,
             model_id=model_id,
-            model_kwargs=model_kwargs
+            model_kwargs=model_kwargs,
+            callbacks=callbacks
         )
 
         logging.info(f"Initialized BedrockChat with model {model_id}")
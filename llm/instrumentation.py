@@ -0,0 +1,338 @@
+"""
+instrumentation.py
+
+Callback-based instrumentation for Bedrock LLMs and agent executors.
+
+Pass `config=instrument(call_site, asset)` to any invoke/ainvoke call and one
+record is produced per run with wall time, time-to-first-token, token counts,
+tool-call count and estimated cost. Records are kept in an in-process
+registry and, if LLM_METRICS_PATH is set, appended to a JSONL file. Agent
+iterations, runs and tokens are also counted in tools.metrics for /metrics.
+
+The same config opens tracing spans (tools.tracing) for the agent run, each
+tool call and each LLM call, nested under the caller's current span.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tools.tracing import current_span, set_current_span, start_span
+from tools.metrics import registry as prometheus_registry
+
+# USD per 1K tokens (input, output) for the Bedrock models we route to
+MODEL_PRICING = {
+    "anthropic.claude-3-haiku-20240307-v1:0": (0.00025, 0.00125),
+    "anthropic.claude-3-5-haiku-20241022-v1:0": (0.0008, 0.004),
+    "anthropic.claude-3-sonnet-20240229-v1:0": (0.003, 0.015),
+    "anthropic.claude-3-5-sonnet-20240620-v1:0": (0.003, 0.015),
+}
+
+
+def estimate_cost(model_id, input_tokens, output_tokens):
+    input_price, output_price = MODEL_PRICING.get(model_id, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1000
+
+
+def extract_token_usage(response):
+    """Return (input_tokens, output_tokens) from a LangChain LLMResult."""
+    usage = (response.llm_output or {}).get("usage") or {}
+    input_tokens = usage.get("prompt_tokens") or usage.get("input_tokens") or 0
+    output_tokens = usage.get("completion_tokens") or usage.get("output_tokens") or 0
+
+    if not (input_tokens or output_tokens):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "usage_metadata", None) or {}
+                input_tokens += metadata.get("input_tokens", 0)
+                output_tokens += metadata.get("output_tokens", 0)
+
+    return input_tokens, output_tokens
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+class MetricsRegistry:
+    """Thread-safe store of LLM call records with simple group-by summaries."""
+
+    def __init__(self, max_records=5000, jsonl_path=None):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=max_records)
+        self.jsonl_path = jsonl_path
+
+    def record(self, record):
+        with self._lock:
+            self._records.append(record)
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, "a") as f:
+                        f.write(json.dumps(record, default=str) + "\n")
+                except OSError as e:
+                    logging.warning(f"⚠️ Could not write LLM metrics to {self.jsonl_path}: {e}")
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self, by="call_site"):
+        """Aggregate records by a field (call_site, asset, model_id) or tuple of fields."""
+        fields = (by,) if isinstance(by, str) else tuple(by)
+        groups = {}
+        for record in self.records():
+            key = record.get(fields[0]) if len(fields) == 1 else tuple(record.get(f) for f in fields)
+            groups.setdefault(key, []).append(record)
+
+        report = {}
+        for key, records in groups.items():
+            wall_times = [r["wall_time"] for r in records]
+            ttfts = [r["ttft"] for r in records if r.get("ttft") is not None]
+            report[key] = {
+                "runs": len(records),
+                "errors": sum(1 for r in records if r.get("error")),
+                "llm_calls": sum(r["llm_calls"] for r in records),
+                "tool_calls": sum(r["tool_calls"] for r in records),
+                "input_tokens": sum(r["input_tokens"] for r in records),
+                "output_tokens": sum(r["output_tokens"] for r in records),
+                "cost": sum(r["cost"] for r in records),
+                "avg_wall_time": sum(wall_times) / len(wall_times),
+                "p50_wall_time": _percentile(wall_times, 0.5),
+                "p95_wall_time": _percentile(wall_times, 0.95),
+                "llm_time": sum(r["llm_time"] for r in records),
+                "avg_ttft": sum(ttfts) / len(ttfts) if ttfts else None,
+            }
+        return report
+
+
+metrics_registry = MetricsRegistry(jsonl_path=os.getenv("LLM_METRICS_PATH"))
+
+agent_iterations = prometheus_registry.histogram(
+    "agent_iterations", "LLM calls per agent run", ("call_site",), buckets=(1, 2, 3, 4, 5, 8, 10, 15, 20))
+agent_runs = prometheus_registry.counter("agent_runs_total", "Instrumented agent and LLM runs by outcome", ("call_site", "status"))
+llm_tokens = prometheus_registry.counter("llm_tokens_total", "LLM tokens by call site and direction", ("call_site", "direction"))
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """
+    Collects one record per top-level run (agent executor or bare LLM call).
+
+    Time-to-first-token is measured from the first streamed token; Bedrock
+    calls made without streaming deliver the whole response at once, so for
+    those it is the latency of the first model call.
+    """
+
+    def __init__(self, call_site, asset=None, registry=None):
+        self.call_site = call_site
+        self.asset = asset
+        self.registry = registry or metrics_registry
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._root_run_id = None
+        self._started = None
+        self._llm_started = {}
+        self._first_token = None
+        self._model_id = None
+        self._llm_calls = 0
+        self._llm_time = 0.0
+        self._tool_calls = 0
+        self._input_tokens = 0
+        self._output_tokens = 0
+
+    def _start_root(self, run_id, parent_run_id):
+        if self._root_run_id is None and parent_run_id is None:
+            self._root_run_id = run_id
+            self._started = time.perf_counter()
+
+    def _finish(self, run_id, error=None):
+        if run_id != self._root_run_id:
+            return
+        wall_time = time.perf_counter() - self._started
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "call_site": self.call_site,
+            "asset": self.asset,
+            "model_id": self._model_id,
+            "wall_time": wall_time,
+            "ttft": self._first_token - self._started if self._first_token else None,
+            "llm_calls": self._llm_calls,
+            "llm_time": self._llm_time,
+            "tool_calls": self._tool_calls,
+            "input_tokens": self._input_tokens,
+            "output_tokens": self._output_tokens,
+            "cost": estimate_cost(self._model_id, self._input_tokens, self._output_tokens),
+            "error": str(error) if error else None,
+        }
+        self._reset()
+        self.registry.record(record)
+        # An agent run's iterations are its model calls (bare LLM runs count one)
+        agent_iterations.observe(record["llm_calls"], call_site=self.call_site)
+        agent_runs.inc(call_site=self.call_site, status="error" if error else "ok")
+        llm_tokens.inc(record["input_tokens"], call_site=self.call_site, direction="input")
+        llm_tokens.inc(record["output_tokens"], call_site=self.call_site, direction="output")
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._start_root(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        with self._lock:
+            self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._finish(run_id, error)
+
+    def _on_model_start(self, serialized, run_id, parent_run_id, kwargs):
+        with self._lock:
+            self._start_root(run_id, parent_run_id)
+            self._llm_started[run_id] = time.perf_counter()
+            params = kwargs.get("invocation_params") or {}
+            self._model_id = params.get("model_id") or (serialized or {}).get("kwargs", {}).get("model_id") or self._model_id
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._on_model_start(serialized, run_id, parent_run_id, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._on_model_start(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_new_token(self, token, **kwargs):
+        with self._lock:
+            if self._first_token is None:
+                self._first_token = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            started = self._llm_started.pop(run_id, None)
+            now = time.perf_counter()
+            if started is not None:
+                self._llm_time += now - started
+            if self._first_token is None:
+                self._first_token = now
+            self._llm_calls += 1
+            input_tokens, output_tokens = extract_token_usage(response)
+            self._input_tokens += input_tokens
+            self._output_tokens += output_tokens
+            self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._llm_started.pop(run_id, None)
+            self._llm_calls += 1
+            self._finish(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        with self._lock:
+            self._tool_calls += 1
+
+
+class TracingHandler(BaseCallbackHandler):
+    """
+    Opens spans for one instrumented run: the agent run (root chain), each
+    tool call and each LLM call. Nested chains add no spans of their own.
+    A running tool's span is made current, so HTTP calls inside it nest
+    under it. Runs inline so that also works on the async path.
+    """
+
+    run_inline = True
+
+    def __init__(self, call_site, asset=None):
+        self.call_site = call_site
+        self.asset = asset
+        self.parent = current_span()
+        self._spans = {}  # run id -> span it belongs to
+        self._owned = {}  # run id -> (span opened for it, span current before it)
+        self._lock = threading.Lock()
+
+    def _open(self, name, run_id, parent_run_id, activate=False, kind="internal", **attributes):
+        with self._lock:
+            parent = self._spans.get(parent_run_id, self.parent)
+            span = start_span(name, parent=parent, kind=kind, call_site=self.call_site, asset=self.asset, **attributes)
+            self._spans[run_id] = span
+        previous = set_current_span(span) if activate else None
+        with self._lock:
+            self._owned[run_id] = (span, previous, activate)
+        return span
+
+    def _close(self, run_id, error=None, **attributes):
+        with self._lock:
+            self._spans.pop(run_id, None)
+            owned = self._owned.pop(run_id, None)
+        if owned:
+            span, previous, activated = owned
+            span.set(**attributes)
+            if activated:
+                set_current_span(previous)
+            span.end(error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self._open(f"agent.{self.call_site}", run_id, None)
+        else:
+            with self._lock:
+                self._spans[run_id] = self._spans.get(parent_run_id, self.parent)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error)
+
+    def _on_model_start(self, serialized, run_id, parent_run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model_id = params.get("model_id") or (serialized or {}).get("kwargs", {}).get("model_id")
+        self._open(f"llm.{self.call_site}", run_id, parent_run_id, kind="client", model_id=model_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._on_model_start(serialized, run_id, parent_run_id, kwargs)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._on_model_start(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens, output_tokens = extract_token_usage(response)
+        self._close(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._open(f"tool.{name}", run_id, parent_run_id, activate=True, input_bytes=len(str(input_str).encode()))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._close(run_id, output_bytes=len(str(output).encode()))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error)
+
+
+def instrument(call_site, asset=None, config=None):
+    """Build (or extend) a runnable config that records metrics and tracing spans for this call."""
+    config = dict(config or {})
+    config["callbacks"] = list(config.get("callbacks") or []) + [
+        InstrumentationHandler(call_site, asset), TracingHandler(call_site, asset)
+    ]
+    config.setdefault("run_name", call_site)
+    config["metadata"] = {**config.get("metadata", {}), "call_site": call_site, "asset": asset}
+    return config
+
+
+def get_llm_metrics(by="call_site"):
+    return metrics_registry.summary(by)
@@ -0,0 +1,77 @@
+"""
+routing.py
+
+Maps each LLM call site to a model tier so cheap extraction stages run on a
+small fast model and synthesis runs on the large one. All tier and routing
+configuration lives here; any call site can be re-routed with an
+environment variable, e.g. BEDROCK_TIER_NEWS=large.
+"""
+
+import os
+import logging
+import threading
+
+from .bedrock_llm import get_bedrock_llm
+from .instrumentation import metrics_registry
+
+MODEL_TIERS = {
+    "fast": os.getenv("BEDROCK_FAST_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0"),
+    "large": os.getenv("BEDROCK_LARGE_MODEL_ID", os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")),
+}
+
+CALL_SITE_TIERS = {
+    "whitepaper": "fast",
+    "news": "fast",
+    "sentiment": "fast",
+    "technical": "large",
+    "advice": "large",
+}
+
+
+def get_tier(call_site):
+    """Resolve the tier for a call site, honouring BEDROCK_TIER_<SITE> overrides."""
+    tier = os.getenv(f"BEDROCK_TIER_{call_site.upper()}", CALL_SITE_TIERS.get(call_site, "large"))
+    if tier not in MODEL_TIERS:
+        logging.warning(f"⚠️ Unknown model tier '{tier}' for {call_site}, falling back to 'large'")
+        tier = "large"
+    return tier
+
+
+_routed_llms = {}
+_routed_llms_lock = threading.Lock()
+
+
+def get_routed_llm(call_site, temperature=None, max_tokens=None):
+    """Return the (cached) Bedrock LLM for the tier assigned to a call site."""
+    tier = get_tier(call_site)
+    key = (tier, temperature, max_tokens)
+    with _routed_llms_lock:
+        if key not in _routed_llms:
+            _routed_llms[key] = get_bedrock_llm(
+                model_id=MODEL_TIERS[tier],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            logging.info(f"✅ Routed '{call_site}' to {tier} tier ({MODEL_TIERS[tier]})")
+        return _routed_llms[key]
+
+
+def get_tier_metrics():
+    """Latency and token totals per tier, for comparing fast vs large routing."""
+    tiers_by_model = {model_id: tier for tier, model_id in MODEL_TIERS.items()}
+    report = {}
+    for model_id, stats in metrics_registry.summary(by="model_id").items():
+        tier = tiers_by_model.get(model_id, model_id)
+        report[tier] = {
+            "model_id": model_id,
+            "runs": stats["runs"],
+            "llm_calls": stats["llm_calls"],
+            "errors": stats["errors"],
+            "input_tokens": stats["input_tokens"],
+            "output_tokens": stats["output_tokens"],
+            "cost": stats["cost"],
+            "avg_llm_latency": stats["llm_time"] / stats["llm_calls"] if stats["llm_calls"] else 0.0,
+            "p50_wall_time": stats["p50_wall_time"],
+            "p95_wall_time": stats["p95_wall_time"],
+        }
+    return report
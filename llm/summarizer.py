@@ -0,0 +1,289 @@
+"""
+summarizer.py
+
+Map-reduce summarization for documents that are too long for one prompt.
+The text is split into chunks at content-defined sentence boundaries. Each
+chunk is summarized concurrently (the map step, capped at max_concurrency
+calls), and the chunk summaries are then merged (the reduce step). Summaries
+that would still be too long for one reduce prompt are first collapsed in
+groups.
+
+Every chunk summary is cached on disk by a hash of the model, prompt and
+chunk text. Chunk boundaries only depend on nearby sentences, so an edit to a
+document changes only the chunks it touches. Re-summarizing a slightly changed
+document therefore only pays for those chunks plus the reduce step. Cached
+summaries older than SUMMARY_RETENTION seconds are deleted, and at most the
+newest SUMMARY_MAX_ROWS are kept.
+"""
+
+import os
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.priority import propagate
+from tools.storage import connect
+from tools.metrics import observe_cache
+
+from .instrumentation import instrument
+from .routing import get_routed_llm
+
+MAP_CHUNK_WORDS = int(os.getenv("SUMMARY_CHUNK_WORDS", 1200))
+REDUCE_MAX_WORDS = int(os.getenv("SUMMARY_REDUCE_MAX_WORDS", 6000))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+SUMMARY_RETENTION = int(os.getenv("SUMMARY_RETENTION", 30 * 86400))
+SUMMARY_MAX_ROWS = int(os.getenv("SUMMARY_MAX_ROWS", 20000))
+PRUNE_INTERVAL = 300
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+COLLAPSE_PROMPT = """Merge the following partial summaries of {asset} material into one concise summary.
+Keep every distinct fact, figure and claim; drop repetition.
+
+{text}"""
+
+
+def _split_long(sentence, max_words):
+    words = sentence.split()
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+
+
+def content_defined_chunks(text, target_words=MAP_CHUNK_WORDS):
+    """
+    Split text into chunks of roughly target_words words, cutting after
+    sentences whose hash hits a boundary condition (once a chunk holds at
+    least half the target). Boundaries depend on sentence content rather than
+    on absolute word offsets, so an insertion early in the text does not
+    shift every chunk after it.
+    """
+    min_words, max_words = max(target_words // 2, 1), target_words * 2
+    # ~20 words per sentence: cut with probability 1/divisor per sentence past min_words
+    divisor = max((target_words - min_words) // 20, 1)
+
+    chunks, current, count = [], [], 0
+    for sentence in SENTENCE_RE.split(text or ""):
+        for piece in _split_long(sentence, max_words):
+            words = len(piece.split())
+            if not words:
+                continue
+            current.append(piece)
+            count += words
+            boundary = zlib.crc32(piece.encode("utf-8")) % divisor == 0
+            if count >= max_words or (count >= min_words and boundary):
+                chunks.append(" ".join(current))
+                current, count = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class SummaryCache:
+    """Chunk summaries keyed by a hash of model + prompt + text (SQLite under CRYPTO_DATA_DIR)."""
+
+    def __init__(self, filename="summaries.db", retention=SUMMARY_RETENTION, max_rows=SUMMARY_MAX_ROWS):
+        self.retention = retention
+        self.max_rows = max_rows
+        self.conn = connect(filename)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_summaries_created ON chunk_summaries (created_at)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_id, prompt):
+        return hashlib.sha1(f"{model_id}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        row = self.conn.execute("SELECT summary FROM chunk_summaries WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        observe_cache("chunk_summary", row is not None)
+        return row["summary"] if row else None
+
+    def put(self, key, summary):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chunk_summaries (key, summary, created_at) VALUES (?, ?, ?)",
+                (key, summary, now)
+            )
+            self.conn.commit()
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self.prune(now)
+
+    def prune(self, now=None):
+        """Drop summaries past the retention period and all but the newest max_rows."""
+        now = now or time.time()
+        with self._lock:
+            self._last_prune = now
+            expired = self.conn.execute(
+                "DELETE FROM chunk_summaries WHERE created_at < ?", (now - self.retention,)
+            ).rowcount
+            trimmed = self.conn.execute("""
+                DELETE FROM chunk_summaries WHERE key IN (
+                    SELECT key FROM chunk_summaries ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_rows,)).rowcount
+            self.conn.commit()
+        if expired or trimmed:
+            logging.info(f"✅ Pruned {expired} expired and {trimmed} surplus chunk summaries")
+
+    def cache_info(self):
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM chunk_summaries").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SummaryCache()
+        return _cache
+
+
+class MapReduceSummarizer:
+    """
+    Summarize long text for one call site (routed to that site's model tier).
+
+    map_prompt and reduce_prompt are format strings with {asset} and {text};
+    for the reduce prompt {text} holds the chunk summaries. A document that
+    fits in one chunk skips the map step and gets a single reduce call.
+    """
+
+    def __init__(self, call_site, map_prompt, reduce_prompt, max_concurrency=None,
+                 chunk_words=MAP_CHUNK_WORDS, reduce_max_words=REDUCE_MAX_WORDS, cache=None):
+        self.call_site = call_site
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.max_concurrency = max_concurrency or SUMMARY_CONCURRENCY
+        self.chunk_words = chunk_words
+        self.reduce_max_words = reduce_max_words
+        self.cache = cache or get_summary_cache()
+
+    def _llms(self):
+        return (
+            get_routed_llm(self.call_site, temperature=0.2, max_tokens=800),
+            get_routed_llm(self.call_site, temperature=0.3, max_tokens=4096),
+        )
+
+    def _groups(self, summaries):
+        """Pack summaries into groups that each fit one reduce prompt."""
+        groups, current, count = [], [], 0
+        for summary in summaries:
+            words = len(summary.split())
+            if current and count + words > self.reduce_max_words:
+                groups.append(current)
+                current, count = [], 0
+            current.append(summary)
+            count += words
+        if current:
+            groups.append(current)
+        return groups
+
+    def _collapse_groups(self, summaries):
+        """Groups to collapse before the final reduce, or None once the summaries fit (or can't shrink)."""
+        groups = self._groups(summaries)
+        return groups if 1 < len(groups) < len(summaries) else None
+
+    @staticmethod
+    def _join(summaries):
+        return "\n\n".join(f"[Part {i + 1}]\n{summary}" for i, summary in enumerate(summaries))
+
+    # ---------------------------------------------------------------- sync
+
+    def _call(self, llm, prompt, stage, asset, use_cache=True):
+        key = self.cache.key(getattr(llm, "model_id", ""), prompt)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        summary = llm.invoke(prompt, config=instrument(f"{self.call_site}_{stage}", asset)).content
+        if use_cache:
+            self.cache.put(key, summary)
+        return summary
+
+    def summarize(self, text, asset=None):
+        """Summarize text, running the map step on a thread pool."""
+        map_llm, reduce_llm = self._llms()
+        chunks = content_defined_chunks(text, self.chunk_words)
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return self._call(reduce_llm, self.reduce_prompt.format(asset=asset, text=chunks[0]), "reduce", asset, use_cache=False)
+
+        logging.info(f"⏳ Summarizing {len(chunks)} chunks for {asset} ({self.max_concurrency} at a time)")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            summaries = list(pool.map(
+                propagate(lambda chunk: self._call(map_llm, self.map_prompt.format(asset=asset, text=chunk), "map", asset)),
+                chunks
+            ))
+
+            groups = self._collapse_groups(summaries)
+            while groups:
+                summaries = list(pool.map(
+                    propagate(lambda group: self._call(map_llm, COLLAPSE_PROMPT.format(asset=asset, text=self._join(group)), "collapse", asset)),
+                    groups
+                ))
+                groups = self._collapse_groups(summaries)
+
+        return self._call(reduce_llm, self.reduce_prompt.format(asset=asset, text=self._join(summaries)), "reduce", asset, use_cache=False)
+
+    # ---------------------------------------------------------------- async
+
+    async def _acall(self, llm, prompt, stage, asset, semaphore, use_cache=True):
+        key = self.cache.key(getattr(llm, "model_id", ""), prompt)
+        if use_cache:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+        async with semaphore:
+            response = await llm.ainvoke(prompt, config=instrument(f"{self.call_site}_{stage}", asset))
+        if use_cache:
+            await asyncio.to_thread(self.cache.put, key, response.content)
+        return response.content
+
+    async def asummarize(self, text, asset=None):
+        """Async variant of summarize (map calls gathered under a semaphore)."""
+        map_llm, reduce_llm = self._llms()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        chunks = content_defined_chunks(text, self.chunk_words)
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return await self._acall(reduce_llm, self.reduce_prompt.format(asset=asset, text=chunks[0]), "reduce", asset, semaphore, use_cache=False)
+
+        summaries = await asyncio.gather(*(
+            self._acall(map_llm, self.map_prompt.format(asset=asset, text=chunk), "map", asset, semaphore)
+            for chunk in chunks
+        ))
+        groups = self._collapse_groups(summaries)
+        while groups:
+            summaries = await asyncio.gather(*(
+                self._acall(map_llm, COLLAPSE_PROMPT.format(asset=asset, text=self._join(group)), "collapse", asset, semaphore)
+                for group in groups
+            ))
+            groups = self._collapse_groups(summaries)
+
+        return await self._acall(reduce_llm, self.reduce_prompt.format(asset=asset, text=self._join(summaries)), "reduce", asset, semaphore, use_cache=False)
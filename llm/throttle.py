@@ -0,0 +1,229 @@
+"""
+throttle.py
+
+Process-wide adaptive concurrency limiter for Bedrock calls.
+
+The limiter follows an AIMD scheme: every successful call probes the
+concurrency limit up by roughly one slot per "window" of calls, while a
+ThrottlingException halves it and the call is retried after a backoff.
+Both the sync and async LangChain paths end up in BedrockChat._generate or,
+when streaming, BedrockChat._stream (async runs them in executor threads), so
+a thread-safe limiter covers both.
+
+Background calls (see tools.priority) queue behind interactive ones and may
+hold at most BEDROCK_BACKGROUND_SHARE of the current limit, so the cache
+warmer never crowds out user requests.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+from tools.priority import is_background
+from tools.tracing import span
+from tools.metrics import observe_request, rate_limit_wait, registry
+
+
+def is_throttling_error(error):
+    """Return True if an exception (or anything it wraps) is a Bedrock throttle."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):
+            code = response.get("Error", {}).get("Code", "")
+            if code in ("ThrottlingException", "TooManyRequestsException"):
+                return True
+        message = str(error)
+        if "ThrottlingException" in message or "Too many requests" in message:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, initial=None, min_limit=None, max_limit=None,
+                 max_retries=None, backoff=None, background_share=None):
+        self.min_limit = min_limit or int(os.getenv("BEDROCK_MIN_CONCURRENCY", 1))
+        self.max_limit = max_limit or int(os.getenv("BEDROCK_MAX_CONCURRENCY", 16))
+        initial = initial or int(os.getenv("BEDROCK_INITIAL_CONCURRENCY", 4))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("BEDROCK_THROTTLE_RETRIES", 5))
+        self.backoff = backoff or float(os.getenv("BEDROCK_THROTTLE_BACKOFF", 1.0))
+        self.background_share = background_share or float(os.getenv("BEDROCK_BACKGROUND_SHARE", 0.5))
+
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._background_in_flight = 0
+        self._waiters = deque()
+        self._background_waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def background_limit(self):
+        return max(1, int(self._limit * self.background_share))
+
+    def _background_slot_free(self):
+        return self._background_in_flight < self.background_limit
+
+    def _grant_waiters(self):
+        """Hand free slots directly to queued waiters, interactive ones first. Caller holds the lock."""
+        while self._in_flight < int(self._limit):
+            if self._waiters:
+                granted = self._waiters.popleft()
+            elif self._background_waiters and self._background_slot_free():
+                granted = self._background_waiters.popleft()
+                self._background_in_flight += 1
+            else:
+                break
+            self._in_flight += 1
+            granted.set()
+
+    def acquire(self, background=None):
+        """Take a slot; returns whether it was taken as a background call (pass that to release)."""
+        background = is_background() if background is None else background
+        with self._lock:
+            free = self._in_flight < int(self._limit) and not self._waiters
+            if background:
+                if free and not self._background_waiters and self._background_slot_free():
+                    self._in_flight += 1
+                    self._background_in_flight += 1
+                    return True
+                granted = threading.Event()
+                self._background_waiters.append(granted)
+            else:
+                if free:
+                    self._in_flight += 1
+                    return False
+                granted = threading.Event()
+                self._waiters.append(granted)
+        granted.wait()
+        return background
+
+    def release(self, background=False):
+        with self._lock:
+            self._in_flight -= 1
+            if background:
+                self._background_in_flight -= 1
+            self._grant_waiters()
+
+    def on_success(self):
+        """Additive increase: about +1 slot after `limit` consecutive successes."""
+        with self._lock:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self._grant_waiters()
+
+    def on_throttle(self):
+        """Multiplicative decrease: halve the limit, never below min_limit."""
+        with self._lock:
+            self._limit = max(self.min_limit, self._limit / 2)
+            new_limit = int(self._limit)
+        logging.warning(f"⚠️ Bedrock throttled, concurrency limit reduced to {new_limit}")
+
+    def _take_slot(self, attempt):
+        with span("wait.bedrock", attempt=attempt) as s:
+            background = self.acquire()
+            s.set(background=background, limit=int(self._limit))
+        rate_limit_wait.observe(s.duration, provider="bedrock")
+        return background
+
+    def _failed(self, error, started, attempt, retryable=True):
+        """Record a failed call; returns True when it should be retried after a backoff."""
+        throttled = is_throttling_error(error)
+        observe_request("bedrock", time.perf_counter() - started, "throttled" if throttled else "error")
+        if not throttled:
+            return False
+        self.on_throttle()
+        return retryable and attempt < self.max_retries
+
+    def _succeeded(self, started):
+        observe_request("bedrock", time.perf_counter() - started, "ok")
+        self.on_success()
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter, taken outside the slot. Returns the next attempt number."""
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        attempt += 1
+        logging.info(f"⏳ Retrying throttled Bedrock call in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+        with span("wait.bedrock_backoff", attempt=attempt, delay_s=round(delay, 3)):
+            time.sleep(delay)
+        rate_limit_wait.observe(delay, provider="bedrock")
+        return attempt
+
+    def call(self, func, *args, **kwargs):
+        """Run func under a slot, backing off and retrying on throttling."""
+        attempt = 0
+        while True:
+            background = self._take_slot(attempt)
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not self._failed(e, started, attempt):
+                    raise
+            else:
+                self._succeeded(started)
+                return result
+            finally:
+                self.release(background)
+            attempt = self._backoff(attempt)
+
+    def stream(self, func, *args, **kwargs):
+        """
+        Iterate the chunks of func(*args, **kwargs) under a slot held until the
+        stream ends (or the consumer stops). A throttle before the first chunk
+        is retried like call(); once chunks have been yielded it is raised.
+        """
+        attempt = 0
+        while True:
+            background = self._take_slot(attempt)
+            started = time.perf_counter()
+            yielded = False
+            try:
+                for chunk in func(*args, **kwargs):
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                if not self._failed(e, started, attempt, retryable=not yielded):
+                    raise
+            else:
+                self._succeeded(started)
+                return
+            finally:
+                self.release(background)
+            attempt = self._backoff(attempt)
+
+
+_bedrock_limiter = None
+_bedrock_limiter_lock = threading.Lock()
+
+
+def get_bedrock_limiter():
+    """Return the global limiter shared by every Bedrock client in the process."""
+    global _bedrock_limiter
+    with _bedrock_limiter_lock:
+        if _bedrock_limiter is None:
+            _bedrock_limiter = AdaptiveConcurrencyLimiter()
+        return _bedrock_limiter
+
+
+def _limiter_gauge(field):
+    def collect():
+        with _bedrock_limiter_lock:
+            limiter = _bedrock_limiter
+        return {(): getattr(limiter, field)} if limiter else {}
+    return collect
+
+
+registry.gauge("bedrock_concurrency_limit", "Current adaptive Bedrock concurrency limit", collect=_limiter_gauge("limit"))
+registry.gauge("bedrock_in_flight", "Bedrock calls holding a slot", collect=_limiter_gauge("in_flight"))
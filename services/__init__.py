@@ -0,0 +1,14 @@
+from .jobs import Job, JobManager, get_job_manager
+from .warmer import CacheWarmer, get_cache_warmer, start_cache_warmer, record_request
+from .session_cache import SessionResultCache
+
+__all__ = [
+    "Job",
+    "JobManager",
+    "get_job_manager",
+    "CacheWarmer",
+    "get_cache_warmer",
+    "start_cache_warmer",
+    "record_request",
+    "SessionResultCache"
+]
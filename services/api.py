@@ -0,0 +1,232 @@
+"""
+api.py
+
+Headless async HTTP API over the analysis pipeline, for internal callers that
+need analyses without a browser session. Stages run through the same
+process-wide agents and stage cache as the app, so repeated and concurrent
+requests for an asset share results. Responses carry the same result dicts
+the app renders.
+
+Every analysis request has a timeout (?timeout=, default API_TIMEOUT seconds)
+and is cancelled when the client disconnects. Work another request is still
+waiting for keeps running for that request.
+
+Run with: uvicorn services.api:app  (or python -m services.api --port 8000)
+"""
+
+import os
+import asyncio
+import logging
+import argparse
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+
+from agents.pipeline import (
+    STAGES, arun_pipeline, stage_cache, get_advisor, get_technical_agent
+)
+from tools.result_store import get_result_store
+from tools.market_feed import start_market_feed, get_market_feed
+from tools.tracing import span, tracer, self_times
+from tools.metrics import render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .jobs import get_job_manager
+from .warmer import record_request, start_cache_warmer, get_cache_warmer
+
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", 300))
+DISCONNECT_POLL_INTERVAL = 0.5
+ANALYSES = tuple(stage for stage in STAGES if stage != "advice")
+
+
+class JobRequest(BaseModel):
+    asset: str
+    stages: list[str] = list(STAGES)
+    force: bool = False
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build the shared agents before taking traffic rather than on the first request
+    await asyncio.to_thread(get_advisor)
+    await asyncio.to_thread(get_technical_agent)
+    warmer = start_cache_warmer()
+    start_market_feed()
+    yield
+    if warmer:
+        warmer.stop(timeout=5)
+
+
+app = FastAPI(title="Crypto Analysis API", lifespan=lifespan)
+
+
+def _parse_stages(stages, allowed=STAGES):
+    """Comma-separated stages as a list. Unknown ones are a client input error (422)."""
+    selected = [s.strip() for s in stages.split(",") if s.strip()] if stages else list(allowed)
+    unknown = [stage for stage in selected if stage not in allowed]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown stage(s): {', '.join(unknown)}")
+    return selected
+
+
+async def _run(request, coro, timeout):
+    """Await coro, cancelling it on timeout (504) or when the client goes away (499)."""
+    task = asyncio.ensure_future(coro)
+    deadline = asyncio.get_running_loop().time() + timeout
+    try:
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise HTTPException(status_code=504, detail=f"Analysis timed out after {timeout:.0f}s")
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_INTERVAL, remaining))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logging.info(f"⚠️ Client disconnected, cancelling {request.url.path}")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _analyze(request, response, asset, stages, force, timeout):
+    record_request(asset)
+    cached = []
+
+    def on_result(stage, result, was_cached):
+        if was_cached:
+            cached.append(stage)
+
+    with span("api.request", kind="server", path=request.url.path, asset=asset) as trace:
+        response.headers["X-Trace-Id"] = trace.trace_id
+        advisor = await asyncio.to_thread(get_advisor)
+        technical_agent = await asyncio.to_thread(get_technical_agent) if "technical" in stages else None
+        results = await _run(
+            request,
+            arun_pipeline(asset, advisor, technical_agent, stages=stages, cache=stage_cache, force=force, on_result=on_result),
+            timeout
+        )
+    response.headers["X-Cached-Stages"] = ",".join(stage for stage in STAGES if stage in cached)
+    return results
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "stage_cache": stage_cache.cache_info(),
+        "cache_warmer": get_cache_warmer().report(),
+        "market_feed": get_market_feed().report(),
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text-format metrics: provider requests and latency, rate-limit waits, cache hits, agents, jobs."""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/stages")
+async def stages():
+    return {"stages": list(STAGES), "ttls": stage_cache.ttls}
+
+
+@app.get("/analysis/{asset}/{stage}")
+async def analyze_stage(
+    asset: str,
+    stage: str,
+    request: Request,
+    response: Response,
+    inputs: str = Query(None, description="Advice only: comma-separated analyses to synthesize (default all)"),
+    force: bool = False,
+    timeout: float = Query(API_TIMEOUT, gt=0),
+):
+    """One stage for an asset, as {stage: result}. Advice first runs (or reuses) the analyses it synthesizes."""
+    if stage not in STAGES:
+        raise HTTPException(status_code=404, detail=f"Unknown stage: {stage}")
+    stages = [stage]
+    if stage == "advice":
+        stages = _parse_stages(inputs, ANALYSES) + ["advice"]
+    results = await _analyze(request, response, asset, stages, force, timeout)
+    return {stage: results[stage]}
+
+
+@app.get("/report/{asset}")
+async def report(
+    asset: str,
+    request: Request,
+    response: Response,
+    stages: str = Query(None, description="Comma-separated stages (default all)"),
+    force: bool = False,
+    timeout: float = Query(API_TIMEOUT, gt=0),
+):
+    """Combined report: {stage: result} for the selected stages, like the app's results."""
+    return await _analyze(request, response, asset, _parse_stages(stages), force, timeout)
+
+
+@app.get("/history/{asset}")
+async def history(
+    asset: str,
+    stage: str = Query(None),
+    since: float = Query(None, description="Epoch seconds"),
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Stored results for an asset from the shared result store, newest first."""
+    if stage and stage not in STAGES:
+        raise HTTPException(status_code=422, detail=f"Unknown stage: {stage}")
+    return await asyncio.to_thread(get_result_store().history, asset, stage, since, limit)
+
+
+@app.get("/traces")
+async def traces():
+    """Recent traces kept in memory, newest first."""
+    return tracer.traces()
+
+
+@app.get("/traces/{trace_id}")
+async def trace(trace_id: str):
+    """Spans of one trace in start order, plus time per span category not covered by child spans."""
+    spans = tracer.trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Unknown trace: {trace_id}")
+    return {"trace_id": trace_id, "self_times": self_times(spans), "spans": spans}
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(job_request: JobRequest):
+    """Run a report in the background (attaching to an unfinished job for the same request); poll /jobs/{id}."""
+    job = get_job_manager().submit(job_request.asset, _parse_stages(",".join(job_request.stages)), job_request.force)
+    return job.snapshot()
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = Query(0, ge=0, le=60, description="Seconds to wait for a change")):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if wait and not job.done:
+        await asyncio.to_thread(job.wait, None, wait)
+    return job.snapshot()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.snapshot()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Crypto analysis HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
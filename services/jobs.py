@@ -0,0 +1,281 @@
+"""
+jobs.py
+
+Background analysis jobs. An analysis runs on a worker thread instead of
+inside the Streamlit script, so reruns and widget interactions don't kill it
+and a slow Bedrock call doesn't freeze the page. Each job keeps its status,
+progress and the results of the stages finished so far. Callers poll
+snapshot() or block in wait() until the job changes.
+
+Submitting the same asset and stages while a job for them is still queued or
+running returns that job, so a rerun (or a second session) reattaches to the
+analysis in progress instead of starting another one.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.pipeline import (
+    STAGES, run_pipeline, stage_cache, stage_params, normalize_asset, get_advisor, get_technical_agent
+)
+from tools.tracing import span
+from tools.metrics import registry
+from .warmer import record_request
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+# Finished jobs stay readable this long so reruns can still pick up their results
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", 3600))
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """State of one analysis run. Updated by the worker threads, read by any thread."""
+
+    def __init__(self, asset, stages, force=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.asset = asset
+        self.stages = [stage for stage in STAGES if stage in stages]
+        self.force = force
+        self.status = QUEUED
+        self.results = {}
+        self.partial = {}  # stage -> preview published before the stage finished
+        self.cached_ages = {}
+        self.running = []
+        self.current_stage = None
+        self.step = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self.trace_id = None
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def key(self):
+        return (normalize_asset(self.asset), tuple(self.stages))
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def progress(self):
+        """Fraction of stages finished, 0.0 - 1.0."""
+        return len(self.results) / len(self.stages) if self.stages else 1.0
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, version=None, timeout=None):
+        """
+        Block until the job changes after `version` (or finishes) and return
+        the new version. Lets a caller follow a job without busy polling.
+        """
+        version = self.version if version is None else version
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self.done, timeout)
+            return self.version
+
+    def cancel(self):
+        """Stop the job before its next stage starts (stages already running finish first)."""
+        self._cancel.set()
+        if self.status == QUEUED:
+            self._update(status=CANCELLED, finished_at=time.time())
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def snapshot(self):
+        with self._changed:
+            return {
+                "id": self.id,
+                "asset": self.asset,
+                "stages": list(self.stages),
+                "status": self.status,
+                "current_stage": self.current_stage,
+                "running": list(self.running),
+                "step": self.step,
+                "progress": self.progress,
+                "results": dict(self.results),
+                "partial": dict(self.partial),
+                "cached_ages": dict(self.cached_ages),
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "version": self.version,
+                "trace_id": self.trace_id,
+            }
+
+
+class JobManager:
+    """Runs analysis jobs on a pool of worker threads and tracks them by job id."""
+
+    def __init__(self, max_workers=None, retention=JOB_RETENTION, cache=stage_cache):
+        self.retention = retention
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or JOB_WORKERS, thread_name_prefix="analysis-job")
+        self._jobs = {}
+        self._active = {}  # job key -> id of the queued/running job for it
+        self._lock = threading.Lock()
+
+    def submit(self, asset, stages=STAGES, force=False):
+        """
+        Start an analysis job, or return the unfinished job already running
+        the same asset and stages. force=True always starts a new job (which
+        later submissions then attach to).
+        """
+        job = Job(asset, stages, force)
+        record_request(asset)
+        with self._lock:
+            self._prune()
+            active = self._jobs.get(self._active.get(job.key))
+            if active and not active.done and not force:
+                logging.info(f"✅ Reattached to job {active.id} for {asset}")
+                return active
+            self._jobs[job.id] = job
+            self._active[job.key] = job.id
+
+        self._executor.submit(self._run, job)
+        logging.info(f"⏳ Queued job {job.id} for {asset}: {', '.join(job.stages)}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find(self, asset, stages=STAGES):
+        """The unfinished job for an asset and stages, or None."""
+        key = (normalize_asset(asset), tuple(stage for stage in STAGES if stage in stages))
+        with self._lock:
+            job = self._jobs.get(self._active.get(key))
+        return job if job and not job.done else None
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.cancel()
+        return job
+
+    def jobs(self):
+        """All tracked jobs, newest first."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def shutdown(self, wait=True):
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _prune(self, now=None):
+        now = now or time.time()
+        for job_id in [i for i, job in self._jobs.items() if job.done and now - job.finished_at > self.retention]:
+            del self._jobs[job_id]
+
+    def in_flight(self):
+        """Counts of queued and running jobs."""
+        counts = {QUEUED: 0, RUNNING: 0}
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in counts:
+                    counts[job.status] += 1
+        return counts
+
+    def _run(self, job):
+        if job.cancelled:
+            jobs_finished.inc(status=CANCELLED)
+            return
+        job._update(status=RUNNING, started_at=time.time())
+        with span("job", job_id=job.id, asset=job.asset, queued_s=round(job.started_at - job.created_at, 3)) as trace:
+            job._update(trace_id=trace.trace_id)
+            try:
+                advisor = get_advisor()
+                technical_agent = get_technical_agent() if "technical" in job.stages else None
+
+                def on_stage(stage, step, total):
+                    if job.cancelled:
+                        raise JobCancelled()
+                    with job._changed:
+                        job._update(current_stage=stage, step=step, running=job.running + [stage])
+
+                def on_partial(stage, preview):
+                    with job._changed:
+                        job._update(partial={**job.partial, stage: preview})
+
+                def on_result(stage, result, cached):
+                    cached_ages = job.cached_ages
+                    if cached:
+                        age = self.cache.age(job.asset, stage, stage_params(stage, job.stages))
+                        cached_ages = {**cached_ages, stage: age or 0.0}
+                    with job._changed:
+                        job._update(
+                            results={**job.results, stage: result},
+                            partial={s: p for s, p in job.partial.items() if s != stage},
+                            running=[s for s in job.running if s != stage],
+                            cached_ages=cached_ages,
+                        )
+
+                # Analyses run side by side so fast stages land without waiting for slow ones
+                run_pipeline(
+                    job.asset, advisor, technical_agent,
+                    stages=job.stages, on_stage=on_stage, on_result=on_result, on_partial=on_partial,
+                    cache=self.cache, force=job.force, concurrent=True
+                )
+                status, error = COMPLETED, None
+            except JobCancelled:
+                status, error = CANCELLED, None
+            except Exception as e:
+                status, error = FAILED, str(e)
+            trace.set(status=status, error=error)
+
+        # The job span has ended by now, so the finished job's trace is complete
+        job._update(status=status, error=error, current_stage=None, running=[], finished_at=time.time())
+        jobs_finished.inc(status=status)
+        job_duration.observe(job.finished_at - job.started_at, status=status)
+        if status == COMPLETED:
+            logging.info(f"✅ Job {job.id} for {job.asset} completed in {job.finished_at - job.started_at:.1f}s")
+        elif status == CANCELLED:
+            logging.info(f"⚠️ Job {job.id} for {job.asset} cancelled")
+        else:
+            logging.error(f"❌ Job {job.id} for {job.asset} failed: {error}")
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def _jobs_in_flight():
+    with _manager_lock:
+        manager = _manager
+    return {(status,): count for status, count in manager.in_flight().items()} if manager else {}
+
+
+jobs_in_flight = registry.gauge("jobs_in_flight", "Analysis jobs queued or running", ("status",), collect=_jobs_in_flight)
+jobs_finished = registry.counter("jobs_total", "Finished analysis jobs by status", ("status",))
+job_duration = registry.histogram(
+    "job_duration_seconds", "Run time of analysis jobs", ("status",), buckets=(1, 5, 10, 30, 60, 120, 300, 600))
+
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
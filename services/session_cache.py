@@ -0,0 +1,129 @@
+"""
+session_cache.py
+
+Per-session store of finished analysis results, kept in Streamlit session
+state. Sessions left open all day otherwise accumulate every result for
+every asset string typed. This store keeps memory per session flat:
+
+- assets are keyed by their normalized name, so "bitcoin" and " Bitcoin "
+  share one entry (no network lookup runs in the Streamlit script)
+- results are stored as zlib-compressed compact JSON (NumPy scalars become
+  plain numbers)
+- least recently used entries are evicted once the measured size of the
+  stored entries exceeds SESSION_CACHE_BYTES, or there are more than
+  SESSION_CACHE_ENTRIES of them
+"""
+
+import os
+import sys
+import json
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+
+from agents.pipeline import normalize_asset
+from tools.result_store import _encode
+from tools.metrics import observe_cache
+
+SESSION_CACHE_BYTES = int(os.getenv("SESSION_CACHE_BYTES", 2 * 1024 * 1024))
+SESSION_CACHE_ENTRIES = int(os.getenv("SESSION_CACHE_ENTRIES", 20))
+
+
+def measure(obj, _seen=None):
+    """Approximate deep size in bytes of a result (dicts, lists, strings, numbers)."""
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(measure(k, _seen) + measure(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(measure(item, _seen) for item in obj)
+    return size
+
+
+def pack(results):
+    return zlib.compress(json.dumps(results, separators=(",", ":"), default=_encode).encode())
+
+
+def unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+class SessionResultCache:
+    """LRU of {stage: result} dicts per asset, bounded by stored bytes and entry count."""
+
+    def __init__(self, max_bytes=SESSION_CACHE_BYTES, max_entries=SESSION_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (asset as entered, blob, stored size, measured result size)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "rejected": 0}
+
+    @staticmethod
+    def key(asset):
+        return normalize_asset(asset)
+
+    def put(self, asset, results):
+        """Store results for an asset, evicting least recently used entries to stay within budget."""
+        key = self.key(asset)
+        blob = pack(results)
+        size = sys.getsizeof(blob)
+        with self._lock:
+            self._entries.pop(key, None)
+            if size > self.max_bytes:
+                self.stats["rejected"] += 1
+                logging.warning(f"⚠️ Results for {asset} ({size} bytes) exceed the session cache budget, not stored")
+                return False
+            self._entries[key] = (asset.strip(), blob, size, measure(results))
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return True
+
+    def get(self, asset, default=None):
+        key = self.key(asset)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                observe_cache("session", False)
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        observe_cache("session", True)
+        return unpack(entry[1])
+
+    def __contains__(self, asset):
+        key = self.key(asset)
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def assets(self):
+        """Assets as the user last entered them, most recently used first."""
+        with self._lock:
+            return [entry[0] for entry in reversed(self._entries.values())]
+
+    def discard(self, asset):
+        key = self.key(asset)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    @property
+    def nbytes(self):
+        return sum(entry[2] for entry in self._entries.values())
+
+    def info(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "uncompressed_bytes": sum(entry[3] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
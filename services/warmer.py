@@ -0,0 +1,218 @@
+"""
+warmer.py
+
+Background cache warmer. Every WARM_INTERVAL seconds it refreshes the stage
+cache for a hot list of assets (WARM_ASSETS) plus the WARM_TOP_N assets
+users requested most within WARM_POPULARITY_WINDOW. An entry is recomputed
+when it is missing or older than WARM_REFRESH_AHEAD of its TTL, so user
+requests find it fresh instead of waiting for a cold run. The technical
+stage refresh also re-fetches OHLCV data.
+
+All warmer work runs at background priority (tools.priority): interactive
+requests go first for the Serper, CoinGecko and Bedrock budgets, and the
+warmer refreshes one entry at a time. report() gives the interactive cache
+hit rate on the warmed assets next to the warmer's own counters.
+
+The warmer is opt-in (CACHE_WARMER=1): every refresh is paid Bedrock, Serper
+and CoinGecko traffic that no user asked for. With the defaults each warmed
+asset costs about 18 refreshes an hour, most of them technical narratives
+(a 5-minute TTL refreshed at 0.8 of it).
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter, deque
+
+from agents.pipeline import STAGES, run_stage, stage_cache, stage_failed, normalize_asset, get_advisor, get_technical_agent
+from tools.priority import background_priority
+from tools.tracing import span
+
+WARM_ASSETS = [a.strip() for a in os.getenv("WARM_ASSETS", "Bitcoin,Ethereum,Solana").split(",") if a.strip()]
+WARM_STAGES = [s.strip() for s in os.getenv("WARM_STAGES", "technical,news,sentiment").split(",") if s.strip()]
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", 5))
+WARM_INTERVAL = int(os.getenv("WARM_INTERVAL", 60))
+WARM_REFRESH_AHEAD = float(os.getenv("WARM_REFRESH_AHEAD", 0.8))
+WARM_POPULARITY_WINDOW = int(os.getenv("WARM_POPULARITY_WINDOW", 86400))
+
+
+class RequestTracker:
+    """Recent user requests per asset, for ranking assets by popularity."""
+
+    def __init__(self, window=WARM_POPULARITY_WINDOW):
+        self.window = window
+        self._requests = deque()  # (time, normalized asset)
+        self._names = {}  # normalized asset -> name as last requested
+        self._lock = threading.Lock()
+
+    def record(self, asset, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._requests.append((now, normalize_asset(asset)))
+            self._names[normalize_asset(asset)] = asset.strip()
+            self._expire(now)
+
+    def _expire(self, now):
+        while self._requests and now - self._requests[0][0] > self.window:
+            self._requests.popleft()
+
+    def popular(self, n, now=None):
+        """The n most requested assets in the window, most requested first."""
+        with self._lock:
+            self._expire(now or time.time())
+            counts = Counter(asset for _, asset in self._requests)
+            return [self._names[asset] for asset, _ in counts.most_common(n)]
+
+
+request_tracker = RequestTracker()
+
+
+def record_request(asset):
+    """Count a user request for an asset towards the warmer's popularity ranking."""
+    request_tracker.record(asset)
+
+
+class CacheWarmer:
+    """Periodically refreshes stage results for hot and popular assets on a background thread."""
+
+    def __init__(self, assets=None, stages=None, top_n=WARM_TOP_N, interval=WARM_INTERVAL,
+                 refresh_ahead=WARM_REFRESH_AHEAD, cache=stage_cache, tracker=request_tracker):
+        self.assets = list(WARM_ASSETS if assets is None else assets)
+        self.stages = [stage for stage in STAGES if stage in (stages or WARM_STAGES) and stage != "advice"]
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.cache = cache
+        self.tracker = tracker
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._warmed = set()
+        self.stats = {"cycles": 0, "refreshed": 0, "skipped_fresh": 0, "errors": 0, "last_cycle_s": None, "last_cycle_at": None}
+
+    def targets(self):
+        """Hot list first, then the most requested assets, without duplicates."""
+        targets, seen = [], set()
+        for asset in self.assets + self.tracker.popular(self.top_n):
+            if normalize_asset(asset) not in seen:
+                seen.add(normalize_asset(asset))
+                targets.append(asset)
+        return targets
+
+    def needs_refresh(self, asset, stage):
+        age = self.cache.age(asset, stage)
+        return age is None or age >= self.cache.ttls.get(stage, 0) * self.refresh_ahead
+
+    def _refresh(self, asset, stage):
+        technical_agent = get_technical_agent() if stage == "technical" else None
+
+        def compute():
+            return run_stage(stage, asset, get_advisor(), technical_agent)
+
+        # One trace per refresh, so its HTTP, wait and LLM spans don't each start a trace of their own
+        with span(f"warm.{stage}", asset=asset) as s:
+            result, _ = self.cache.get_or_compute(asset, stage, compute, force=True)
+            s.set(failed=stage_failed(result))
+        return not stage_failed(result)
+
+    def run_once(self):
+        """One warming pass over all targets. Returns the number of entries refreshed."""
+        started = time.perf_counter()
+        refreshed = skipped = errors = 0
+        targets = self.targets()
+        with background_priority():
+            for asset in targets:
+                for stage in self.stages:
+                    if self._stop.is_set():
+                        break
+                    if not self.needs_refresh(asset, stage):
+                        skipped += 1
+                        continue
+                    try:
+                        if self._refresh(asset, stage):
+                            refreshed += 1
+                        else:
+                            errors += 1
+                    except Exception as e:
+                        errors += 1
+                        logging.warning(f"⚠️ Cache warmer failed on {asset} {stage}: {e}")
+
+        with self._lock:
+            self._warmed.update(normalize_asset(asset) for asset in targets)
+            self.stats["cycles"] += 1
+            self.stats["refreshed"] += refreshed
+            self.stats["skipped_fresh"] += skipped
+            self.stats["errors"] += errors
+            self.stats["last_cycle_s"] = time.perf_counter() - started
+            self.stats["last_cycle_at"] = time.time()
+
+        if refreshed or errors:
+            hit_rate = self.report()["hit_rate"]
+            rate = f"{hit_rate:.0%}" if hit_rate is not None else "n/a"
+            logging.info(
+                f"✅ Cache warmer refreshed {refreshed} entries for {len(targets)} assets "
+                f"in {time.perf_counter() - started:.1f}s ({errors} errors); warm-asset hit rate {rate}"
+            )
+        return refreshed
+
+    def report(self):
+        """Warmer counters plus the interactive hit rate on the assets it has warmed."""
+        with self._lock:
+            stats = dict(self.stats)
+            warmed = sorted(self._warmed)
+        cache = self.cache.cache_info(assets=warmed)
+        return {
+            **stats,
+            "assets": warmed,
+            "hits": cache["hits"],
+            "misses": cache["misses"],
+            "hit_rate": cache["hit_rate"],
+            "overall_hit_rate": self.cache.cache_info()["hit_rate"],
+        }
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"❌ Cache warmer cycle failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+            self._thread.start()
+        logging.info(f"✅ Cache warmer started: {', '.join(self.assets) or 'popular assets only'} every {self.interval}s")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def get_cache_warmer():
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer()
+        return _warmer
+
+
+def start_cache_warmer():
+    """Start the process-wide warmer when enabled with CACHE_WARMER=1 (it spends paid API calls unprompted)."""
+    if os.getenv("CACHE_WARMER", "0") != "1":
+        return None
+    return get_cache_warmer().start()
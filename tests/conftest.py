@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Keep the suite off the shared result store and the real data directory;
+# both are read at import time, so they are set before any app module loads.
+os.environ.setdefault("RESULT_STORE", "0")
+os.environ.setdefault("CRYPTO_DATA_DIR", tempfile.mkdtemp(prefix="crypto-tests-"))
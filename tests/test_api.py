@@ -0,0 +1,18 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from services.api import app
+
+# Without the context manager the lifespan (agents, warmer, feed) doesn't start
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("stage", ["whitepaper,news", "%20", "prices"])
+def test_unknown_stage_path_is_not_found(stage):
+    response = client.get(f"/analysis/Bitcoin/{stage}")
+    assert response.status_code == 404
+
+
+def test_unknown_report_stages_are_rejected():
+    assert client.get("/report/Bitcoin", params={"stages": "news,prices"}).status_code == 422
+    assert client.get("/history/Bitcoin", params={"stage": "news,technical"}).status_code == 422
@@ -0,0 +1,96 @@
+import io
+import json
+import time
+
+import cli
+from agents.pipeline import StageCache
+
+NOW = 1_700_000_000.0
+
+
+def record(**overrides):
+    base = {"asset": "bitcoin", "status": "ok", "stages": ["sentiment", "news"], "results": {},
+            "failed_stages": [], "cached_stages": [], "stage_ages": {"sentiment": 0, "news": 0},
+            "started_at": NOW - 5, "finished_at": NOW}
+    return {**base, **overrides}
+
+
+def test_read_watchlist_skips_comments_and_duplicates():
+    watchlist = io.StringIO("Bitcoin\n# majors\nethereum  # ETH\n\n bitcoin\n")
+    assert cli.read_watchlist(watchlist) == ["Bitcoin", "ethereum"]
+
+
+def test_read_checkpoint_keeps_latest_record_and_skips_truncated_lines(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text(
+        json.dumps(record(status="error")) + "\n"
+        + json.dumps(record(asset="Ethereum")) + "\n"
+        + json.dumps(record(asset="Bitcoin ")) + "\n"
+        + '{"asset": "solana", "sta'
+    )
+    records = cli.read_checkpoint(str(path))
+    assert set(records) == {"bitcoin", "ethereum"}
+    assert records["bitcoin"]["status"] == "ok"
+    assert cli.read_checkpoint(str(tmp_path / "missing.jsonl")) == {}
+
+
+def test_is_fresh_within_the_ttls(monkeypatch):
+    monkeypatch.setattr(cli, "stage_cache", StageCache(ttls={"sentiment": 1800, "news": 7200}))
+    assert cli.is_fresh(record(), ["sentiment"], now=NOW + 1000)
+    assert not cli.is_fresh(record(), ["sentiment", "news"], now=NOW + 2000)
+    assert cli.is_fresh(record(), ["news"], now=NOW + 2000)
+    # Stages the record doesn't cover, or a failed run, are never fresh
+    assert not cli.is_fresh(record(), ["technical"], now=NOW)
+    assert not cli.is_fresh(record(status="partial"), ["sentiment"], now=NOW)
+    assert not cli.is_fresh(None, ["sentiment"], now=NOW)
+
+
+def test_is_fresh_counts_the_age_of_cached_stages(monkeypatch):
+    monkeypatch.setattr(cli, "stage_cache", StageCache(ttls={"sentiment": 1800, "news": 7200}))
+    cached = record(cached_stages=["sentiment"], stage_ages={"sentiment": 1500, "news": 0})
+    assert cli.is_fresh(cached, ["sentiment"], now=NOW + 200)
+    assert not cli.is_fresh(cached, ["sentiment"], now=NOW + 400)
+
+
+def test_should_skip(monkeypatch):
+    monkeypatch.setattr(cli, "stage_cache", StageCache(ttls={"sentiment": 1800, "news": 7200}))
+    old = record(finished_at=time.time() - 3600)
+    assert cli.should_skip(old, ["sentiment"], resume=True, skip_if_fresh=False)
+    assert not cli.should_skip(old, ["sentiment"], resume=False, skip_if_fresh=True)
+    assert cli.should_skip(old, ["news"], resume=False, skip_if_fresh=True)
+    assert not cli.should_skip(record(status="partial"), ["news"], resume=True, skip_if_fresh=False)
+    assert not cli.should_skip(None, ["news"], resume=True, skip_if_fresh=True)
+
+
+def test_analyze_asset_records_stage_ages(monkeypatch):
+    cache = StageCache(ttls={"sentiment": 1800, "news": 7200})
+    cache.put("bitcoin", "sentiment", "cached sentiment", now=time.time() - 1000)
+    monkeypatch.setattr(cli, "stage_cache", cache)
+    monkeypatch.setattr(cli, "get_advisor", lambda: None)
+
+    def run_pipeline(asset, advisor, technical_agent, stages, cache, force, on_result):
+        on_result("sentiment", "cached sentiment", True)
+        on_result("news", "fresh news", False)
+        return {"sentiment": "cached sentiment", "news": "fresh news"}
+
+    monkeypatch.setattr(cli, "run_pipeline", run_pipeline)
+    result = cli.analyze_asset("Bitcoin", ["sentiment", "news"])
+    assert result["status"] == "ok"
+    assert result["cached_stages"] == ["sentiment"]
+    assert 999 <= result["stage_ages"]["sentiment"] < 1010
+    assert 0 <= result["stage_ages"]["news"] < 5
+    assert not cli.is_fresh(result, ["sentiment"], now=result["finished_at"] + 900)
+    assert cli.is_fresh(result, ["news"], now=result["finished_at"] + 900)
+
+
+def test_analyze_asset_failure_is_an_error_record(monkeypatch):
+    monkeypatch.setattr(cli, "get_advisor", lambda: None)
+
+    def run_pipeline(*args, **kwargs):
+        raise RuntimeError("no credentials")
+
+    monkeypatch.setattr(cli, "run_pipeline", run_pipeline)
+    result = cli.analyze_asset("bitcoin", ["news"])
+    assert result["status"] == "error"
+    assert result["failed_stages"] == ["news"]
+    assert result["stage_ages"] == {}
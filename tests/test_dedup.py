@@ -0,0 +1,72 @@
+from tools.dedup import canonicalize_url, url_key, dedupe_results
+
+
+def test_canonicalize_drops_tracking_and_variants():
+    assert canonicalize_url("http://www.coindesk.com/markets/btc/amp/?utm_source=x&id=3#top") == \
+        "https://coindesk.com/markets/btc?id=3"
+    assert canonicalize_url("https://m.example.com/a//b.amp.html?fbclid=1") == "https://example.com/a/b.html"
+    # Generic keys can address the page, so only known tracking params go
+    assert canonicalize_url("https://example.com/view?source=rss&ref=42&gclid=x") == \
+        "https://example.com/view?ref=42&source=rss"
+
+
+def test_canonicalize_leaves_non_urls_alone():
+    assert canonicalize_url("No link") == "No link"
+    assert canonicalize_url(None) is None
+
+
+def test_reddit_posts_share_a_key():
+    assert url_key("https://old.reddit.com/r/Bitcoin/comments/abc123/some_title/") == "reddit.com/comments/abc123"
+    assert url_key("https://www.reddit.com/r/CryptoCurrency/comments/abc123/") == "reddit.com/comments/abc123"
+    assert url_key("https://redd.it/abc123") == "reddit.com/comments/abc123"
+    # Only short links carry a bare id: other reddit pages keep their path
+    assert url_key("https://www.reddit.com/popular/") == "reddit.com/popular"
+    assert url_key("https://reddit.com/r") == "reddit.com/r"
+
+
+def test_same_page_is_kept_once():
+    results = [
+        {"title": "Bitcoin rallies", "snippet": "one", "link": "https://www.example.com/story?utm_medium=feed"},
+        {"title": "Different title", "snippet": "two", "link": "https://example.com/story/"},
+    ]
+    kept = dedupe_results(results)
+    assert len(kept) == 1
+    # The canonical URL is only the key; the result keeps the link it came with
+    assert kept[0]["link"] == "https://www.example.com/story?utm_medium=feed"
+
+
+def test_near_duplicate_text_is_dropped():
+    text = "Bitcoin price climbs above sixty thousand dollars as ETF inflows accelerate"
+    results = [
+        {"title": text, "snippet": "", "link": "https://a.com/1"},
+        {"title": text + " today", "snippet": "", "link": "https://b.com/2"},
+        {"title": "Ethereum developers schedule the next network upgrade for spring", "snippet": "", "link": "https://c.com/3"},
+    ]
+    assert [item["link"] for item in dedupe_results(results)] == ["https://a.com/1", "https://c.com/3"]
+
+
+def test_placeholder_links_are_judged_on_text():
+    results = [
+        {"title": "Solana outage halts block production", "snippet": "validators restart", "link": "No link"},
+        {"title": "Cardano staking rewards change next epoch", "snippet": "governance vote", "link": "No link"},
+        {"title": "Dogecoin", "snippet": "", "link": ""},
+    ]
+    kept = dedupe_results(results)
+    assert len(kept) == 3
+    assert kept[0]["link"] == "No link"
+
+
+def test_http_links_are_not_rewritten():
+    results = [{"title": "x", "link": "http://example.org/page?output=1"}]
+    assert dedupe_results(results) == results
+
+
+def test_short_texts_are_not_compared():
+    results = [{"title": "BTC up", "link": "https://a.com/1"}, {"title": "BTC up", "link": "https://b.com/2"}]
+    assert len(dedupe_results(results)) == 2
+
+
+def test_non_dict_results_are_skipped():
+    assert dedupe_results(["oops", None, {"title": "x", "link": "https://a.com"}]) == [
+        {"title": "x", "link": "https://a.com"}
+    ]
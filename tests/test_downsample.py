@@ -0,0 +1,66 @@
+import numpy as np
+
+from tools.downsample import lttb_indices, minmax_indices, downsample_ohlc
+
+
+def test_lttb_returns_everything_when_under_budget():
+    x = np.arange(10)
+    assert list(lttb_indices(x, x, 10)) == list(range(10))
+    assert list(lttb_indices(x, x, 50)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+
+
+def test_lttb_keeps_first_last_and_budget():
+    x = np.arange(1000)
+    y = np.sin(x / 20.0)
+    for threshold in (3, 4, 100, 999):
+        indices = lttb_indices(x, y, threshold)
+        assert len(indices) == threshold
+        assert indices[0] == 0 and indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[250] = 100.0
+    assert 250 in lttb_indices(x, y, 20)
+
+
+def test_lttb_handles_short_series():
+    assert len(lttb_indices([], [], 10)) == 0
+    assert list(lttb_indices([0, 1, 2, 3], [1, 5, 2, 4], 3)) == [0, 1, 3]
+
+
+def test_minmax_under_budget_and_bounds():
+    y = np.arange(10)
+    assert list(minmax_indices(y, 10)) == list(range(10))
+    assert list(minmax_indices(y, 1)) == list(range(10))
+
+    y = np.random.default_rng(7).normal(size=1000)
+    for threshold in (2, 3, 10, 101):
+        indices = minmax_indices(y, threshold)
+        assert len(indices) <= threshold
+        assert indices[0] == 0 and indices[-1] == 999
+    indices = minmax_indices(y, 100)
+    assert int(np.argmin(y)) in indices and int(np.argmax(y)) in indices
+
+
+def test_ohlc_merges_candles_per_bucket():
+    t = np.arange(6)
+    open_ = np.array([1, 2, 3, 4, 5, 6])
+    high = np.array([2, 9, 4, 5, 6, 7])
+    low = np.array([0, 1, 2, -1, 4, 5])
+    close = np.array([2, 3, 4, 5, 6, 7])
+    t2, o2, h2, l2, c2 = downsample_ohlc(t, open_, high, low, close, 2)
+    assert list(t2) == [0, 3]
+    assert list(o2) == [1, 4]
+    assert list(h2) == [9, 7]
+    assert list(l2) == [0, -1]
+    assert list(c2) == [4, 7]
+
+
+def test_ohlc_under_budget_is_unchanged():
+    arrays = downsample_ohlc([0, 1], [1, 2], [2, 3], [0, 1], [1, 2], 5)
+    assert [list(a) for a in arrays] == [[0, 1], [1, 2], [2, 3], [0, 1], [1, 2]]
+    assert len(downsample_ohlc([0, 1], [1, 2], [2, 3], [0, 1], [1, 2], 0)[0]) == 2
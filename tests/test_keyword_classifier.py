@@ -0,0 +1,34 @@
+from tools.keyword_classifier import KeywordClassifier, news_classifier
+
+
+def test_stems_cover_word_endings():
+    assert news_classifier.score("Bitcoin gained 5% overnight") > 0
+    assert news_classifier.score("ETH dipping below support") < 0
+    assert news_classifier.score("Solana crashes after outage") < 0
+
+
+def test_all_time_high_with_or_without_hyphen():
+    assert news_classifier.score("BTC sets a new all time high") > 0
+    assert news_classifier.score("BTC sets a new all-time high") > 0
+
+
+def test_inflected_terms_match():
+    for text in ("two bull markets", "ETH sets new all-time highs", "XRP rallying", "record highs for BTC",
+                 "SEC approves spot ETFs"):
+        assert news_classifier.score(text) > 0, text
+    for text in ("altcoin sell-offs deepen", "miners fear more bear markets"):
+        assert news_classifier.score(text) < 0, text
+    assert news_classifier.score("pumpkin spice season") == 0
+
+
+def test_whole_words_only():
+    assert news_classifier.score("diplomatic talks on a bulletin about bananas") == 0
+    assert news_classifier.matches("a hack and a ban") == ["hack", "ban"]
+
+
+def test_labels_and_buckets():
+    classifier = KeywordClassifier({"up": 1.0, "down*": -1.0}, threshold=0.5)
+    assert classifier.label("up up down") == "bullish"
+    assert classifier.label("up downturn") == "neutral"
+    buckets = classifier.classify([{"title": "down"}, {"title": "up", "snippet": "up"}, "skip"])
+    assert [len(buckets[label]) for label in ("bullish", "neutral", "bearish")] == [1, 0, 1]
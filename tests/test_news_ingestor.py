@@ -0,0 +1,87 @@
+from tools.news_ingestor import NewsIngestor, parse_news_date
+
+NOW = 1_700_000_000.0
+DAY = 86400
+
+
+class FakeSearch:
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.time_ranges = []
+
+    def search_latest_news(self, asset, num_results=6, time_range=None):
+        self.time_ranges.append(time_range)
+        return self.batches.pop(0)
+
+
+def article(n, date="1 hour ago"):
+    return {"title": f"Bitcoin story {n}", "snippet": f"details {n}", "link": f"https://news.example/{n}", "date": date}
+
+
+def test_parse_news_date():
+    assert parse_news_date("2 hours ago", NOW) == NOW - 7200
+    assert parse_news_date("Mar 3, 2025") is not None
+    assert parse_news_date("someday") is None
+
+
+def test_only_new_articles_are_stored():
+    ingestor = NewsIngestor(":memory:")
+    search = FakeSearch([article(1), article(2)], [article(2), article(3)])
+    assert len(ingestor.ingest("Bitcoin", search, now=NOW)) == 2
+    assert [a["link"] for a in ingestor.ingest("bitcoin ", search, now=NOW + 600)] == ["https://news.example/3"]
+    assert len(ingestor.articles("BITCOIN")) == 3
+    # The second refresh narrows the search to the time since the first one
+    assert search.time_ranges == [None, "h"]
+
+
+def test_search_error_is_passed_through():
+    ingestor = NewsIngestor(":memory:")
+    assert ingestor.ingest("bitcoin", FakeSearch({"error": "rate limited"}), now=NOW) == {"error": "rate limited"}
+    assert ingestor.watermark("bitcoin") is None
+
+
+def test_articles_stay_pending_until_a_digest_is_saved():
+    ingestor = NewsIngestor(":memory:")
+    ingestor.ingest("bitcoin", FakeSearch([article(1), article(2)]), now=NOW)
+    # A refresh whose summary failed saves no digest: the articles are still pending next time
+    assert len(ingestor.pending("bitcoin", now=NOW + 60)) == 2
+
+    ingestor.save_digest("bitcoin", "summary", 2, built_at=NOW + 60)
+    assert ingestor.pending("bitcoin", now=NOW + 60) == []
+
+    ingestor.ingest("bitcoin", FakeSearch([article(3)]), now=NOW + 120)
+    assert [a["link"] for a in ingestor.pending("bitcoin", now=NOW + 120)] == ["https://news.example/3"]
+
+
+def test_articles_stored_after_the_digest_was_built_stay_pending():
+    ingestor = NewsIngestor(":memory:")
+    ingestor.ingest("bitcoin", FakeSearch([article(1)]), now=NOW)
+    built_at = NOW + 10
+    ingestor.ingest("bitcoin", FakeSearch([article(2)]), now=NOW + 20)
+    ingestor.save_digest("bitcoin", "summary", 1, built_at=built_at)
+    assert [a["link"] for a in ingestor.pending("bitcoin", now=NOW + 30)] == ["https://news.example/2"]
+
+
+def test_digest_ages_out_with_the_window():
+    ingestor = NewsIngestor(":memory:", window=DAY)
+    ingestor.save_digest("bitcoin", "summary", 3, built_at=NOW)
+    assert ingestor.digest("bitcoin", now=NOW + 3600)["summary"] == "summary"
+    assert ingestor.digest("bitcoin", now=NOW + DAY + 1) is None
+
+
+def test_old_articles_leave_the_window():
+    ingestor = NewsIngestor(":memory:", window=DAY)
+    ingestor.ingest("bitcoin", FakeSearch([article(1, "3 days ago"), article(2, "2 hours ago")]), now=NOW)
+    assert [a["link"] for a in ingestor.digest_articles("bitcoin", now=NOW)] == ["https://news.example/2"]
+    assert sum(len(bucket) for bucket in ingestor.categories("bitcoin", now=NOW).values()) == 1
+
+
+def test_articles_are_classified_on_insert():
+    ingestor = NewsIngestor(":memory:")
+    ingestor.ingest("bitcoin", FakeSearch([
+        {"title": "Bitcoin surges to an all time high", "link": "https://a.example/1"},
+        {"title": "Exchange hacked, prices crash", "link": "https://a.example/2"},
+    ]), now=NOW)
+    categories = ingestor.categories("bitcoin", now=NOW)
+    assert [a["link"] for a in categories["bullish"]] == ["https://a.example/1"]
+    assert [a["link"] for a in categories["bearish"]] == ["https://a.example/2"]
@@ -0,0 +1,60 @@
+import time
+
+from tools.sentiment_store import SentimentStore
+
+
+def posts(*scores):
+    return {"positive": [{"title": f"post {score}", "link": f"https://reddit.com/comments/p{int(score * 10)}/", "score": score}
+                         for score in scores]}
+
+
+def test_aggregates_follow_inserts():
+    store = SentimentStore(":memory:")
+    assert store.add_posts("Bitcoin", posts(0.2, 0.4)) == 2
+    assert store.add_posts("bitcoin", posts(0.4)) == 0
+    day = store.aggregates("BITCOIN")["24h"]
+    assert day["volume"] == 2
+    assert abs(day["mean_score"] - 0.3) < 1e-9
+
+
+def test_windows_pick_up_rows_from_other_processes(tmp_path):
+    path = str(tmp_path / "sentiment.db")
+    app, warmer = SentimentStore(path), SentimentStore(path)
+    app.add_posts("bitcoin", posts(0.1))
+    assert app.aggregates("bitcoin")["24h"]["volume"] == 1
+
+    warmer.add_posts("bitcoin", posts(0.5, 0.6))
+    assert warmer.aggregates("bitcoin")["24h"]["volume"] == 3
+    assert app.aggregates("bitcoin")["24h"]["volume"] == 3
+    app.add_posts("bitcoin", posts(0.7))
+    assert warmer.aggregates("bitcoin")["24h"]["volume"] == 4
+    assert app.aggregates("bitcoin")["24h"]["volume"] == 4
+
+
+def test_old_rows_fall_out_of_the_window():
+    store = SentimentStore(":memory:")
+    store.add_posts("bitcoin", posts(0.9), timestamp=time.time() - 2 * 3600)
+    store.add_posts("bitcoin", posts(0.1))
+    aggregates = store.aggregates("bitcoin")
+    assert aggregates["1h"]["volume"] == 1
+    assert aggregates["24h"]["volume"] == 2
+
+
+def test_late_rows_are_inserted_in_order():
+    store = SentimentStore(":memory:")
+    now = time.time()
+    store.add_posts("bitcoin", posts(0.1), timestamp=now - 60)
+    store.add_posts("bitcoin", posts(0.3), timestamp=now - 3 * 3600)
+    store.add_posts("bitcoin", posts(0.2), timestamp=now - 600)
+    window = store._windows["bitcoin"]["24h"]
+    assert [entry[0] for entry in window.entries] == [now - 3 * 3600, now - 600, now - 60]
+
+
+def test_prune_drops_posts_older_than_the_widest_window():
+    store = SentimentStore(":memory:")
+    now = time.time()
+    store.add_posts("bitcoin", posts(0.1, 0.2), timestamp=now - 8 * 86400)
+    store.add_posts("bitcoin", posts(0.3), timestamp=now - 3600)
+    store.prune(now)
+    assert store.conn.execute("SELECT COUNT(*) FROM sentiment_posts").fetchone()[0] == 1
+    assert store.aggregates("bitcoin")["7d"]["volume"] == 1
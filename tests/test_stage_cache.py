@@ -0,0 +1,119 @@
+import time
+import asyncio
+import threading
+
+from agents.pipeline import StageCache
+
+
+def test_concurrent_callers_compute_once():
+    cache = StageCache()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"analysis": "ok"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("Bitcoin", "news", compute)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(cached for _, cached in results) == [False, True, True, True, True]
+    assert all(result == {"analysis": "ok"} for result, _ in results)
+    # Per-key locks are dropped once nobody uses them
+    assert cache._key_locks == {}
+
+
+def test_assets_share_entries_after_normalizing():
+    cache = StageCache()
+    cache.get_or_compute("Bitcoin", "news", lambda: "summary")
+    assert cache.get_or_compute(" bitcoin ", "news", lambda: "other") == ("summary", True)
+
+
+def test_failed_results_are_not_cached():
+    cache = StageCache()
+    assert cache.get_or_compute("bitcoin", "news", lambda: {"error": "timeout"}) == ({"error": "timeout"}, False)
+    assert cache.get("bitcoin", "news") is None
+    assert cache.get_or_compute("bitcoin", "news", lambda: "summary") == ("summary", False)
+
+
+def test_exceptions_release_the_key_lock():
+    cache = StageCache()
+
+    def compute():
+        raise RuntimeError("boom")
+
+    try:
+        cache.get_or_compute("bitcoin", "news", compute)
+    except RuntimeError:
+        pass
+    assert cache._key_locks == {}
+    assert cache.get_or_compute("bitcoin", "news", lambda: "summary") == ("summary", False)
+
+
+def test_entries_expire_and_force_recomputes():
+    cache = StageCache(ttls={"technical": 60})
+    cache.put("bitcoin", "technical", "old", now=time.time() - 120)
+    assert cache.get("bitcoin", "technical") is None
+
+    cache.put("bitcoin", "technical", "fresh")
+    assert cache.get_or_compute("bitcoin", "technical", lambda: "new") == ("fresh", True)
+    assert cache.get_or_compute("bitcoin", "technical", lambda: "new", force=True) == ("new", False)
+    assert 0 <= cache.age("bitcoin", "technical") < 60
+
+
+def test_params_key_separate_entries():
+    cache = StageCache()
+    cache.put("bitcoin", "advice", "with news", params=("news",))
+    assert cache.get("bitcoin", "advice", params=("news", "sentiment")) is None
+
+
+def test_async_callers_share_one_flight():
+    cache = StageCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_compute("bitcoin", "news", compute) for _ in range(4)))
+
+    assert asyncio.run(main()) == [("summary", False)] * 4
+    assert len(calls) == 1
+    assert cache._flights == {}
+    assert cache.get("bitcoin", "news") == "summary"
+
+
+def test_async_flight_is_cancelled_with_its_last_waiter():
+    cache = StageCache()
+    finished = []
+
+    async def compute():
+        await asyncio.sleep(1)
+        finished.append(1)
+        return "summary"
+
+    async def main():
+        first = asyncio.ensure_future(cache.aget_or_compute("bitcoin", "news", compute))
+        second = asyncio.ensure_future(cache.aget_or_compute("bitcoin", "news", compute))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        # One waiter left: the computation keeps going
+        assert cache._flights
+        second.cancel()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert finished == []
+    assert cache._flights == {}
+    assert cache.get("bitcoin", "news") is None
@@ -0,0 +1,39 @@
+import threading
+import time
+from unittest import mock
+
+from tools.web_search import WebSearch
+
+
+class FakeResponse:
+    status_code = 200
+    content = b"{}"
+    text = "{}"
+
+    def json(self):
+        return {"organic": []}
+
+
+def test_concurrent_searches_respect_the_cooldown():
+    search = WebSearch(api_key="test", cooldown=0.3)
+    sent = []
+
+    def post(*args, **kwargs):
+        sent.append(time.time())
+        time.sleep(0.05)
+        return FakeResponse()
+
+    with mock.patch("tools.web_search.requests.post", side_effect=post):
+        threads = [threading.Thread(target=search.search, args=(f"query {n}",)) for n in range(3)]
+        threads[0].start()
+        threads[1].start()
+        # The third search arrives after the first response, while the second waits for its slot
+        time.sleep(0.1)
+        threads[2].start()
+        for thread in threads:
+            thread.join()
+
+    sent.sort()
+    assert len(sent) == 3
+    # Slack for timer granularity
+    assert all(later - earlier >= 0.3 - 0.01 for earlier, later in zip(sent, sent[1:]))
@@ -1,11 +1,52 @@
 from .web_search import WebSearch
-from .sentiment_analysis import analyze_reddit_sentiment
+from .sentiment_analysis import analyze_reddit_sentiment, get_sentiment_engine, SentimentEngine
 from .market_analysis import analyze_news_headlines
+from .keyword_classifier import KeywordClassifier, news_classifier
+from .dedup import dedupe_results, canonicalize_url, url_key
+from .sentiment_store import SentimentStore, get_sentiment_store
+from .document_store import DocumentStore, get_document_store
+from .news_ingestor import NewsIngestor, get_news_ingestor
+from .downsample import lttb_indices, minmax_indices, downsample_ohlc
+from .result_store import ResultStore, get_result_store
+from .market_feed import MarketFeed, get_market_feed, start_market_feed, RestPollingSource, ReplaySource, SocketSource, FeedRecorder
+from .tracing import span, tracer, get_trace, self_times
+from .metrics import registry, start_metrics_server
 from .utils import Utils
 
 __all__ = [
     "WebSearch",
     "analyze_reddit_sentiment", 
+    "get_sentiment_engine",
+    "SentimentEngine",
     "analyze_news_headlines",
+    "KeywordClassifier",
+    "news_classifier",
+    "dedupe_results",
+    "canonicalize_url",
+    "url_key",
+    "SentimentStore",
+    "get_sentiment_store",
+    "DocumentStore",
+    "get_document_store",
+    "NewsIngestor",
+    "get_news_ingestor",
+    "lttb_indices",
+    "minmax_indices",
+    "downsample_ohlc",
+    "ResultStore",
+    "get_result_store",
+    "MarketFeed",
+    "get_market_feed",
+    "start_market_feed",
+    "RestPollingSource",
+    "ReplaySource",
+    "SocketSource",
+    "FeedRecorder",
+    "span",
+    "tracer",
+    "get_trace",
+    "self_times",
+    "registry",
+    "start_metrics_server",
     "Utils"
 ]
\ No newline at end of file
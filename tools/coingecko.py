@@ -0,0 +1,65 @@
+import os
+import time
+import logging
+import threading
+import requests
+from dotenv import load_dotenv
+
+from .priority import get_priority_gate
+from .tracing import span
+from .metrics import observe_request, observe_cache, rate_limit_wait
+
+load_dotenv()
+
+# Point at a stand-in server (see fake_providers/) with COINGECKO_API_URL
+COINGECKO_API_URL = os.getenv("COINGECKO_API_URL", "https://api.coingecko.com/api/v3").rstrip("/")
+COIN_ID_CACHE_SIZE = 10000
+
+_coin_ids = {}
+_coin_ids_lock = threading.Lock()
+
+
+def coingecko_get(path, params=None, timeout=10):
+    """GET a CoinGecko API path (e.g. "search", "coins/bitcoin/ohlc"). Background calls yield to interactive ones."""
+    with span("http.coingecko", kind="client", method="GET", path=path) as s:
+        with get_priority_gate("coingecko").enter():
+            # Time spent yielding to interactive calls (background callers only)
+            gate_wait = time.time() - s.start
+            s.set(gate_wait_s=round(gate_wait, 4))
+            rate_limit_wait.observe(gate_wait, provider="coingecko")
+            started = time.perf_counter()
+            try:
+                response = requests.get(f"{COINGECKO_API_URL}/{path.lstrip('/')}", params=params, timeout=timeout)
+            except Exception:
+                observe_request("coingecko", time.perf_counter() - started, "error")
+                raise
+        observe_request("coingecko", time.perf_counter() - started, response.status_code)
+        s.set(status=response.status_code, bytes=len(response.content))
+        return response
+
+
+def resolve_coin_id(query):
+    """
+    CoinGecko coin id for a name or symbol ("Bitcoin", "BTC" -> "bitcoin").
+    Successful lookups are remembered for the process; otherwise falls back to
+    the query as a slug.
+    """
+    key = " ".join(query.lower().split())
+    with _coin_ids_lock:
+        coin_id = _coin_ids.get(key)
+    observe_cache("coin_id", coin_id is not None)
+    if coin_id is not None:
+        return coin_id
+    try:
+        response = coingecko_get("search", params={"query": query}, timeout=10)
+        if response.status_code == 200:
+            coins = response.json().get("coins", [])
+            if coins:
+                with _coin_ids_lock:
+                    if len(_coin_ids) >= COIN_ID_CACHE_SIZE:
+                        _coin_ids.pop(next(iter(_coin_ids)))
+                    _coin_ids[key] = coins[0]["id"]
+                return coins[0]["id"]
+    except Exception as e:
+        logging.warning(f"Error in crypto search: {e}")
+    return key.replace(" ", "-")
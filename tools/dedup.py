@@ -0,0 +1,147 @@
+import re
+import random
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+# Query parameters known to only track the click (besides utm_*). Generic keys
+# such as "ref" or "source" stay: some sites address pages with them.
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "yclid",
+    "ref_src", "ref_url", "cmpid", "share_id", "guccounter", "ncid", "_ga",
+}
+
+HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.", "old.", "new.", "np.")
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "as", "at", "by", "for", "from", "in", "into",
+    "is", "are", "was", "were", "it", "its", "of", "on", "to", "with", "this",
+    "that", "after", "set", "be", "has", "have", "will",
+}
+
+# MinHash: NUM_PERMUTATIONS universal hashes, grouped into LSH bands of BAND_ROWS
+NUM_PERMUTATIONS = 32
+BAND_ROWS = 2
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+
+def canonicalize_url(url):
+    """
+    Canonical form of a result link for identifying the page: drop tracking
+    params, fragments, AMP and mobile variants and reddit subdomains, so the
+    same page always has one URL. It is a key, not an address to show or
+    fetch (the scheme is always https, for one).
+    """
+    if not url or not isinstance(url, str) or "://" not in url:
+        return url
+
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    path = parts.path
+
+    # Google AMP viewer and AMP cache URLs wrap the real one in the path
+    if host.endswith("cdn.ampproject.org") or (host.endswith("google.com") and path.startswith("/amp/")):
+        inner = re.sub(r"^/(?:amp/|c/)?(?:s/)?", "", path)
+        if inner:
+            return canonicalize_url("https://" + unquote(inner))
+
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+
+    path = re.sub(r"/(?:amp|amp\.html)/?$", "", path)
+    path = re.sub(r"\.amp(\.html)?$", r"\1", path)
+    path = re.sub(r"/{2,}", "/", path).rstrip("/") or "/"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    ]
+    query.sort()
+
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def url_key(url):
+    """Dedupe key for a link: the canonical URL, with reddit posts reduced to their id."""
+    canonical = canonicalize_url(url)
+    if not canonical or "://" not in canonical:
+        return canonical
+    parts = urlsplit(canonical)
+    if parts.hostname in ("reddit.com", "redd.it"):
+        match = re.search(r"/comments/([a-z0-9]+)", parts.path)
+        if not match and parts.hostname == "redd.it":
+            # Short links are the bare post id
+            match = re.match(r"^/([a-z0-9]+)$", parts.path)
+        if match:
+            return f"reddit.com/comments/{match.group(1)}"
+    return f"{parts.hostname}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def shingles(text):
+    """Content words of a title/snippet, the unit near-duplicates are compared on."""
+    return {word for word in WORD_RE.findall((text or "").lower()) if word not in STOPWORDS}
+
+
+def minhash_signature(tokens):
+    """MinHash signature of a token set (one min per universal-hash permutation)."""
+    hashes = [int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big") for token in tokens]
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def dedupe_results(results, threshold=0.6, min_words=5):
+    """
+    Drop results whose link canonicalizes to one already seen, or whose
+    title+snippet word set has Jaccard similarity >= threshold with a kept result.
+    Kept results are returned unchanged, with their original links.
+
+    Candidates come from MinHash LSH buckets (NUM_PERMUTATIONS // BAND_ROWS
+    bands), so each result is only compared against the few results that share
+    a band with it and the pass stays linear in the number of results.
+    Candidates are then confirmed with the exact Jaccard similarity.
+    """
+    seen_links = set()
+    buckets = {}
+    kept_shingles = []
+    kept = []
+
+    for item in results:
+        if not isinstance(item, dict):
+            continue
+        link = item.get("link")
+        # Placeholders such as "No link" aren't URLs: those results are judged on their text alone
+        if not (link and "://" in link):
+            link = None
+        key = url_key(link) if link else None
+        if key and key in seen_links:
+            continue
+
+        words = shingles(f"{item.get('title', '')} {item.get('snippet', '')}")
+
+        # Very short texts collide too easily to be judged near-duplicates
+        if len(words) >= min_words:
+            signature = minhash_signature(words)
+            band_keys = [
+                (band, tuple(signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]))
+                for band in range(NUM_PERMUTATIONS // BAND_ROWS)
+            ]
+            candidates = {index for band_key in band_keys for index in buckets.get(band_key, ())}
+            if any(jaccard(words, kept_shingles[index]) >= threshold for index in candidates):
+                continue
+            for band_key in band_keys:
+                buckets.setdefault(band_key, []).append(len(kept_shingles))
+            kept_shingles.append(words)
+
+        if key:
+            seen_links.add(key)
+        kept.append(item)
+
+    return kept
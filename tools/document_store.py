@@ -0,0 +1,352 @@
+import io
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from html.parser import HTMLParser
+
+import requests
+
+from .dedup import canonicalize_url
+from .storage import connect
+from .tracing import span
+from .metrics import observe_cache
+
+# Whitepapers rarely change, so a stored copy is reused for a long time
+DOCUMENT_TTL = int(os.getenv("WHITEPAPER_TTL", 30 * 86400))
+CHUNK_WORDS = int(os.getenv("DOC_CHUNK_WORDS", 220))
+CHUNK_OVERLAP = int(os.getenv("DOC_CHUNK_OVERLAP", 40))
+MAX_PDF_PAGES = 80
+MIN_DOCUMENT_CHARS = 1500
+# Downloads above this are abandoned (large PDFs or wrong links)
+MAX_DOCUMENT_BYTES = int(os.getenv("WHITEPAPER_MAX_BYTES", 20 * 1024 * 1024))
+# After a failed whitepaper search, wait this long before searching again (doubling per failure, up to a week)
+WHITEPAPER_RETRY_AFTER = int(os.getenv("WHITEPAPER_RETRY_AFTER", 6 * 3600))
+MAX_RETRY_AFTER = 7 * 86400
+
+WORD_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of an HTML page, one line per block element."""
+
+    SKIP = {"script", "style", "noscript", "svg", "nav", "header", "footer", "form"}
+    BLOCKS = {"p", "div", "section", "article", "li", "br", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "pre"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.title = None
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+        elif not self._skip_depth:
+            self.parts.append(data)
+
+
+def extract_pdf_text(content):
+    import pdfplumber
+
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        pages = [page.extract_text() or "" for page in pdf.pages[:MAX_PDF_PAGES]]
+        title = (pdf.metadata or {}).get("Title")
+    return "\n\n".join(pages), title
+
+
+def extract_html_text(html):
+    parser = _TextExtractor()
+    parser.feed(html)
+    text = "".join(parser.parts)
+    # Collapse runs of blank lines and trailing spaces left by the markup
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    return text.strip(), parser.title
+
+
+def _read_limited(response, max_bytes):
+    """The response body, streamed; raises ValueError once it exceeds max_bytes."""
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise ValueError(f"document is {int(length)} bytes, over the {max_bytes} byte limit")
+    body = bytearray()
+    for block in response.iter_content(64 * 1024):
+        body += block
+        if len(body) > max_bytes:
+            raise ValueError(f"document exceeds the {max_bytes} byte limit")
+    return bytes(body)
+
+
+def fetch_document(url, timeout=20, max_bytes=MAX_DOCUMENT_BYTES):
+    """
+    Download a PDF or HTML document (at most max_bytes) and extract its text.
+
+    Returns:
+        tuple: (text, title), or raises on network/extraction errors.
+    """
+    with span("http.document", kind="client", method="GET", url=url) as s:
+        with requests.get(url, timeout=timeout, stream=True, headers={"User-Agent": "Mozilla/5.0 (crypto-analysis)"}) as response:
+            s.set(status=response.status_code)
+            response.raise_for_status()
+            content = _read_limited(response, max_bytes)
+        s.set(bytes=len(content))
+    content_type = response.headers.get("Content-Type", "").lower()
+    if "pdf" in content_type or content[:5] == b"%PDF-" or url.lower().endswith(".pdf"):
+        return extract_pdf_text(content)
+    return extract_html_text(content.decode(response.encoding or "utf-8", errors="replace"))
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping windows of about chunk_words words."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def _match_query(query):
+    """FTS5 query matching any of the words in free text (quoted, so no syntax leaks through)."""
+    words = {word.lower() for word in WORD_RE.findall(query or "") if len(word) > 1}
+    return " OR ".join(f'"{word}"' for word in sorted(words))
+
+
+class DocumentStore:
+    """
+    Local whitepaper index: each document is fetched once, split into
+    overlapping chunks and stored in an SQLite FTS5 table, so top-k chunks
+    can be retrieved with BM25 ranking straight from disk.
+    """
+
+    def __init__(self, filename="documents.db", ttl=DOCUMENT_TTL):
+        self.ttl = ttl
+        self.conn = connect(filename)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                asset TEXT NOT NULL,
+                url TEXT NOT NULL,
+                title TEXT,
+                content_hash TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (asset, url)
+            )
+        """)
+        self.conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS document_chunks USING fts5(
+                text, asset UNINDEXED, url UNINDEXED, position UNINDEXED,
+                tokenize = 'porter unicode61'
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS whitepaper_failures (
+                asset TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                failed_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_asset(asset):
+        return " ".join(asset.lower().split())
+
+    def documents(self, asset):
+        asset = self.normalize_asset(asset)
+        rows = self.conn.execute(
+            "SELECT url, title, chunk_count, fetched_at FROM documents WHERE asset = ? ORDER BY fetched_at DESC",
+            (asset,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_fresh_document(self, asset, now=None):
+        now = now or time.time()
+        return any(now - doc["fetched_at"] < self.ttl for doc in self.documents(asset))
+
+    def add_document(self, asset, url, text, title=None):
+        """
+        Store a document's chunks, replacing any earlier version of the same URL.
+
+        Returns:
+            int: Number of chunks written (0 when the stored copy is unchanged).
+        """
+        asset = self.normalize_asset(asset)
+        url = canonicalize_url(url)
+        content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        chunks = chunk_text(text)
+
+        with self._lock:
+            existing = self.conn.execute(
+                "SELECT content_hash FROM documents WHERE asset = ? AND url = ?", (asset, url)
+            ).fetchone()
+            if existing and existing["content_hash"] == content_hash:
+                self.conn.execute(
+                    "UPDATE documents SET fetched_at = ? WHERE asset = ? AND url = ?", (time.time(), asset, url)
+                )
+                self.conn.commit()
+                return 0
+
+            self.conn.execute("DELETE FROM document_chunks WHERE asset = ? AND url = ?", (asset, url))
+            self.conn.executemany(
+                "INSERT INTO document_chunks (text, asset, url, position) VALUES (?, ?, ?, ?)",
+                [(chunk, asset, url, position) for position, chunk in enumerate(chunks)]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (asset, url, title, content_hash, chunk_count, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (asset, url, title, content_hash, len(chunks), time.time())
+            )
+            self.conn.commit()
+
+        logging.info(f"✅ Stored {len(chunks)} chunks for {asset} from {url}")
+        return len(chunks)
+
+    def ingest_url(self, asset, url, title=None):
+        """Fetch, extract and store one document. Returns the chunk count, or None if unusable."""
+        try:
+            text, extracted_title = fetch_document(url)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not fetch {url}: {e}")
+            return None
+        if len(text) < MIN_DOCUMENT_CHARS:
+            logging.warning(f"⚠️ Skipping {url}: only {len(text)} characters of text")
+            return None
+        return self.add_document(asset, url, text, title or extracted_title)
+
+    def retry_after(self, asset, now=None):
+        """Seconds until a failed whitepaper search for the asset may be retried (0 if it may now)."""
+        row = self.conn.execute(
+            "SELECT failures, failed_at FROM whitepaper_failures WHERE asset = ?", (self.normalize_asset(asset),)
+        ).fetchone()
+        if not row:
+            return 0
+        backoff = min(WHITEPAPER_RETRY_AFTER * 2 ** (row["failures"] - 1), MAX_RETRY_AFTER)
+        return max(row["failed_at"] + backoff - (now or time.time()), 0)
+
+    def _record_attempt(self, asset, succeeded):
+        asset = self.normalize_asset(asset)
+        with self._lock:
+            if succeeded:
+                self.conn.execute("DELETE FROM whitepaper_failures WHERE asset = ?", (asset,))
+            else:
+                self.conn.execute(
+                    "INSERT INTO whitepaper_failures (asset, failures, failed_at) VALUES (?, 1, ?) "
+                    "ON CONFLICT(asset) DO UPDATE SET failures = failures + 1, failed_at = excluded.failed_at",
+                    (asset, time.time())
+                )
+            self.conn.commit()
+
+    def ingest_whitepaper(self, asset, search_client, refresh=False, max_candidates=3):
+        """
+        Make sure a whitepaper for the asset is stored: reuse a fresh copy, or
+        search for one and ingest the first candidate that yields enough text
+        (PDF links first). After a search that found nothing usable, the asset
+        isn't searched again until its backoff (see retry_after) has passed.
+
+        Returns:
+            bool: True when the asset has a stored document afterwards.
+        """
+        if not refresh:
+            fresh = self.has_fresh_document(asset)
+            observe_cache("whitepaper", fresh)
+            if fresh:
+                return True
+            wait = self.retry_after(asset)
+            if wait:
+                logging.info(f"⏳ Skipping whitepaper search for {asset}: last attempt failed, retrying in {wait / 3600:.1f}h")
+                return bool(self.documents(asset))
+
+        results = search_client.search_whitepaper(asset, num_results=5)
+        if isinstance(results, dict):
+            # A search error may be transient, so it doesn't start a backoff
+            logging.warning(f"⚠️ Whitepaper search failed for {asset}: {results.get('error')}")
+            return bool(self.documents(asset))
+
+        candidates = sorted(
+            (item for item in results or [] if "://" in (item.get("link") or "")),
+            key=lambda item: not item["link"].lower().split("?")[0].endswith(".pdf")
+        )
+        for item in candidates[:max_candidates]:
+            if self.ingest_url(asset, item["link"], item.get("title")) is not None:
+                self._record_attempt(asset, True)
+                return True
+        logging.warning(f"⚠️ No usable whitepaper found for {asset}")
+        self._record_attempt(asset, False)
+        return bool(self.documents(asset))
+
+    def retrieve(self, asset, query, k=5):
+        """
+        Top-k chunks for an asset ranked by BM25 against the query.
+
+        Returns:
+            list: Dicts with 'text', 'url', 'position' and 'score' (lower is better).
+        """
+        match = _match_query(query)
+        if not match:
+            return []
+        rows = self.conn.execute(
+            "SELECT text, url, position, bm25(document_chunks) AS score FROM document_chunks "
+            "WHERE document_chunks MATCH ? AND asset = ? ORDER BY score LIMIT ?",
+            (match, self.normalize_asset(asset), k)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def chunks(self, asset, url=None):
+        """All stored chunks for an asset (optionally one document), in document order."""
+        asset = self.normalize_asset(asset)
+        if url is None:
+            docs = self.documents(asset)
+            if not docs:
+                return []
+            url = docs[0]["url"]
+        rows = self.conn.execute(
+            "SELECT text FROM document_chunks WHERE asset = ? AND url = ? ORDER BY CAST(position AS INTEGER)",
+            (asset, url)
+        ).fetchall()
+        return [row["text"] for row in rows]
+
+    def document_text(self, asset, url=None):
+        """Full text of a stored document (whitespace-normalized), rebuilt from its overlapping chunks."""
+        chunks = self.chunks(asset, url)
+        words = chunks[0].split() if chunks else []
+        for chunk in chunks[1:]:
+            words += chunk.split()[CHUNK_OVERLAP:]
+        return " ".join(words)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_document_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore()
+        return _store
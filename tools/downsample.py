@@ -0,0 +1,81 @@
+"""
+downsample.py
+
+Server-side downsampling of long series to a fixed point budget for charts,
+so the payload sent to the browser (and its render time) stays flat however
+long the history is.
+
+- lttb_indices:    Largest-Triangle-Three-Buckets, keeps the visual shape of a line
+- minmax_indices:  min and max of every bucket, keeps spikes (e.g. histograms)
+- downsample_ohlc: merges candles per bucket (first open, max high, min low, last close)
+
+Each works in O(n) with one numpy pass per bucket at most.
+"""
+
+import numpy as np
+
+
+def _buckets(n, count):
+    """count + 1 increasing bucket edges over range(n)."""
+    return np.linspace(0, n, count + 1).astype(int)
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the `threshold` points LTTB keeps (always the first and last)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Inner buckets between the fixed first and last points
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(int) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (hi, edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        # Twice the triangle area between the last kept point, each candidate and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, threshold):
+    """Indices of the first and last points plus each bucket's minimum and maximum, at most threshold in all."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+
+    # Too small a budget for any bucket (2 or 3 points) keeps just the ends
+    edges = _buckets(n, (threshold - 2) // 2)
+    selected = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            selected += [lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))]
+    return np.unique(selected)
+
+
+def downsample_ohlc(t, open_, high, low, close, threshold):
+    """Candles merged into at most `threshold` buckets. Returns (t, open, high, low, close) arrays."""
+    arrays = [np.asarray(a) for a in (t, open_, high, low, close)]
+    n = len(arrays[0])
+    if threshold >= n or threshold < 1:
+        return arrays
+
+    t, open_, high, low, close = arrays
+    starts = _buckets(n, threshold)[:-1]
+    ends = np.append(starts[1:], n) - 1
+    return [
+        t[starts],
+        open_[starts],
+        np.maximum.reduceat(high.astype(float), starts),
+        np.minimum.reduceat(low.astype(float), starts),
+        close[ends],
+    ]
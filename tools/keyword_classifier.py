@@ -0,0 +1,106 @@
+import re
+
+# Weighted news lexicon: positive weights are bullish, negative are bearish.
+# Terms are matched on word boundaries, and a trailing '*' matches any word
+# ending ("crash*" covers crash/crashes/crashing) without matching mid-word.
+# The longest matching stem wins, so a zero-weight stem ("diplom*") carves
+# unrelated words out of a shorter one ("dip*").
+NEWS_LEXICON = {
+    "rall*": 1.0, "surge": 1.0, "surges": 1.0, "surged": 1.0, "surging": 1.0,
+    "gain*": 0.8, "breakout*": 1.0, "bullish": 1.5, "bull run*": 1.5,
+    "bull market*": 1.5, "pump*": 0.6, "pumpkin*": 0.0, "partnership*": 1.0,
+    "adoption": 1.0, "integrat*": 0.8, "upgrade*": 0.8, "approv*": 1.0,
+    "all-time high*": 1.5, "all time high*": 1.5, "record high*": 1.2,
+    "positive": 0.5, "buy": 0.4,
+    "crash*": -1.5, "dip*": -0.6, "diplom*": 0.0, "bearish": -1.5,
+    "bear market*": -1.5, "sell-off*": -1.2, "selloff*": -1.2, "drop*": -0.8,
+    "dump*": -1.0, "retrac*": -0.6, "fall": -0.6, "falls": -0.6,
+    "falling": -0.6, "fell": -0.6, "plung*": -1.2, "loss": -0.8,
+    "losses": -0.8, "lawsuit*": -1.2, "hack": -1.5, "hacked": -1.5,
+    "hacks": -1.5, "exploit*": -1.5, "ban": -1.2, "bans": -1.2,
+    "banned": -1.2, "crackdown*": -1.2, "regulat*": -0.3, "negative": -0.5,
+}
+
+
+def _trie_pattern(terms):
+    """Build a prefix-factored alternation so the regex engine never re-scans shared prefixes."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            return "(?:" + body + ")?" if len(alternatives) == 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    """
+    Weighted lexicon compiled once into a single trie-shaped regex, so each text
+    is scanned in one pass regardless of how many terms there are. Matches are
+    always extended to whole words, which is what stops "bull" from hitting
+    "bulletin" or "ban" from hitting "banana".
+    """
+
+    def __init__(self, lexicon, threshold=0.0):
+        self.threshold = threshold
+        self._exact = {}
+        self._stems = {}
+        for term, weight in lexicon.items():
+            term = " ".join(term.lower().split())
+            if term.endswith("*"):
+                self._stems[term.rstrip("*")] = weight
+            else:
+                self._exact[term] = weight
+        # Longest stems first so the most specific one wins
+        self._stem_order = sorted(self._stems, key=len, reverse=True)
+        pattern = _trie_pattern(list(self._exact) + list(self._stems))
+        self._regex = re.compile(r"\b(?:" + pattern + r")\w*")
+
+    def _weight(self, token):
+        if token in self._exact:
+            return self._exact[token]
+        for stem in self._stem_order:
+            if token.startswith(stem):
+                return self._stems[stem]
+        return 0.0
+
+    def matches(self, text):
+        """Lexicon terms found in text (whole words only)."""
+        text = " ".join((text or "").lower().split())
+        return [token for token in self._regex.findall(text) if self._weight(token)]
+
+    def score(self, text):
+        """Sum of the weights of every lexicon term found in text."""
+        text = " ".join((text or "").lower().split())
+        return sum(self._weight(token) for token in self._regex.findall(text))
+
+    def label(self, text, positive="bullish", negative="bearish", neutral="neutral"):
+        score = self.score(text)
+        if score > self.threshold:
+            return positive
+        if score < -self.threshold:
+            return negative
+        return neutral
+
+    def classify(self, items, positive="bullish", negative="bearish", neutral="neutral"):
+        """Bucket title/snippet dicts into {positive: [...], neutral: [...], negative: [...]}."""
+        buckets = {positive: [], neutral: [], negative: []}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            text = f"{item.get('title', '')} {item.get('snippet', '')}"
+            buckets[self.label(text, positive, negative, neutral)].append(item)
+        return buckets
+
+
+news_classifier = KeywordClassifier(NEWS_LEXICON)
@@ -0,0 +1,545 @@
+"""
+market_feed.py
+
+Market-data feed: normalized candle and price events from pluggable sources,
+fanned out to any number of subscribers (indicator updaters, alerting, UI)
+through bounded queues, so one upstream fetch serves every consumer.
+
+Events are plain dicts, keyed by CoinGecko coin id:
+
+    {"type": "candle", "asset": "bitcoin", "timestamp": 1718000000.0, "interval": 1800,
+     "open": ..., "high": ..., "low": ..., "close": ..., "volume": None, "source": "rest"}
+    {"type": "price", "asset": "bitcoin", "timestamp": 1718000012.5, "price": ...,
+     "market_cap": ..., "volume": ..., "change_24h": ..., ..., "source": "rest"}
+
+Timestamps are epoch seconds. Sources:
+
+- RestPollingSource: polls CoinGecko OHLC and prices every interval
+- ReplaySource:      replays a recorded JSONL file (see FeedRecorder) at N× speed
+- SocketSource:      newline-delimited JSON events from a TCP socket, e.g.
+                     python -m fake_providers.feed_server
+
+The feed keeps the latest price and a bounded candle history per asset and
+candle interval. fetch_candles() and quote() serve from it while it is fresh
+and otherwise fetch once from CoinGecko (one fetch per asset at a time) and
+publish the result to every subscriber.
+"""
+
+import os
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+from collections import OrderedDict
+
+from .coingecko import coingecko_get
+from .priority import background_priority
+from .metrics import observe_cache
+
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", 1000))
+FEED_HISTORY = int(os.getenv("FEED_HISTORY", 2000))
+FEED_CANDLE_MAX_AGE = int(os.getenv("FEED_CANDLE_MAX_AGE", 300))
+FEED_PRICE_MAX_AGE = int(os.getenv("FEED_PRICE_MAX_AGE", 60))
+MARKET_FEED_SOURCE = os.getenv("MARKET_FEED_SOURCE", "")
+MARKET_FEED_ASSETS = [a.strip() for a in os.getenv("MARKET_FEED_ASSETS", "bitcoin,ethereum,solana").split(",") if a.strip()]
+MARKET_FEED_INTERVAL = float(os.getenv("MARKET_FEED_INTERVAL", 60))
+# 90 days matches the technical analysis window, so polled candles serve it directly
+MARKET_FEED_DAYS = int(os.getenv("MARKET_FEED_DAYS", 90))
+MARKET_FEED_PATH = os.getenv("MARKET_FEED_PATH", "")
+MARKET_FEED_SPEED = float(os.getenv("MARKET_FEED_SPEED", 1.0))
+MARKET_FEED_ADDRESS = os.getenv("MARKET_FEED_ADDRESS", "127.0.0.1:8766")
+
+CANDLE, PRICE = "candle", "price"
+CANDLE_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class FeedError(Exception):
+    pass
+
+
+def candle_interval(days):
+    """Candle width in seconds CoinGecko returns for an OHLC request over `days`."""
+    days = float(days)
+    return 1800 if days <= 2 else 4 * 3600 if days <= 30 else 4 * 86400
+
+
+def fetch_candle_events(asset, days, source="rest"):
+    """Candle events for a coin id from CoinGecko's OHLC endpoint, oldest first."""
+    response = coingecko_get(f"coins/{asset}/ohlc", params={"vs_currency": "usd", "days": days}, timeout=15)
+    if response.status_code != 200:
+        raise FeedError(f"Failed to fetch OHLC data for {asset} (status: {response.status_code})")
+    interval = candle_interval(days)
+    return [
+        {"type": CANDLE, "asset": asset, "timestamp": ts / 1000, "interval": interval,
+         "open": o, "high": h, "low": l, "close": c, "volume": None, "source": source}
+        for ts, o, h, l, c in sorted(response.json() or [])
+    ]
+
+
+def fetch_price_event(asset, source="rest"):
+    """Price event (with market data) for a coin id from CoinGecko's coin endpoint."""
+    response = coingecko_get(f"coins/{asset}", timeout=10)
+    if response.status_code != 200:
+        raise FeedError(f"Failed to fetch market data for {asset} (status: {response.status_code})")
+    coin = response.json()
+    data = coin.get("market_data") or {}
+    if not data:
+        raise FeedError(f"No market data available for {asset}")
+    return {
+        "type": PRICE,
+        "asset": asset,
+        "timestamp": time.time(),
+        "price": data.get("current_price", {}).get("usd"),
+        "market_cap": data.get("market_cap", {}).get("usd"),
+        "volume": data.get("total_volume", {}).get("usd"),
+        "change_24h": data.get("price_change_percentage_24h"),
+        "change_7d": data.get("price_change_percentage_7d"),
+        "rank": data.get("market_cap_rank"),
+        "name": coin.get("name"),
+        "symbol": coin.get("symbol"),
+        "source": source,
+    }
+
+
+# ------------------------------------------------------------ subscribers
+
+class Subscription:
+    """
+    A subscriber's bounded event queue. When the subscriber falls behind, the
+    oldest queued event is dropped (and counted) so the feed never blocks.
+    """
+
+    def __init__(self, feed, assets=None, types=None, maxsize=FEED_QUEUE_SIZE, name=None):
+        self.feed = feed
+        self.assets = {asset.lower() for asset in assets} if assets else None
+        self.types = set(types) if types else None
+        self.name = name or f"subscriber-{id(self):x}"
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def matches(self, event):
+        return (self.assets is None or event["asset"] in self.assets) and (self.types is None or event["type"] in self.types)
+
+    def put(self, event):
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(event)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        """Next event, or None after timeout (or once closed and drained)."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """All queued events, without waiting."""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def __iter__(self):
+        while not self.closed:
+            event = self.get(timeout=0.5)
+            if event is not None:
+                yield event
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self):
+        self.closed = True
+        self.feed.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FeedRecorder:
+    """Writes a feed's events to a JSONL file that ReplaySource can play back."""
+
+    def __init__(self, feed, path, assets=None, types=None):
+        self.path = path
+        self.subscription = feed.subscribe(assets, types, name=f"recorder:{os.path.basename(path)}")
+        self.recorded = 0
+        self._thread = threading.Thread(target=self._run, name="feed-recorder", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        with open(self.path, "a") as f:
+            for event in self.subscription:
+                f.write(json.dumps(event) + "\n")
+                f.flush()
+                self.recorded += 1
+            for event in self.subscription.drain():
+                f.write(json.dumps(event) + "\n")
+                self.recorded += 1
+
+    def stop(self, timeout=None):
+        self.subscription.close()
+        self._thread.join(timeout)
+
+
+# ---------------------------------------------------------------- sources
+
+class FeedSource:
+    """A source of events. stream() yields events until `stop` is set or the source runs out."""
+
+    name = "source"
+
+    def stream(self, stop):
+        raise NotImplementedError
+
+
+class RestPollingSource(FeedSource):
+    """Polls CoinGecko for each asset's recent candles and price every `interval` seconds, at background priority."""
+
+    name = "rest"
+
+    def __init__(self, assets=None, interval=MARKET_FEED_INTERVAL, days=MARKET_FEED_DAYS, prices=True):
+        self.assets = list(MARKET_FEED_ASSETS if assets is None else assets)
+        self.interval = interval
+        self.days = days
+        self.prices = prices
+
+    def stream(self, stop):
+        while not stop.is_set():
+            for asset in self.assets:
+                if stop.is_set():
+                    return
+                try:
+                    with background_priority():
+                        events = fetch_candle_events(asset, self.days, source=self.name)
+                        if self.prices:
+                            events.append(fetch_price_event(asset, source=self.name))
+                except Exception as e:
+                    logging.warning(f"⚠️ Market feed poll failed for {asset}: {e}")
+                    continue
+                yield from events
+            stop.wait(self.interval)
+
+
+class ReplaySource(FeedSource):
+    """
+    Replays a recorded JSONL file, keeping the recorded spacing between events
+    divided by `speed` (speed=10 plays 10× faster, speed=0 as fast as possible).
+    """
+
+    name = "replay"
+
+    def __init__(self, path=MARKET_FEED_PATH, speed=MARKET_FEED_SPEED, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+    def _events(self):
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def stream(self, stop):
+        while not stop.is_set():
+            previous = None
+            for event in self._events():
+                if previous is not None and self.speed > 0:
+                    delay = (event["timestamp"] - previous) / self.speed
+                    if delay > 0 and stop.wait(delay):
+                        return
+                previous = event["timestamp"]
+                if stop.is_set():
+                    return
+                yield {**event, "source": self.name}
+            if not self.loop:
+                return
+
+
+class SocketSource(FeedSource):
+    """Reads newline-delimited JSON events from a TCP socket, reconnecting after errors."""
+
+    name = "socket"
+
+    def __init__(self, address=MARKET_FEED_ADDRESS, reconnect_delay=5.0):
+        host, _, port = address.rpartition(":")
+        self.host = host or "127.0.0.1"
+        self.port = int(port)
+        self.reconnect_delay = reconnect_delay
+
+    def stream(self, stop):
+        while not stop.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=10) as conn:
+                    conn.settimeout(1.0)
+                    logging.info(f"✅ Market feed connected to {self.host}:{self.port}")
+                    buffer = b""
+                    while not stop.is_set():
+                        try:
+                            chunk = conn.recv(65536)
+                        except socket.timeout:
+                            continue
+                        if not chunk:
+                            break
+                        buffer += chunk
+                        *lines, buffer = buffer.split(b"\n")
+                        for line in lines:
+                            if line.strip():
+                                yield {**json.loads(line), "source": self.name}
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Market feed socket {self.host}:{self.port} failed: {e}")
+            stop.wait(self.reconnect_delay)
+
+
+# ------------------------------------------------------------------- feed
+
+class MarketFeed:
+    """
+    Hub between sources and subscribers. Keeps the latest price and a bounded
+    candle history per asset and interval; unchanged candles are not
+    re-published.
+    """
+
+    def __init__(self, history=FEED_HISTORY, candle_max_age=FEED_CANDLE_MAX_AGE, price_max_age=FEED_PRICE_MAX_AGE):
+        self.history = history
+        self.candle_max_age = candle_max_age
+        self.price_max_age = price_max_age
+        self._subscribers = []
+        self._candles = {}  # (asset, interval) -> OrderedDict timestamp -> candle
+        self._candles_at = {}  # (asset, interval) -> when candles last arrived
+        self._covered_from = {}  # (asset, interval) -> start of the window a fetch covered
+        self._prices = {}  # asset -> latest price event
+        self._prices_at = {}
+        self._fetch_locks = {}
+        self._sources = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "duplicates": 0, "fetches": 0, "served_from_feed": 0}
+
+    # ---------------------------------------------------------- subscribers
+
+    def subscribe(self, assets=None, types=None, maxsize=FEED_QUEUE_SIZE, name=None):
+        """Subscribe to events for some assets (coin ids) and types (candle/price); None means all."""
+        subscription = Subscription(self, assets, types, maxsize, name)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, event):
+        """Record an event and fan it out. Returns False for a candle identical to one already seen."""
+        event = {**event, "asset": event["asset"].lower()}
+        now = time.time()
+        with self._lock:
+            if event["type"] == CANDLE:
+                key = (event["asset"], int(event["interval"]))
+                candles = self._candles.setdefault(key, OrderedDict())
+                self._candles_at[key] = now
+                previous = candles.get(event["timestamp"])
+                if previous and all(previous.get(f) == event.get(f) for f in CANDLE_FIELDS):
+                    self.stats["duplicates"] += 1
+                    return False
+                candles[event["timestamp"]] = event
+                if previous is None and len(candles) > 1 and next(reversed(candles)) != event["timestamp"]:
+                    # Out-of-order candle: keep the history sorted by time
+                    self._candles[key] = candles = OrderedDict(sorted(candles.items()))
+                while len(candles) > self.history:
+                    candles.popitem(last=False)
+                    self._covered_from[key] = max(self._covered_from.get(key, 0), next(iter(candles)))
+            elif event["type"] == PRICE:
+                self._prices[event["asset"]] = event
+                self._prices_at[event["asset"]] = now
+            self.stats["published"] += 1
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+        for subscription in subscribers:
+            subscription.put(event)
+        return True
+
+    # ---------------------------------------------------------------- reads
+
+    def latest(self, asset, max_age=None):
+        """The latest price event for a coin id, optionally only if received within max_age seconds."""
+        asset = asset.lower()
+        with self._lock:
+            event = self._prices.get(asset)
+            if event and max_age is not None and time.time() - self._prices_at[asset] > max_age:
+                return None
+            return event
+
+    def candles(self, asset, interval, since=None):
+        """Recorded candles for a coin id and interval, oldest first."""
+        with self._lock:
+            candles = list(self._candles.get((asset.lower(), int(interval)), {}).values())
+        return [c for c in candles if since is None or c["timestamp"] >= since]
+
+    def _candles_fresh(self, key, since):
+        candles = self._candles.get(key)
+        if not candles or time.time() - self._candles_at[key] > self.candle_max_age:
+            return False
+        covered_from = min(next(iter(candles)), self._covered_from.get(key, float("inf")))
+        return covered_from <= since + key[1]
+
+    def _fetch_lock(self, key):
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def fetch_candles(self, asset, days):
+        """
+        Candles covering the last `days` for a coin id: from the feed when its
+        history is recent and long enough, otherwise fetched once from
+        CoinGecko and published. Concurrent callers share one fetch.
+        """
+        asset = asset.lower()
+        key = (asset, candle_interval(days))
+        since = time.time() - float(days) * 86400
+        with self._lock:
+            fresh = self._candles_fresh(key, since)
+        if not fresh:
+            with self._fetch_lock(key):
+                with self._lock:
+                    fresh = self._candles_fresh(key, since)
+                if not fresh:
+                    started = time.time()
+                    events = fetch_candle_events(asset, days)
+                    with self._lock:
+                        self.stats["fetches"] += 1
+                        self._covered_from[key] = started - float(days) * 86400
+                    for event in events:
+                        self.publish(event)
+                    if not events:
+                        return []
+        if fresh:
+            with self._lock:
+                self.stats["served_from_feed"] += 1
+        observe_cache("market_feed", fresh)
+        return self.candles(asset, key[1], since=since - key[1])
+
+    def quote(self, asset, max_age=None):
+        """The latest price event for a coin id, fetched (once for concurrent callers) when older than max_age."""
+        max_age = self.price_max_age if max_age is None else max_age
+        event = self.latest(asset, max_age)
+        if event is None:
+            with self._fetch_lock((asset.lower(), PRICE)):
+                event = self.latest(asset, max_age)
+                if event is None:
+                    event = fetch_price_event(asset.lower())
+                    with self._lock:
+                        self.stats["fetches"] += 1
+                    self.publish(event)
+                    observe_cache("market_feed", False)
+                    return event
+        with self._lock:
+            self.stats["served_from_feed"] += 1
+        observe_cache("market_feed", True)
+        return event
+
+    # -------------------------------------------------------------- sources
+
+    def add_source(self, source):
+        """Start pumping a source's events into the feed on a background thread."""
+        thread = threading.Thread(target=self._pump, args=(source,), name=f"market-feed-{source.name}", daemon=True)
+        with self._lock:
+            self._sources.append((source, thread))
+        thread.start()
+        logging.info(f"✅ Market feed source started: {source.name}")
+        return source
+
+    def _pump(self, source):
+        try:
+            for event in source.stream(self._stop):
+                try:
+                    self.publish(event)
+                except (KeyError, TypeError, AttributeError) as e:
+                    logging.warning(f"⚠️ Market feed dropped malformed {source.name} event: {e}")
+        except Exception as e:
+            logging.error(f"❌ Market feed source {source.name} failed: {e}")
+        else:
+            logging.info(f"✅ Market feed source {source.name} finished")
+
+    @property
+    def running(self):
+        with self._lock:
+            return any(thread.is_alive() for _, thread in self._sources)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._lock:
+            threads = [thread for _, thread in self._sources]
+        for thread in threads:
+            thread.join(timeout)
+
+    def report(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "sources": [source.name for source, thread in self._sources if thread.is_alive()],
+                "subscribers": [
+                    {"name": s.name, "pending": s.pending, "dropped": s.dropped} for s in self._subscribers
+                ],
+                "assets": sorted(set(self._prices) | {asset for asset, _ in self._candles}),
+            }
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_market_feed():
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = MarketFeed()
+        return _feed
+
+
+def build_source(kind=None):
+    """The source configured by MARKET_FEED_SOURCE (rest, replay or socket), or None."""
+    kind = (kind if kind is not None else MARKET_FEED_SOURCE).lower()
+    if kind == "rest":
+        return RestPollingSource()
+    if kind == "replay":
+        if not MARKET_FEED_PATH:
+            raise FeedError("MARKET_FEED_SOURCE=replay needs MARKET_FEED_PATH")
+        return ReplaySource()
+    if kind == "socket":
+        return SocketSource()
+    if kind:
+        raise FeedError(f"Unknown MARKET_FEED_SOURCE: {kind}")
+    return None
+
+
+def start_market_feed():
+    """Start the configured source on the process-wide feed (once). Without MARKET_FEED_SOURCE the feed only fetches on demand."""
+    feed = get_market_feed()
+    with _feed_lock:
+        if feed._sources:
+            return feed
+        try:
+            source = build_source()
+        except FeedError as e:
+            logging.error(f"❌ {e}")
+            return feed
+        if source:
+            feed.add_source(source)
+    return feed
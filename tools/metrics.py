@@ -0,0 +1,270 @@
+"""
+metrics.py
+
+In-process metrics registry rendered in the Prometheus text format
+(version 0.0.4), for scraping from the API's /metrics endpoint or the
+standalone server started with METRICS_PORT.
+
+Counters, gauges and histograms keep their values per label set in plain
+dicts. Recording is a lock and a dict update; a scrape copies each metric's
+values under its lock and formats them outside it, so scraping every few
+seconds doesn't hold up the threads doing the work. Gauges may instead be
+read at scrape time from a collect function (e.g. jobs in flight).
+
+Shared metrics, recorded across the app:
+
+- provider_requests_total{provider, status} and
+  provider_request_duration_seconds{provider}: Serper, CoinGecko and Bedrock
+- rate_limit_wait_seconds{provider}: time spent waiting for a request slot
+- cache_requests_total{layer, result}: hits and misses per cache layer
+
+Modules register their own next to the code they measure (agent iterations
+in llm.instrumentation, jobs in services.jobs, the Bedrock limiter in
+llm.throttle).
+"""
+
+import os
+import math
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = os.getenv("METRICS_PORT")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self):
+        """(suffix, label values, extra label, value) tuples for one scrape."""
+        return [("", key, None, value) for key, value in sorted(self._snapshot().items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.label_names, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is read from collect() at scrape time ({label values: value})."""
+
+    type = "gauge"
+
+    def __init__(self, name, help, labels=(), collect=None):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _snapshot(self):
+        if self.collect is None:
+            return super()._snapshot()
+        try:
+            return {tuple(str(v) for v in key): value for key, value in self.collect().items()}
+        except Exception as e:
+            logging.warning(f"⚠️ Could not collect {self.name}: {e}")
+            return {}
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _snapshot(self):
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def _samples(self):
+        samples = []
+        for key, (counts, total, count) in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, f'le="{_number(float(bound))}"', cumulative))
+            samples.append(("_sum", key, None, total))
+            samples.append(("_count", key, None, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), collect=None):
+        return self._register(Gauge(name, help, labels, collect))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+provider_requests = registry.counter(
+    "provider_requests_total", "Requests to external providers by outcome", ("provider", "status"))
+provider_latency = registry.histogram(
+    "provider_request_duration_seconds", "Latency of external provider requests", ("provider",))
+rate_limit_wait = registry.histogram(
+    "rate_limit_wait_seconds", "Time spent waiting for a provider request slot", ("provider",), WAIT_BUCKETS)
+cache_requests = registry.counter(
+    "cache_requests_total", "Cache lookups by layer and result (hit or miss)", ("layer", "result"))
+
+
+def observe_request(provider, seconds, status):
+    """Record one provider request: its outcome (HTTP status, "ok", "throttled", "error") and latency."""
+    provider_requests.inc(provider=provider, status=status)
+    provider_latency.observe(seconds, provider=provider)
+
+
+def observe_cache(layer, hit):
+    cache_requests.inc(layer=layer, result="hit" if hit else "miss")
+
+
+def render():
+    return registry.render()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """Serve /metrics on its own port for processes without the API (the Streamlit app). Once per process."""
+    global _server
+    port = port if port is not None else METRICS_PORT
+    if port in (None, ""):
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            except OSError as e:
+                logging.warning(f"⚠️ Could not serve metrics on port {port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logging.info(f"✅ Metrics served on http://{host}:{_server.server_address[1]}/metrics")
+        return _server
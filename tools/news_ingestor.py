@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+from .dedup import url_key
+from .keyword_classifier import news_classifier
+from .storage import connect
+
+# Articles older than this drop out of the categorized view
+NEWS_WINDOW = int(os.getenv("NEWS_WINDOW", 3 * 86400))
+NEWS_CATEGORY_LIMIT = 10
+# Newest articles in the window a digest is built from
+NEWS_DIGEST_ARTICLES = int(os.getenv("NEWS_DIGEST_ARTICLES", 30))
+
+RELATIVE_DATE_RE = re.compile(r"(\d+)\s*(minute|min|hour|hr|day|week|month|year)s?\s+ago", re.IGNORECASE)
+RELATIVE_UNITS = {
+    "minute": 60, "min": 60, "hour": 3600, "hr": 3600, "day": 86400,
+    "week": 7 * 86400, "month": 30 * 86400, "year": 365 * 86400,
+}
+ABSOLUTE_DATE_FORMATS = ("%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y", "%Y-%m-%d")
+
+
+def parse_news_date(text, now=None):
+    """Epoch seconds for Serper's "2 hours ago" / "Mar 3, 2025" style dates, or None."""
+    if not text:
+        return None
+    now = now or time.time()
+    match = RELATIVE_DATE_RE.search(text)
+    if match:
+        return now - int(match.group(1)) * RELATIVE_UNITS[match.group(2).lower()]
+    for fmt in ABSOLUTE_DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def _article_key(article):
+    link = article.get("link")
+    if link and "://" in link:
+        return url_key(link)
+    text = f"{article.get('title', '')} {article.get('snippet', '')}".strip().lower()
+    return "text:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class NewsIngestor:
+    """
+    Incremental per-asset news history. Each refresh fetches the latest
+    headlines (restricted to the period since the asset's watermark), stores
+    only articles not seen before and classifies them once on insert. A news
+    digest of the articles inside the news window is kept next to them.
+
+    Articles stay unsummarized until a digest including them is saved, so a
+    refresh whose summary fails leaves them pending for the next one.
+    """
+
+    def __init__(self, filename="news.db", window=NEWS_WINDOW):
+        self.window = window
+        self.conn = connect(filename)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_articles (
+                asset TEXT NOT NULL,
+                article_key TEXT NOT NULL,
+                title TEXT,
+                snippet TEXT,
+                link TEXT,
+                date_text TEXT,
+                published_at REAL,
+                first_seen REAL NOT NULL,
+                label TEXT NOT NULL,
+                score REAL NOT NULL,
+                summarized INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (asset, article_key)
+            )
+        """)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(news_articles)")}
+        if "summarized" not in columns:
+            # Databases from before the flag: their articles are already in a digest
+            self.conn.execute("ALTER TABLE news_articles ADD COLUMN summarized INTEGER NOT NULL DEFAULT 1")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_news_asset_seen ON news_articles (asset, first_seen)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_watermarks (
+                asset TEXT PRIMARY KEY,
+                last_seen_at REAL NOT NULL,
+                last_published_at REAL,
+                last_keys TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_digests (
+                asset TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                article_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_asset(asset):
+        return " ".join(asset.lower().split())
+
+    def watermark(self, asset):
+        row = self.conn.execute(
+            "SELECT last_seen_at, last_published_at, last_keys FROM news_watermarks WHERE asset = ?",
+            (self.normalize_asset(asset),)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "last_seen_at": row["last_seen_at"],
+            "last_published_at": row["last_published_at"],
+            "last_keys": json.loads(row["last_keys"]),
+        }
+
+    def time_range(self, asset, now=None):
+        """Narrowest search recency filter that still covers twice the time since the last refresh."""
+        watermark = self.watermark(asset)
+        if not watermark:
+            return None
+        elapsed = (now or time.time()) - watermark["last_seen_at"]
+        for limit, time_range in ((1800, "h"), (12 * 3600, "d"), (3.5 * 86400, "w"), (15 * 86400, "m")):
+            if elapsed <= limit:
+                return time_range
+        return None
+
+    def ingest(self, asset, search_client, num_results=6, now=None):
+        """
+        Fetch the latest headlines and store the ones not seen before.
+
+        Returns:
+            list: The new articles (with 'label', 'score' and 'published_at'),
+            or a dict with 'error' when the search failed.
+        """
+        now = now or time.time()
+        results = search_client.search_latest_news(asset, num_results=num_results, time_range=self.time_range(asset, now))
+        if isinstance(results, dict) and "error" in results:
+            return results
+
+        asset = self.normalize_asset(asset)
+        new_articles, keys, latest = [], [], None
+        with self._lock:
+            watermark = self.watermark(asset) or {}
+            for item in results or []:
+                if not isinstance(item, dict):
+                    continue
+                key = _article_key(item)
+                keys.append(key)
+                published_at = parse_news_date(item.get("date"), now)
+                if published_at is not None:
+                    latest = max(latest or published_at, published_at)
+                text = f"{item.get('title', '')} {item.get('snippet', '')}"
+                score = news_classifier.score(text)
+                label = news_classifier.label(text)
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO news_articles "
+                    "(asset, article_key, title, snippet, link, date_text, published_at, first_seen, label, score, summarized) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (asset, key, item.get("title"), item.get("snippet"), item.get("link"),
+                     item.get("date"), published_at, now, label, score)
+                )
+                if cursor.rowcount:
+                    new_articles.append({**item, "label": label, "score": score, "published_at": published_at})
+
+            previous_latest = watermark.get("last_published_at")
+            if previous_latest is not None:
+                latest = max(latest or previous_latest, previous_latest)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO news_watermarks (asset, last_seen_at, last_published_at, last_keys) VALUES (?, ?, ?, ?)",
+                (asset, now, latest, json.dumps(keys))
+            )
+            self.conn.commit()
+
+        logging.info(f"✅ Ingested {len(new_articles)} new of {len(keys)} news articles for {asset}")
+        return new_articles
+
+    def articles(self, asset, since=None, pending=False):
+        """Stored articles for an asset, newest first. pending=True: only those not in a saved digest yet."""
+        rows = self.conn.execute(
+            "SELECT title, snippet, link, date_text, published_at, first_seen, label, score FROM news_articles "
+            "WHERE asset = ? AND COALESCE(published_at, first_seen) > ? AND (? = 0 OR summarized = 0) "
+            "ORDER BY COALESCE(published_at, first_seen) DESC",
+            (self.normalize_asset(asset), since or 0, int(pending))
+        ).fetchall()
+        articles = []
+        for row in rows:
+            article = {"title": row["title"], "snippet": row["snippet"], "link": row["link"],
+                       "label": row["label"], "score": row["score"], "published_at": row["published_at"]}
+            if row["date_text"]:
+                article["date"] = row["date_text"]
+            articles.append(article)
+        return articles
+
+    def categories(self, asset, now=None):
+        """Recent articles (within the news window) bucketed into bullish/neutral/bearish."""
+        buckets = {"bullish": [], "neutral": [], "bearish": []}
+        for article in self.articles(asset, since=(now or time.time()) - self.window):
+            bucket = buckets[article["label"]]
+            if len(bucket) < NEWS_CATEGORY_LIMIT:
+                bucket.append(article)
+        return buckets
+
+    def pending(self, asset, now=None):
+        """Articles inside the news window that no saved digest includes yet, newest first."""
+        return self.articles(asset, since=(now or time.time()) - self.window, pending=True)
+
+    def digest_articles(self, asset, now=None):
+        """The articles a digest is built from: the newest NEWS_DIGEST_ARTICLES inside the news window."""
+        return self.articles(asset, since=(now or time.time()) - self.window)[:NEWS_DIGEST_ARTICLES]
+
+    def digest(self, asset, now=None):
+        """The saved digest, or None once it is older than the news window (its stories have aged out)."""
+        row = self.conn.execute(
+            "SELECT summary, article_count, updated_at FROM news_digests WHERE asset = ?",
+            (self.normalize_asset(asset),)
+        ).fetchone()
+        if not row or (now or time.time()) - row["updated_at"] > self.window:
+            return None
+        return dict(row)
+
+    def save_digest(self, asset, summary, article_count, built_at):
+        """
+        Save a digest built at built_at (when its articles were read), and
+        mark every article stored by then as summarized.
+        """
+        asset = self.normalize_asset(asset)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO news_digests (asset, summary, article_count, updated_at) VALUES (?, ?, ?, ?)",
+                (asset, summary, article_count, built_at)
+            )
+            self.conn.execute(
+                "UPDATE news_articles SET summarized = 1 WHERE asset = ? AND first_seen <= ? AND summarized = 0",
+                (asset, built_at)
+            )
+            self.conn.commit()
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_news_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = NewsIngestor()
+        return _ingestor
@@ -0,0 +1,109 @@
+"""
+priority.py
+
+Request priority for the shared, rate-limited provider budgets (Serper,
+CoinGecko, Bedrock). Work is interactive unless it runs inside
+background_priority(), e.g. the cache warmer. Limiters serve interactive
+callers first, and background calls yield while interactive calls are waiting
+for or using a provider.
+
+The priority lives in a context variable. Thread pools that fan work out
+submit propagate(func) so their workers inherit it, along with the rest of
+the caller's context (asyncio.to_thread does this already).
+"""
+
+import threading
+import contextvars
+from contextlib import contextmanager
+
+INTERACTIVE, BACKGROUND = "interactive", "background"
+
+_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def is_background():
+    return _priority.get() == BACKGROUND
+
+
+@contextmanager
+def background_priority():
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def propagate(func):
+    """
+    Wrap func to run with the caller's context (priority, current trace
+    span), e.g. on a thread pool worker.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A copy per call: one Context can't be entered by two threads at once
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+
+class PriorityGate:
+    """
+    Lets background calls to a provider through only while no interactive
+    call is waiting for or using it. Interactive calls never wait on the gate.
+    """
+
+    def __init__(self):
+        self._interactive = 0
+        self._changed = threading.Condition()
+
+    @property
+    def interactive(self):
+        return self._interactive
+
+    def wait_idle(self):
+        """Block until no interactive call is waiting for or using the provider."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._interactive == 0)
+
+    def yield_to_interactive(self, timeout):
+        """
+        Sleep up to timeout seconds, returning True early once an interactive
+        call arrives. For background callers waiting out a rate limit, so the
+        wait never holds up an interactive call.
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: self._interactive > 0, timeout)
+
+    @contextmanager
+    def enter(self):
+        if is_background():
+            self.wait_idle()
+            yield
+            return
+
+        with self._changed:
+            self._interactive += 1
+            self._changed.notify_all()
+        try:
+            yield
+        finally:
+            with self._changed:
+                self._interactive -= 1
+                self._changed.notify_all()
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_priority_gate(provider):
+    """Process-wide gate for a provider name ("serper", "coingecko", ...)."""
+    with _gates_lock:
+        if provider not in _gates:
+            _gates[provider] = PriorityGate()
+        return _gates[provider]
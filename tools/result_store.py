@@ -0,0 +1,226 @@
+"""
+result_store.py
+
+Shared, persistent store of pipeline stage results (SQLite in WAL mode under
+CRYPTO_DATA_DIR), indexed by asset, stage and time. Every process that uses
+the same data directory (app, API, CLI, warmer) reads and writes the same
+results, so a coin analyzed by one user is served to the next.
+
+A computation in progress is marked with an in-progress row. A second
+requester, even one in another process, waits for that computation's result
+instead of starting its own. A marker whose owner died expires after
+RESULT_INFLIGHT_TIMEOUT seconds.
+
+Retention is bounded: results older than RESULT_RETENTION seconds are
+deleted, and at most RESULT_HISTORY results are kept per asset and stage.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+from .storage import connect
+
+RESULT_RETENTION = int(os.getenv("RESULT_RETENTION", 7 * 86400))
+RESULT_HISTORY = int(os.getenv("RESULT_HISTORY", 50))
+RESULT_INFLIGHT_TIMEOUT = int(os.getenv("RESULT_INFLIGHT_TIMEOUT", 600))
+PRUNE_INTERVAL = 300
+WAIT_POLL_INTERVAL = 0.25
+
+
+def _encode(value):
+    # NumPy scalars (technical indicators) -> Python numbers; anything else -> str
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _params(params):
+    return ",".join(params or ())
+
+
+class ResultStore:
+    """
+    Stage results history plus in-progress markers, shared by every process on
+    the data directory. One connection serves all threads of a process, so
+    every read and write on it holds _lock.
+    """
+
+    def __init__(self, filename="results.db", retention=RESULT_RETENTION, history=RESULT_HISTORY,
+                 inflight_timeout=RESULT_INFLIGHT_TIMEOUT):
+        self.retention = retention
+        self.history_limit = history
+        self.inflight_timeout = inflight_timeout
+        self.conn = connect(filename)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                asset TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                params TEXT NOT NULL,
+                computed_at REAL NOT NULL,
+                result TEXT NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_asset_stage_time ON stage_results (asset, stage, params, computed_at)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_time ON stage_results (computed_at)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_inflight (
+                asset TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                params TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                PRIMARY KEY (asset, stage, params)
+            )
+        """)
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    @staticmethod
+    def normalize_asset(asset):
+        return " ".join(asset.lower().split())
+
+    @staticmethod
+    def owner():
+        """Identifies the computing thread across processes."""
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    # ------------------------------------------------------------ results
+
+    def latest(self, asset, stage, params=(), max_age=None, now=None):
+        """(computed_at, result) of the newest result, optionally no older than max_age; or None."""
+        now = now or time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT computed_at, result FROM stage_results WHERE asset = ? AND stage = ? AND params = ? "
+                "AND computed_at > ? ORDER BY computed_at DESC LIMIT 1",
+                (self.normalize_asset(asset), stage, _params(params), now - max_age if max_age is not None else 0)
+            ).fetchone()
+        return (row["computed_at"], json.loads(row["result"])) if row else None
+
+    def put(self, asset, stage, result, params=(), computed_at=None):
+        computed_at = computed_at or time.time()
+        payload = json.dumps(result, default=_encode)
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO stage_results (asset, stage, params, computed_at, result) VALUES (?, ?, ?, ?, ?)",
+                (self.normalize_asset(asset), stage, _params(params), computed_at, payload)
+            )
+            self.conn.commit()
+        if computed_at - self._last_prune > PRUNE_INTERVAL:
+            self.prune(computed_at)
+
+    def history(self, asset, stage=None, since=None, limit=100):
+        """Stored results for an asset (optionally one stage), newest first."""
+        query = "SELECT stage, params, computed_at, result FROM stage_results WHERE asset = ? AND computed_at > ?"
+        args = [self.normalize_asset(asset), since or 0]
+        if stage:
+            query += " AND stage = ?"
+            args.append(stage)
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY computed_at DESC LIMIT ?", args + [limit]).fetchall()
+        return [
+            {"stage": row["stage"], "params": row["params"].split(",") if row["params"] else [],
+             "computed_at": row["computed_at"], "result": json.loads(row["result"])}
+            for row in rows
+        ]
+
+    def delete(self, asset=None, stage=None):
+        """Delete stored results for an asset and/or stage (everything when both are None)."""
+        query, args = "DELETE FROM stage_results WHERE 1 = 1", []
+        if asset:
+            query += " AND asset = ?"
+            args.append(self.normalize_asset(asset))
+        if stage:
+            query += " AND stage = ?"
+            args.append(stage)
+        with self._lock:
+            self.conn.execute(query, args)
+            self.conn.commit()
+
+    def prune(self, now=None):
+        """Drop results past the retention period and beyond the per-key history limit."""
+        now = now or time.time()
+        with self._lock:
+            self._last_prune = now
+            expired = self.conn.execute("DELETE FROM stage_results WHERE computed_at < ?", (now - self.retention,)).rowcount
+            trimmed = self.conn.execute("""
+                DELETE FROM stage_results WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY asset, stage, params ORDER BY computed_at DESC
+                        ) AS rank FROM stage_results
+                    ) WHERE rank > ?
+                )
+            """, (self.history_limit,)).rowcount
+            self.conn.execute("DELETE FROM stage_inflight WHERE started_at < ?", (now - self.inflight_timeout,))
+            self.conn.commit()
+        if expired or trimmed:
+            logging.info(f"✅ Pruned {expired} expired and {trimmed} surplus stage results")
+
+    # -------------------------------------------------- in-progress markers
+
+    def claim(self, asset, stage, params=(), owner=None, now=None):
+        """
+        Mark a computation as in progress. Returns True if this owner now
+        holds the marker, False if someone else is computing it.
+        """
+        now = now or time.time()
+        key = (self.normalize_asset(asset), stage, _params(params))
+        with self._lock:
+            # Take over markers left behind by a crashed or hung owner
+            self.conn.execute(
+                "DELETE FROM stage_inflight WHERE asset = ? AND stage = ? AND params = ? AND started_at < ?",
+                key + (now - self.inflight_timeout,)
+            )
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO stage_inflight (asset, stage, params, owner, started_at) VALUES (?, ?, ?, ?, ?)",
+                key + (owner or self.owner(), now)
+            )
+            self.conn.commit()
+        return bool(cursor.rowcount)
+
+    def release(self, asset, stage, params=(), owner=None):
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM stage_inflight WHERE asset = ? AND stage = ? AND params = ? AND owner = ?",
+                (self.normalize_asset(asset), stage, _params(params), owner or self.owner())
+            )
+            self.conn.commit()
+
+    def in_progress(self, asset, stage, params=(), now=None):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT started_at FROM stage_inflight WHERE asset = ? AND stage = ? AND params = ?",
+                (self.normalize_asset(asset), stage, _params(params))
+            ).fetchone()
+        return bool(row) and (now or time.time()) - row["started_at"] < self.inflight_timeout
+
+    def wait_for(self, asset, stage, params=(), max_age=None, timeout=None):
+        """
+        Wait while another requester computes this result, then return its
+        (computed_at, result), or None if it finished without storing one
+        (e.g. it failed) or the wait timed out.
+        """
+        deadline = time.time() + (timeout or self.inflight_timeout)
+        while self.in_progress(asset, stage, params) and time.time() < deadline:
+            time.sleep(WAIT_POLL_INTERVAL)
+        return self.latest(asset, stage, params, max_age=max_age)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
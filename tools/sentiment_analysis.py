@@ -1,7 +1,105 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-# Initialize VADER analyzer
-analyzer = SentimentIntensityAnalyzer()
+# Crypto slang VADER's general-purpose lexicon does not know (VADER scale: -4..4)
+CRYPTO_LEXICON = {
+    "bullish": 2.0, "bullrun": 2.0, "moon": 1.8, "mooning": 2.0, "hodl": 1.2,
+    "pump": 1.0, "rally": 1.5, "breakout": 1.5, "accumulating": 1.0, "ath": 1.5,
+    "bearish": -2.0, "dump": -1.5, "dumping": -1.8, "crash": -2.5, "rugpull": -3.0,
+    "rugged": -2.5, "scam": -3.0, "overvalued": -1.5, "bubble": -1.0,
+    "lawsuit": -1.5, "fud": -1.2, "rekt": -2.5, "hack": -2.0, "exploit": -2.0,
+}
+
+
+class SentimentEngine:
+    """
+    Batch VADER scorer with a bounded memo of compound scores keyed by text hash,
+    so posts that come back on every refresh are only ever scored once.
+    """
+
+    def __init__(self, max_cache_size=None, positive_threshold=0.05, negative_threshold=-0.05):
+        self.analyzer = SentimentIntensityAnalyzer()
+        self.analyzer.lexicon.update(CRYPTO_LEXICON)
+        self.max_cache_size = max_cache_size or int(os.getenv("SENTIMENT_CACHE_SIZE", 50000))
+        self.positive_threshold = positive_threshold
+        self.negative_threshold = negative_threshold
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def post_text(post):
+        return f"{post.get('title', '')} {post.get('snippet', '')}".strip()
+
+    @staticmethod
+    def text_key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def score_texts(self, texts):
+        """Return the VADER compound score for each text, reusing memoized scores."""
+        keys = [self.text_key(text) for text in texts]
+        scores = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[key] = self._cache[key]
+
+        # Score each distinct unseen text once, outside the lock
+        pending = {key: text for key, text in zip(keys, texts) if key not in scores}
+        fresh = {key: self.analyzer.polarity_scores(text)["compound"] for key, text in pending.items()}
+
+        with self._lock:
+            self.misses += len(fresh)
+            self.hits += len(keys) - len(fresh)
+            for key, score in fresh.items():
+                self._cache[key] = score
+            while len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+
+        scores.update(fresh)
+        return [scores[key] for key in keys]
+
+    def score_posts(self, posts):
+        return self.score_texts([self.post_text(post) for post in posts])
+
+    def label(self, score):
+        if score >= self.positive_threshold:
+            return "positive"
+        if score <= self.negative_threshold:
+            return "negative"
+        return "neutral"
+
+    def analyze(self, posts):
+        """Bucket posts into positive/neutral/negative, each with its compound score attached."""
+        posts = [post for post in posts if isinstance(post, dict)]
+        summary = {"positive": [], "neutral": [], "negative": []}
+        for post, score in zip(posts, self.score_posts(posts)):
+            summary[self.label(score)].append({**post, "score": score})
+        return summary
+
+    def cache_info(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_sentiment_engine():
+    """Return the process-wide sentiment engine (its memo is shared by every caller)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SentimentEngine()
+        return _engine
+
 
 def analyze_reddit_sentiment(posts):
     """
@@ -13,21 +111,4 @@ def analyze_reddit_sentiment(posts):
     Returns:
         dict: Categorized sentiment with compound scores.
     """
-    sentiment_summary = {
-        "positive": [],
-        "neutral": [],
-        "negative": []
-    }
-
-    for post in posts:
-        text = f"{post.get('title', '')} {post.get('snippet', '')}".strip()
-        score = analyzer.polarity_scores(text)["compound"]
-
-        if score >= 0.05:
-            sentiment_summary["positive"].append({**post, "score": score})
-        elif score <= -0.05:
-            sentiment_summary["negative"].append({**post, "score": score})
-        else:
-            sentiment_summary["neutral"].append({**post, "score": score})
-
-    return sentiment_summary
\ No newline at end of file
+    return get_sentiment_engine().analyze(posts)
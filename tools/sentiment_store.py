@@ -0,0 +1,205 @@
+import os
+import math
+import time
+import bisect
+import hashlib
+import logging
+import threading
+from collections import deque
+
+from .dedup import url_key
+from .storage import connect
+
+# Rolling aggregate windows, in seconds
+WINDOWS = {
+    "1h": 3600,
+    "24h": 86400,
+    "7d": 7 * 86400,
+}
+
+# Posts older than every window are deleted (checked at most every PRUNE_INTERVAL seconds)
+SENTIMENT_RETENTION = max(int(os.getenv("SENTIMENT_RETENTION", 0)), max(WINDOWS.values()))
+PRUNE_INTERVAL = 300
+
+
+class RollingWindow:
+    """Running sum/count/positive count over the last `seconds`, updated on insert."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.entries = deque()  # (timestamp, score, is_positive), oldest first
+        self.total = 0.0
+        self.positive = 0
+
+    def add(self, timestamp, score, is_positive):
+        entry = (timestamp, score, is_positive)
+        if not self.entries or timestamp >= self.entries[-1][0]:
+            self.entries.append(entry)
+        else:
+            # Late arrival: keep the deque ordered so eviction stays at the left end
+            self.entries.insert(bisect.bisect_right(self.entries, (timestamp, math.inf)), entry)
+        self.total += score
+        self.positive += int(is_positive)
+
+    def evict(self, now):
+        cutoff = now - self.seconds
+        while self.entries and self.entries[0][0] <= cutoff:
+            _, score, is_positive = self.entries.popleft()
+            self.total -= score
+            self.positive -= int(is_positive)
+
+    def snapshot(self, now):
+        self.evict(now)
+        volume = len(self.entries)
+        return {
+            "mean_score": self.total / volume if volume else None,
+            "volume": volume,
+            "positive_ratio": self.positive / volume if volume else None,
+        }
+
+
+class SentimentStore:
+    """
+    Persistent per-asset time series of scored posts (SQLite), with 1h/24h/7d
+    rolling aggregates kept in memory and updated incrementally with the rows
+    stored since the last insert or snapshot, by this process or any other.
+    """
+
+    def __init__(self, filename="sentiment.db", retention=SENTIMENT_RETENTION):
+        self.retention = retention
+        self.conn = connect(filename)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sentiment_posts (
+                asset TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                observed_at REAL NOT NULL,
+                score REAL NOT NULL,
+                label TEXT NOT NULL,
+                title TEXT,
+                link TEXT,
+                PRIMARY KEY (asset, dedupe_key)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_asset_time ON sentiment_posts (asset, observed_at)")
+        self.conn.commit()
+        self._windows = {}
+        self._last_rowid = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    @staticmethod
+    def normalize_asset(asset):
+        return " ".join(asset.lower().split())
+
+    @staticmethod
+    def dedupe_key(post):
+        link = post.get("link")
+        if link and "://" in link:
+            return url_key(link)
+        text = f"{post.get('title', '')} {post.get('snippet', '')}".strip().lower()
+        return "text:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _asset_windows(self, asset, now=None):
+        """
+        Windows for an asset, brought up to date with every row stored since
+        this process last looked, including rows other processes (app, API,
+        CLI, warmer) wrote to the same database. Rows are read by rowid,
+        which only grows, so each row is added exactly once.
+        """
+        if asset not in self._windows:
+            self._windows[asset] = {name: RollingWindow(seconds) for name, seconds in WINDOWS.items()}
+            self._last_rowid[asset] = 0
+        windows = self._windows[asset]
+        since = (now or time.time()) - max(WINDOWS.values())
+        rows = self.conn.execute(
+            "SELECT rowid, observed_at, score, label FROM sentiment_posts "
+            "WHERE asset = ? AND observed_at > ? AND rowid > ? ORDER BY rowid",
+            (asset, since, self._last_rowid[asset])
+        ).fetchall()
+        for row in rows:
+            for window in windows.values():
+                window.add(row["observed_at"], row["score"], row["label"] == "positive")
+        if rows:
+            self._last_rowid[asset] = rows[-1]["rowid"]
+        return windows
+
+    def add_posts(self, asset, sentiment, timestamp=None):
+        """
+        Append scored posts ({'positive': [...], 'neutral': [...], 'negative': [...]})
+        for an asset. Posts already stored under the same dedupe key are skipped.
+
+        Returns:
+            int: Number of new posts stored.
+        """
+        asset = self.normalize_asset(asset)
+        timestamp = timestamp or time.time()
+        inserted = 0
+        with self._lock:
+            for label in ("positive", "neutral", "negative"):
+                for post in sentiment.get(label, []):
+                    if not isinstance(post, dict) or "score" not in post:
+                        continue
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO sentiment_posts (asset, dedupe_key, observed_at, score, label, title, link) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (asset, self.dedupe_key(post), timestamp, post["score"], label, post.get("title"), post.get("link"))
+                    )
+                    inserted += cursor.rowcount
+            self.conn.commit()
+            # Picks up the new rows (and anything other processes stored meanwhile)
+            self._asset_windows(asset)
+
+        logging.info(f"✅ Stored {inserted} new sentiment posts for {asset}")
+        now = time.time()
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self.prune(now)
+        return inserted
+
+    def prune(self, now=None):
+        """Delete posts older than the retention period (by default the widest window)."""
+        now = now or time.time()
+        with self._lock:
+            self._last_prune = now
+            # The newest row always stays: SQLite hands out rowids from the current
+            # maximum, and the windows catch up by rowid, so it must never go down
+            deleted = self.conn.execute(
+                "DELETE FROM sentiment_posts WHERE observed_at < ? "
+                "AND rowid < (SELECT MAX(rowid) FROM sentiment_posts)",
+                (now - self.retention,)
+            ).rowcount
+            self.conn.commit()
+        if deleted:
+            logging.info(f"✅ Pruned {deleted} sentiment posts older than {self.retention // 86400} days")
+
+    def aggregates(self, asset, now=None):
+        """Current {window: {mean_score, volume, positive_ratio}} for an asset."""
+        asset = self.normalize_asset(asset)
+        now = now or time.time()
+        with self._lock:
+            windows = self._asset_windows(asset, now)
+            return {name: window.snapshot(now) for name, window in windows.items()}
+
+    def series(self, asset, bucket_seconds=3600, since=None):
+        """Bucketed history [(bucket_start, mean_score, volume), ...] for charting trends."""
+        asset = self.normalize_asset(asset)
+        if since is None:
+            since = time.time() - max(WINDOWS.values())
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT CAST(observed_at / ? AS INTEGER) * ? AS bucket, AVG(score) AS mean_score, COUNT(*) AS volume "
+                "FROM sentiment_posts WHERE asset = ? AND observed_at > ? GROUP BY bucket ORDER BY bucket",
+                (bucket_seconds, bucket_seconds, asset, since)
+            ).fetchall()
+        return [(row["bucket"], row["mean_score"], row["volume"]) for row in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_sentiment_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SentimentStore()
+        return _store
@@ -0,0 +1,23 @@
+import os
+import sqlite3
+
+# Every local store (sentiment history, documents, caches) lives under one directory
+DATA_DIR = os.getenv("CRYPTO_DATA_DIR", "data")
+
+
+def connect(filename, data_dir=None):
+    """
+    Open a SQLite database under DATA_DIR in WAL mode, so readers in other
+    connections (and processes) never block the writer. The connection may be
+    used from any thread, but not concurrently: callers that share one across
+    threads serialize every statement and transaction on it with a lock.
+    """
+    path = filename if os.path.isabs(filename) or filename == ":memory:" else os.path.join(data_dir or DATA_DIR, filename)
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,280 @@
+"""
+tracing.py
+
+Lightweight end-to-end tracing. Spans nest for job, pipeline, stage, agent
+run, tool call, HTTP request, rate-limit wait and LLM call, and carry
+attributes such as asset, cache hit, bytes and tokens. Span names start with
+their category ("stage.technical", "http.coingecko", "llm.advice", ...).
+
+The current span lives in a context variable, so spans nest across function
+calls, asyncio tasks and thread pools that submit tools.priority.propagate(func).
+
+Finished spans are kept per trace in memory (the last TRACE_MAX_TRACES
+traces, evicting cache warmer traces first) for the app's debug panel and the API, and exported in the
+background when configured:
+
+- TRACE_PATH:          append spans to a JSONL file
+- TRACE_OTLP_ENDPOINT: POST them as OTLP/HTTP JSON, e.g. to an OpenTelemetry
+                       collector (http://localhost:4318/v1/traces) or the
+                       stand-in at fake_providers.server (/v1/traces)
+
+TRACING=0 stops recording spans.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import requests
+
+TRACING = os.getenv("TRACING", "1") != "0"
+TRACE_MAX_TRACES = int(os.getenv("TRACE_MAX_TRACES", 50))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 2000))
+TRACE_PATH = os.getenv("TRACE_PATH")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", 2.0))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "crypto-analysis")
+
+# Root spans of unattended work (the cache warmer); their traces are evicted before users' traces
+BACKGROUND_ROOTS = ("warm.",)
+
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation in a trace. Use span() for a block, or start_span() and end() across callbacks."""
+
+    def __init__(self, name, trace_id, parent_id=None, kind="internal", attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = {k: v for k, v in (attributes or {}).items() if v is not None}
+        self.start = time.time()
+        self.end_time = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        return self
+
+    def record_error(self, error):
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def end(self, error=None):
+        if self.end_time is not None:
+            return
+        if error is not None:
+            self.record_error(error)
+        self.end_time = time.time()
+        tracer.finish(self)
+
+    @property
+    def duration(self):
+        return (self.end_time or time.time()) - self.start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "end": self.end_time,
+            "duration": self.duration,
+            "attributes": dict(self.attributes),
+            "error": self.error,
+        }
+
+
+def current_span():
+    return _current.get()
+
+
+def set_current_span(span):
+    """Make span the current span without a with-block (e.g. between callbacks). Returns the previous one."""
+    previous = _current.get()
+    _current.set(span)
+    return previous
+
+
+def start_span(name, parent=None, kind="internal", **attributes):
+    """Start a span under parent (default: the current span), or a new trace. The caller ends it."""
+    parent = parent if parent is not None else _current.get()
+    if parent is None:
+        return Span(name, os.urandom(16).hex(), None, kind, attributes)
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Run a block as a span, nested under the current span. Exceptions are recorded on it."""
+    current = start_span(name, kind=kind, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def _category(name):
+    return name.split(".", 1)[0]
+
+
+def self_times(spans):
+    """Seconds per span category not covered by child spans, e.g. {"http": 1.2, "llm": 40.3}."""
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent_id"], []).append(s)
+    totals = {}
+    for s in spans:
+        covered = sum(min(c["end"], s["end"]) - max(c["start"], s["start"]) for c in children.get(s["span_id"], []))
+        category = _category(s["name"])
+        totals[category] = totals.get(category, 0.0) + max(s["duration"] - covered, 0.0)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+# ---------------------------------------------------------------- exporters
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans, service_name=TRACE_SERVICE_NAME):
+    """OTLP/HTTP JSON payload (ExportTraceServiceRequest) for finished span dicts."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "crypto-analysis.tracing"},
+            "spans": [{
+                "traceId": s["trace_id"],
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_id"] or "",
+                "name": s["name"],
+                "kind": SPAN_KINDS.get(s["kind"], 1),
+                "startTimeUnixNano": str(int(s["start"] * 1e9)),
+                "endTimeUnixNano": str(int(s["end"] * 1e9)),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+                "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+class Tracer:
+    """Keeps recent traces in memory and exports finished spans on a background thread."""
+
+    def __init__(self, enabled=TRACING, max_traces=TRACE_MAX_TRACES, path=TRACE_PATH, otlp_endpoint=TRACE_OTLP_ENDPOINT,
+                 export_interval=TRACE_EXPORT_INTERVAL):
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint
+        self.export_interval = export_interval
+        self._traces = OrderedDict()  # trace id -> finished span dicts
+        self._background = set()  # ids of kept traces with a BACKGROUND_ROOTS root
+        self._pending = deque(maxlen=10000)
+        self._lock = threading.Lock()
+        self._exporter = None
+        self.stats = {"spans": 0, "exported": 0, "export_errors": 0}
+
+    def finish(self, span):
+        if not self.enabled:
+            return
+        record = span.to_dict()
+        with self._lock:
+            spans = self._traces.setdefault(span.trace_id, [])
+            self._traces.move_to_end(span.trace_id)
+            if len(spans) < TRACE_MAX_SPANS:
+                spans.append(record)
+            if span.parent_id is None and span.name.startswith(BACKGROUND_ROOTS):
+                self._background.add(span.trace_id)
+            while len(self._traces) > self.max_traces:
+                # Oldest background trace first, so warmer runs don't push out the traces users look up
+                victim = next((trace_id for trace_id in self._traces if trace_id in self._background), None)
+                victim = victim or next(iter(self._traces))
+                del self._traces[victim]
+                self._background.discard(victim)
+            self.stats["spans"] += 1
+            if self.path or self.otlp_endpoint:
+                self._pending.append(record)
+                self._start_exporter()
+
+    def trace(self, trace_id):
+        """Finished spans of a trace, in start order."""
+        with self._lock:
+            return sorted(self._traces.get(trace_id, []), key=lambda s: s["start"])
+
+    def traces(self):
+        """Summaries of the kept traces, newest first."""
+        with self._lock:
+            traces = list(self._traces.items())
+        summaries = []
+        for trace_id, spans in reversed(traces):
+            root = min(spans, key=lambda s: s["start"])
+            summaries.append({
+                "trace_id": trace_id,
+                "name": root["name"],
+                "start": root["start"],
+                "duration": max(s["end"] for s in spans) - root["start"],
+                "spans": len(spans),
+                "errors": sum(1 for s in spans if s["error"]),
+            })
+        return summaries
+
+    def _start_exporter(self):
+        if self._exporter is None or not self._exporter.is_alive():
+            self._exporter = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._exporter.start()
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.export_interval)
+            self.flush()
+
+    def flush(self):
+        """Export pending spans now."""
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        if not batch:
+            return
+        try:
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(s, default=str) + "\n" for s in batch)
+            if self.otlp_endpoint:
+                response = requests.post(self.otlp_endpoint, data=json.dumps(to_otlp(batch), default=str),
+                                         headers={"Content-Type": "application/json"}, timeout=5)
+                response.raise_for_status()
+            self.stats["exported"] += len(batch)
+        except Exception as e:
+            self.stats["export_errors"] += 1
+            logging.warning(f"⚠️ Could not export {len(batch)} trace spans: {e}")
+
+
+tracer = Tracer()
+
+
+def get_trace(trace_id):
+    return tracer.trace(trace_id)
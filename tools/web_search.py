@@ -2,9 +2,16 @@ import os
 import time
 import json
 import logging
+import threading
 import requests
 from dotenv import load_dotenv
 
+from .sentiment_analysis import analyze_reddit_sentiment
+from .dedup import dedupe_results
+from .priority import get_priority_gate, is_background
+from .tracing import span
+from .metrics import observe_request, rate_limit_wait
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -13,7 +20,8 @@ class WebSearch:
         self.api_key = api_key or os.getenv("SERPER_API_KEY")
         self.cooldown = cooldown or int(os.getenv("SERPER_COOLDOWN", 60))
         self.last_request_time = 0
-        self.serper_url = "https://google.serper.dev/search"
+        self._rate_lock = threading.Lock()
+        self.serper_url = os.getenv("SERPER_URL", "https://google.serper.dev/search")
 
         # Validate API Key
         if not self.api_key:
@@ -22,86 +30,50 @@ class WebSearch:
         logging.info("✅ Serper API configuration initialized successfully.")
 
     def _rate_limit(self):
-        elapsed_time = time.time() - self.last_request_time
-        if elapsed_time < self.cooldown:
-            wait_time = self.cooldown - elapsed_time
-            logging.info(f"⏳ Rate limit reached. Waiting for {wait_time:.2f} seconds...")
-            time.sleep(wait_time)
+        # Interactive callers reserve the next free slot under the lock and
+        # wait for it outside the lock, so concurrent searches queue in order
+        # without blocking each other's bookkeeping. Background callers (the
+        # cache warmer) only take a slot that is free right now while no
+        # interactive search is pending; their cooldown wait is cut short when
+        # an interactive search arrives, and they queue again behind it.
+        gate = get_priority_gate("serper")
+        with span("wait.serper") as s:
+            if is_background():
+                while True:
+                    gate.wait_idle()
+                    with self._rate_lock:
+                        if gate.interactive:
+                            continue
+                        wait_time = self.last_request_time + self.cooldown - time.time()
+                        if wait_time <= 0:
+                            self.last_request_time = time.time()
+                            break
+                    logging.info(f"⏳ Rate limit reached. Background search waiting up to {wait_time:.2f} seconds...")
+                    gate.yield_to_interactive(wait_time)
+            else:
+                with gate.enter():
+                    with self._rate_lock:
+                        now = time.time()
+                        slot = max(now, self.last_request_time + self.cooldown)
+                        self.last_request_time = slot
+                    wait_time = slot - now
+                    if wait_time > 0:
+                        logging.info(f"⏳ Rate limit reached. Waiting for {wait_time:.2f} seconds...")
+                        s.set(cooldown_s=round(wait_time, 3))
+                        time.sleep(wait_time)
+        # Queueing behind other callers plus the cooldown itself
+        rate_limit_wait.observe(s.duration, provider="serper")
 
     def search_whitepaper(self, project_name_or_symbol, num_results=5):
-        self._rate_limit()
-
-        try:
-            # Formulate the search query
-            query = f"{project_name_or_symbol} white paper"
-            print(f"Sending query: '{query}'")
-            
-            # Make direct API request to Serper instead of using wrapper
-            headers = {
-                "X-API-KEY": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "q": query,
-                "gl": "us",
-                "hl": "en",
-                "num": num_results
-            }
-            
-            response = requests.post(self.serper_url, headers=headers, json=payload)
-            
-            # Debug output
-            print(f"Response status code: {response.status_code}")
-            
-            # Check if request was successful
-            if response.status_code != 200:
-                logging.error(f"⚠️ API request failed with status code {response.status_code}: {response.text}")
-                return {"error": f"API request failed with status code {response.status_code}"}
-            
-            # Parse JSON response
-            try:
-                results = response.json()
-                print(f"Results structure keys: {list(results.keys())}")
-            except json.JSONDecodeError as e:
-                logging.error(f"⚠️ Failed to decode JSON response: {e}")
-                print(f"Response content: {response.text[:500]}...")  # Print first 500 chars
-                return {"error": f"Failed to decode JSON response: {e}"}
-            
-            # Extract relevant information
-            extracted_results = []
-            
-            # Process organic results
-            if "organic" in results:
-                for item in results["organic"][:num_results]:
-                    extracted_results.append({
-                        "title": item.get("title", "No title"),
-                        "snippet": item.get("snippet", "No snippet"),
-                        "link": item.get("link", "No link")
-                    })
-            
-            # Process knowledge graph results if available and needed
-            if "knowledgeGraph" in results and not extracted_results:
-                kg = results["knowledgeGraph"]
-                extracted_results.append({
-                    "title": kg.get("title", "Knowledge Graph"),
-                    "snippet": kg.get("description", "No description"),
-                    "link": kg.get("website", "No link")
-                })
-            
-            self.last_request_time = time.time()
-            logging.info(f"✅ Successfully fetched {len(extracted_results)} results for project: {project_name_or_symbol}")
-            return extracted_results
-
-        except Exception as e:
-            logging.error(f"⚠️ API Error: {e}")
-            return {"error": str(e)}
+        # Formulate the search query
+        query = f"{project_name_or_symbol} white paper"
+        return self.search(query, num_results=num_results)
         
-    def search(self, query, num_results=5):
+    def search(self, query, num_results=5, time_range=None):
         self._rate_limit()
 
         try:
-            print(f"Sending query: '{query}'")
+            logging.debug(f"Sending query: '{query}'")
 
             headers = {
                 "X-API-KEY": self.api_key,
@@ -114,9 +86,19 @@ class WebSearch:
                 "hl": "en",
                 "num": num_results
             }
-
-            response = requests.post(self.serper_url, headers=headers, json=payload)
-            print(f"Response status code: {response.status_code}")
+            if time_range:
+                # Serper/Google recency filter: h, d, w, m or y
+                payload["tbs"] = f"qdr:{time_range}"
+
+            with span("http.serper", kind="client", method="POST", query=query) as s:
+                try:
+                    response = requests.post(self.serper_url, headers=headers, json=payload)
+                except Exception:
+                    observe_request("serper", s.duration, "error")
+                    raise
+                observe_request("serper", s.duration, response.status_code)
+                s.set(status=response.status_code, bytes=len(response.content))
+            logging.debug(f"Response status code: {response.status_code}")
 
             if response.status_code != 200:
                 logging.error(f"⚠️ API request failed with status code {response.status_code}: {response.text}")
@@ -124,21 +106,24 @@ class WebSearch:
 
             try:
                 results = response.json()
-                print(f"Results structure keys: {list(results.keys())}")
+                logging.debug(f"Results structure keys: {list(results.keys())}")
             except json.JSONDecodeError as e:
                 logging.error(f"⚠️ Failed to decode JSON response: {e}")
-                print(f"Response content: {response.text[:500]}...")
+                logging.debug(f"Response content: {response.text[:500]}...")
                 return {"error": f"Failed to decode JSON response: {e}"}
 
             extracted_results = []
 
             if "organic" in results:
                 for item in results["organic"][:num_results]:
-                    extracted_results.append({
+                    result = {
                         "title": item.get("title", "No title"),
                         "snippet": item.get("snippet", "No snippet"),
                         "link": item.get("link", "No link")
-                    })
+                    }
+                    if item.get("date"):
+                        result["date"] = item["date"]
+                    extracted_results.append(result)
 
             if "knowledgeGraph" in results and not extracted_results:
                 kg = results["knowledgeGraph"]
@@ -148,7 +133,12 @@ class WebSearch:
                     "link": kg.get("website", "No link")
                 })
 
-            self.last_request_time = time.time()
+            # Collapse the same story served under different URLs or reworded snippets
+            fetched_count = len(extracted_results)
+            extracted_results = dedupe_results(extracted_results)
+            if len(extracted_results) < fetched_count:
+                logging.info(f"🧹 Removed {fetched_count - len(extracted_results)} duplicate results for: {query}")
+
             logging.info(f"✅ Successfully fetched {len(extracted_results)} results for: {query}")
             return extracted_results
 
@@ -175,37 +165,9 @@ class WebSearch:
                 logging.error(f"Reddit search error: {raw_results['error']}")
                 return {"error": raw_results["error"]}
 
-            # Classify sentiment based on keywords
-            positive, neutral, negative = [], [], []
-
-            # Enhanced keyword lists
-            positive_keywords = [
-                "bullish", "buy", "moon", "pump", "surge", "rocket", 
-                "hodl", "diamond hands", "to the moon", "bullrun", 
-                "rally", "breakout", "long", "accumulating"
-            ]
-            
-            negative_keywords = [
-                "scam", "dump", "bearish", "crash", "loss", "lawsuit", 
-                "rugpull", "dead", "rip", "sell", "short", "bubble", 
-                "overvalued", "avoid", "disaster"
-            ]
-
-            for post in raw_results:
-                title = post.get("title", "").lower()
-                snippet = post.get("snippet", "").lower()
-                text = f"{title} {snippet}"
-
-                # Count positive and negative sentiment
-                pos_count = sum(1 for word in positive_keywords if word in text)
-                neg_count = sum(1 for word in negative_keywords if word in text)
-
-                if pos_count > neg_count and pos_count > 0:
-                    positive.append(post)
-                elif neg_count > pos_count and neg_count > 0:
-                    negative.append(post)
-                else:
-                    neutral.append(post)
+            # Score with the shared, memoized VADER engine
+            sentiment = analyze_reddit_sentiment(raw_results)
+            positive, neutral, negative = sentiment["positive"], sentiment["neutral"], sentiment["negative"]
 
             total_posts = len(positive) + len(neutral) + len(negative)
             logging.info(f"✅ Reddit sentiment complete for {asset}: {len(positive)} positive, {len(negative)} negative, {len(neutral)} neutral (total: {total_posts})")
@@ -220,8 +182,8 @@ class WebSearch:
             logging.error(f"Error in search_reddit_sentiment: {str(e)}")
             return {"error": f"Reddit sentiment search failed: {str(e)}"}
 
-    def search_latest_news(self, asset, num_results=5):
-        """Search for latest cryptocurrency news"""
+    def search_latest_news(self, asset, num_results=5, time_range=None):
+        """Search for latest cryptocurrency news (optionally only from the last hour/day/week: 'h', 'd', 'w')"""
         # More specific crypto news search
         query = f'"{asset}" cryptocurrency news OR "{asset}" crypto news OR "{asset}" token news'
-        return self.search(query, num_results=num_results)
\ No newline at end of file
+        return self.search(query, num_results=num_results, time_range=time_range)
\ No newline at end of file